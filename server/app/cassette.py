@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import logging
+import struct
+import threading
+from pathlib import Path
+from typing import Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+MODE_OFF = "off"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+_EMBED = "embed"
+_GENERATE = "generate"
+
+_lock = threading.Lock()
+_loaded_path: Optional[Path] = None
+_entries: dict[tuple[str, str], dict] = {}
+_stats = {"recorded": 0, "replayed": 0, "misses": 0}
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+def mode() -> str:
+    value = (settings.llm_cassette_mode or MODE_OFF).strip().lower()
+    if value not in {MODE_OFF, MODE_RECORD, MODE_REPLAY}:
+        raise ValueError(f"Unsupported LLM_CASSETTE_MODE '{settings.llm_cassette_mode}'")
+    return value
+
+
+def recording() -> bool:
+    return mode() == MODE_RECORD
+
+
+def replaying() -> bool:
+    return mode() == MODE_REPLAY
+
+
+def _path() -> Path:
+    raw = (settings.llm_cassette_path or "").strip()
+    if raw:
+        return Path(raw)
+    return Path(settings.chroma_persist_path).parent / "llm_cassette.jsonl"
+
+
+def _key(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _encode_vector(vector: list[float]) -> str:
+    # float16 keeps cassettes small; the precision is ample for similarity search.
+    return base64.b64encode(struct.pack(f"<{len(vector)}e", *vector)).decode("ascii")
+
+
+def _decode_vector(raw: str) -> list[float]:
+    data = base64.b64decode(raw)
+    return list(struct.unpack(f"<{len(data) // 2}e", data))
+
+
+def _ensure_loaded() -> None:
+    # Caller holds _lock.
+    global _loaded_path
+    path = _path()
+    if _loaded_path == path:
+        return
+    _entries.clear()
+    if path.exists():
+        with path.open("r", encoding="utf-8") as handle:
+            for line_number, line in enumerate(handle, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    _entries[(entry["kind"], entry["key"])] = entry
+                except (ValueError, KeyError) as exc:
+                    logger.warning("Skipping malformed cassette line %d in %s: %s", line_number, path, exc)
+    _loaded_path = path
+
+
+def _append(entries: list[dict]) -> None:
+    path = _path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        _ensure_loaded()
+        with path.open("a", encoding="utf-8") as handle:
+            for entry in entries:
+                handle.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                _entries[(entry["kind"], entry["key"])] = entry
+        _stats["recorded"] += len(entries)
+
+
+def _lookup(kind: str, key: str) -> dict:
+    with _lock:
+        _ensure_loaded()
+        entry = _entries.get((kind, key))
+        if entry is None:
+            _stats["misses"] += 1
+            raise CassetteMiss(f"No recorded {kind} response in cassette {_path()}")
+        _stats["replayed"] += 1
+        return entry
+
+
+def _replay_delay(recorded: float) -> float:
+    if (settings.llm_cassette_replay_latency or "zero").strip().lower() == "recorded":
+        return max(recorded, 0.0)
+    return 0.0
+
+
+def record_embeddings(
+    provider: str,
+    model: str,
+    task_type: str,
+    texts: list[str],
+    vectors: list[list[float]],
+    elapsed: float,
+) -> None:
+    # Entries are per text so replay works for any batching or cache-miss subset of the recording.
+    share = elapsed / len(texts) if texts else 0.0
+    _append(
+        [
+            {
+                "kind": _EMBED,
+                "key": _key(provider, model, task_type, text),
+                "vector": _encode_vector(vector),
+                "latency": round(share, 6),
+            }
+            for text, vector in zip(texts, vectors)
+        ]
+    )
+
+
+def replay_embeddings(
+    provider: str, model: str, task_type: str, texts: list[str]
+) -> tuple[list[list[float]], float]:
+    vectors: list[list[float]] = []
+    recorded = 0.0
+    for text in texts:
+        entry = _lookup(_EMBED, _key(provider, model, task_type, text))
+        vectors.append(_decode_vector(entry["vector"]))
+        recorded += float(entry.get("latency") or 0.0)
+    return vectors, _replay_delay(recorded)
+
+
+def record_response(
+    provider: str,
+    model: str,
+    temperature: Optional[float],
+    prompt: str,
+    response: str,
+    elapsed: float,
+) -> None:
+    _append(
+        [
+            {
+                "kind": _GENERATE,
+                "key": _key(provider, model, repr(temperature), prompt),
+                "response": response,
+                "latency": round(elapsed, 6),
+            }
+        ]
+    )
+
+
+def replay_response(
+    provider: str, model: str, temperature: Optional[float], prompt: str
+) -> tuple[str, float]:
+    entry = _lookup(_GENERATE, _key(provider, model, repr(temperature), prompt))
+    return entry["response"], _replay_delay(float(entry.get("latency") or 0.0))
+
+
+def stats() -> dict:
+    with _lock:
+        snapshot = dict(_stats)
+        snapshot["entries"] = len(_entries) if _loaded_path is not None else 0
+    snapshot["mode"] = mode()
+    snapshot["path"] = str(_path())
+    return snapshot
+
+
+def reset() -> None:
+    global _loaded_path
+    with _lock:
+        _loaded_path = None
+        _entries.clear()
+        for key in _stats:
+            _stats[key] = 0
@@ -2,18 +2,26 @@ from __future__ import annotations
 
 import hashlib
 import logging
+import math
 import re
+import sqlite3
+import threading
+import time
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Sequence
 
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 
+from . import ingest_manifest, lexical_index, local_service
 from .config import settings
-from .llm_service import embed_texts
+from .llm_service import aembed_texts, embed_texts
 
 logger = logging.getLogger(__name__)
 
+_LEXICAL_BACKFILL_PAGE = 5000
+_MANIFEST_BACKFILL_PAGE = 5000
+
 @dataclass
 class ChunkRecord:
     doc_id: str
@@ -21,8 +29,12 @@ class ChunkRecord:
     metadata: dict
 
 
-def _content_hash(text: str) -> str:
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+@dataclass
+class StoredChunk:
+    doc_id: str
+    text: str
+    metadata: dict
+    embedding: list[float]
 
 
 _STOPWORDS = {
@@ -76,141 +88,740 @@ def _embedding_fingerprint() -> str:
         model = settings.openai_embed_model
     elif provider == "gemini":
         model = settings.gemini_embed_model
+    elif provider == "local":
+        model = local_service.embed_model_name()
     else:
         model = "unknown"
     fingerprint = f"{provider}-{model}".lower()
     return re.sub(r"[^a-z0-9]+", "-", fingerprint).strip("-")
 
 
-def _collection_name() -> str:
-    override = (settings.chroma_collection or "").strip()
-    if override:
-        return override
-    return f"documents-{_embedding_fingerprint()}"
+# Chroma collection names are limited to 63 characters.
+_MAX_COLLECTION_NAME = 63
+
+
+def _bounded_name(name: str) -> str:
+    if len(name) <= _MAX_COLLECTION_NAME:
+        return name
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+    return f"{name[: _MAX_COLLECTION_NAME - 9].rstrip('-_')}-{digest}"
+
+
+def _suffixed_name(name: str, suffix: str) -> str:
+    """``name + suffix`` within Chroma's length limit; a long ``name`` is shortened and hashed, the suffix kept."""
+    if len(name) + len(suffix) <= _MAX_COLLECTION_NAME:
+        return f"{name}{suffix}"
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+    head = name[: _MAX_COLLECTION_NAME - len(suffix) - 9].rstrip("-_")
+    return f"{head}-{digest}{suffix}"
+
+
+def _drop_collection(client: Any, name: str) -> None:
+    try:
+        client.delete_collection(name)
+    except ValueError:
+        pass
+
 
+def normalize_namespace(namespace: str | None) -> str:
+    """Slug for a project namespace; "" is the default, shared namespace."""
+    raw = (namespace or "").strip().lower()
+    if not raw or raw == "default":
+        return ""
+    slug = re.sub(r"[^a-z0-9]+", "-", raw).strip("-")
+    if not slug:
+        raise ValueError(f"Invalid namespace '{namespace}'")
+    return slug
 
-def _log_dimension_mismatch(exc: Exception) -> None:
-    collection_name = _collection_name()
+
+def _collection_name(namespace: str = "") -> str:
+    override = (settings.chroma_collection or "").strip()
+    base = override or f"documents-{_embedding_fingerprint()}"
+    namespace = normalize_namespace(namespace)
+    if not namespace:
+        return base
+    return _bounded_name(f"{base}-ns-{namespace}")
+
+
+def _source_groups() -> dict[str, str]:
+    """Parse CHROMA_SOURCE_GROUPS, e.g. ``project=confluence;baseline=baseline_web,sfcc``, into source -> group.
+
+    A bare source (``sfcc``) is its own group.
+    """
+    routes: dict[str, str] = {}
+    for raw_group in (settings.chroma_source_groups or "").split(";"):
+        raw_group = raw_group.strip()
+        if not raw_group:
+            continue
+        group, _, raw_sources = raw_group.partition("=")
+        sources = [source.strip() for source in (raw_sources or group).split(",") if source.strip()]
+        name = re.sub(r"[^a-z0-9]+", "-", group.strip().lower()).strip("-")
+        if not name:
+            raise ValueError(f"Invalid CHROMA_SOURCE_GROUPS entry '{raw_group}'")
+        for source in sources:
+            routes[source] = name
+    return routes
+
+
+# hnswlib's defaults, which is what collections created without metadata are running with.
+_HNSW_DEFAULTS = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+
+
+def collection_metadata() -> dict[str, Any]:
+    space = (settings.chroma_hnsw_space or "cosine").strip().lower()
+    if space not in {"cosine", "l2", "ip"}:
+        raise ValueError(f"Unsupported CHROMA_HNSW_SPACE '{settings.chroma_hnsw_space}'")
+    return {
+        "hnsw:space": space,
+        "hnsw:M": int(settings.chroma_hnsw_m),
+        "hnsw:construction_ef": int(settings.chroma_hnsw_construction_ef),
+        "hnsw:search_ef": int(settings.chroma_hnsw_search_ef),
+    }
+
+
+def _hnsw_config(metadata: dict | None) -> dict[str, Any]:
+    metadata = metadata or {}
+    return {key: metadata.get(key, default) for key, default in _HNSW_DEFAULTS.items()}
+
+
+def open_collection(client: Any, name: str, create: bool = True) -> Any:
+    """Open ``name`` with the configured HNSW settings, creating it if needed (and ``create`` is set).
+
+    Index parameters are fixed when a collection is created, and ``get_or_create_collection`` would
+    overwrite the metadata of an existing collection without changing its index. Existing collections
+    are therefore opened as-is; a mismatch is logged and fixed with ``scripts/migrate_collection.py``.
+    """
+    desired = collection_metadata()
+    try:
+        collection = client.get_collection(name)
+    except ValueError:
+        if not create:
+            raise
+        return client.get_or_create_collection(name, metadata=desired)
+    current = _hnsw_config(collection.metadata)
+    if current != _hnsw_config(desired):
+        logger.warning(
+            "Chroma collection '%s' uses %s but settings ask for %s. "
+            "Run scripts/migrate_collection.py to rebuild it without re-embedding.",
+            name,
+            current,
+            _hnsw_config(desired),
+        )
+    return collection
+
+
+def collections_to_migrate(client: Any) -> list[str]:
+    """This deployment's collections (base, source groups and namespaces) whose HNSW settings are out of date."""
+    base = _collection_name()
+    desired = _hnsw_config(collection_metadata())
+    names = []
+    for collection in client.list_collections():
+        name = collection.name
+        if name != base and not name.startswith(f"{base}-"):
+            continue
+        # Leftovers of earlier migrations are not live collections.
+        if name.endswith("-migrating") or re.search(r"-backup-\d+$", name):
+            continue
+        if _hnsw_config(collection.metadata) != desired:
+            names.append(name)
+    return sorted(names)
+
+
+def migrate_collection(client: Any, name: str, page_size: int = 5000, keep_backup: bool = True) -> dict:
+    """Rebuild ``name`` with the configured HNSW settings, copying stored embeddings (no provider calls)."""
+    source = client.get_collection(name)
+    target_name = _suffixed_name(name, "-migrating")
+    _drop_collection(client, target_name)
+    target = client.create_collection(target_name, metadata=collection_metadata())
+    batch_size = max(1, min(page_size, client.get_max_batch_size()))
+    copied = 0
+    try:
+        while True:
+            page = source.get(
+                include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=copied
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            target.add(
+                ids=ids,
+                embeddings=page["embeddings"],
+                metadatas=page["metadatas"],
+                documents=page["documents"],
+            )
+            copied += len(ids)
+        if target.count() != source.count():
+            raise RuntimeError(
+                f"Migration of '{name}' copied {target.count()} of {source.count()} chunks; original left untouched"
+            )
+        backup_name = ""
+        if keep_backup:
+            backup_name = _suffixed_name(name, f"-backup-{int(time.time())}")
+            source.modify(name=backup_name)
+            try:
+                # Same name and ids, so the lexical index and ingest manifest stay valid.
+                target.modify(name=name)
+            except BaseException:
+                source.modify(name=name)
+                raise
+        else:
+            client.delete_collection(name)
+            target.modify(name=name)
+    except BaseException:
+        # Drop the copy unless it has become the only one (original deleted, rename failed).
+        if target.name != name and name in {collection.name for collection in client.list_collections()}:
+            _drop_collection(client, target_name)
+        raise
+    return {
+        "collection": name,
+        "copied": copied,
+        "previous": _hnsw_config(source.metadata),
+        "current": _hnsw_config(target.metadata),
+        "backup": backup_name,
+    }
+
+
+def _log_dimension_mismatch(exc: Exception, collection_name: str) -> None:
     provider = (settings.llm_provider or "gemini").strip().lower()
-    embed_model = (
-        settings.openai_embed_model if provider == "openai" else settings.gemini_embed_model
-    )
+    if provider == "openai":
+        embed_model, setting = settings.openai_embed_model, "OPENAI_EMBED_MODEL"
+    elif provider == "local":
+        embed_model, setting = local_service.embed_model_name(), "LOCAL_EMBED_DIM"
+    else:
+        embed_model, setting = settings.gemini_embed_model, "GEMINI_EMBED_MODEL"
     logger.error(
         "Chroma embedding dimension mismatch for collection '%s'. "
         "provider=%s embed_model=%s persist_path=%s error=%s. "
         "Fix: re-ingest into a fresh collection (delete persist dir or set CHROMA_COLLECTION), "
-        "or switch EMBED_MODEL to match existing collection.",
+        "or switch %s to match existing collection.",
         collection_name,
         provider,
         embed_model,
         settings.chroma_persist_path,
         exc,
+        setting,
     )
 
 
+# (id, document, metadata, distance)
+_Candidate = tuple[str, str, dict, float]
+
+
+def _rerank(query_text: str, candidates: list[_Candidate]) -> list[_Candidate]:
+    lexical_weight = max(0.0, min(settings.rerank_lexical_weight, 1.0))
+    semantic_weight = 1.0 - lexical_weight
+
+    scored = []
+    for candidate in candidates:
+        _, doc, _, dist = candidate
+        semantic = max(0.0, min(1.0, 1.0 - dist))
+        lexical = _lexical_overlap(query_text, doc or "")
+        combined = (semantic_weight * semantic) + (lexical_weight * lexical)
+        scored.append((combined, candidate))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [candidate for _, candidate in scored]
+
+
+def _filter_sources(where_filter: dict[str, Any] | None) -> tuple[bool, list[str] | None]:
+    """Sources a Chroma ``where`` restricts to: (True, None) for no filter, (False, None) if not a plain source filter."""
+    if not where_filter:
+        return True, None
+    if set(where_filter) != {"source"}:
+        return False, None
+    condition = where_filter["source"]
+    if isinstance(condition, str):
+        return True, [condition]
+    if isinstance(condition, dict) and len(condition) == 1:
+        operator, value = next(iter(condition.items()))
+        if operator == "$eq" and isinstance(value, str):
+            return True, [value]
+        if operator == "$in" and isinstance(value, list):
+            return True, [str(item) for item in value]
+    return False, None
+
+
+def _distance(space: str, query: Sequence[float], vector: Sequence[float]) -> float:
+    # Matches hnswlib's definitions so fused lexical hits are comparable with vector hits.
+    dot = sum(a * b for a, b in zip(query, vector))
+    if space == "ip":
+        return 1.0 - dot
+    if space == "cosine":
+        norms = math.sqrt(sum(a * a for a in query)) * math.sqrt(sum(b * b for b in vector))
+        return 1.0 - (dot / norms if norms else 0.0)
+    return sum((a - b) * (a - b) for a, b in zip(query, vector))
+
+
+def _response(candidates: list[_Candidate]) -> dict:
+    return {
+        "ids": [[item[0] for item in candidates]],
+        "documents": [[item[1] for item in candidates]],
+        "metadatas": [[item[2] for item in candidates]],
+        "distances": [[item[3] for item in candidates]],
+    }
+
+
+def _lexical_rows(ids: list[str], documents: list[str], metadatas: list[dict]) -> list[tuple[str, str, str, str]]:
+    return [
+        (
+            doc_id,
+            document or "",
+            str((metadata or {}).get("source") or ""),
+            str((metadata or {}).get("source_id") or ""),
+        )
+        for doc_id, document, metadata in zip(ids, documents, metadatas)
+    ]
+
+
+class UnknownNamespace(LookupError):
+    """A namespace that has no collection yet; only ingest creates one."""
+
+
 class ChromaService:
-    def __init__(self) -> None:
+    def __init__(self, namespace: str = "", create: bool = True) -> None:
+        self.namespace = normalize_namespace(namespace)
         self.client = chromadb.PersistentClient(
             path=settings.chroma_persist_path,
             settings=ChromaSettings(anonymized_telemetry=False),
         )
-        self.collection = self.client.get_or_create_collection(_collection_name())
-
-    def upsert_chunks(self, records: list[ChunkRecord], task_type: str) -> int:
+        # Sources without a group stay in the base collection.
+        try:
+            self.collection = open_collection(self.client, _collection_name(self.namespace), create=create)
+        except ValueError as exc:
+            raise UnknownNamespace(f"Unknown namespace '{namespace}'") from exc
+        self._routes = {
+            source: _bounded_name(f"{self.collection.name}-{group}") for source, group in _source_groups().items()
+        }
+        self._collections = {self.collection.name: self.collection}
+        for name in sorted(set(self._routes.values())):
+            self._collections[name] = open_collection(self.client, name)
+        self._lexical_ready = False
+        self._lexical_lock = threading.Lock()
+        self._manifest_ready = False
+        self._manifest_lock = threading.Lock()
+
+    def _collection_for(self, source: str) -> Any:
+        return self._collections[self._routes.get(source, self.collection.name)]
+
+    def _by_collection(self, records: list[ChunkRecord]) -> dict[str, list[ChunkRecord]]:
+        grouped: dict[str, list[ChunkRecord]] = {}
+        for record in records:
+            name = self._collection_for(str(record.metadata.get("source") or "")).name
+            grouped.setdefault(name, []).append(record)
+        return grouped
+
+    def _query_targets(self, where_filter: dict[str, Any] | None) -> list[tuple[Any, dict[str, Any] | None]]:
+        """Collections a filtered query has to visit, each with the ``where`` it still needs."""
+        supported, sources = _filter_sources(where_filter)
+        if not supported or sources is None:
+            return [(collection, where_filter) for collection in self._collections.values()]
+        wanted: dict[str, list[str]] = {}
+        for source in sources:
+            wanted.setdefault(self._collection_for(source).name, []).append(source)
+        targets = []
+        for name, group_sources in wanted.items():
+            routed = {source for source, target in self._routes.items() if target == name}
+            if name != self.collection.name and set(group_sources) == routed:
+                # The collection holds exactly these sources: a plain HNSW search, no filtering.
+                targets.append((self._collections[name], None))
+            else:
+                targets.append((self._collections[name], {"source": {"$in": group_sources}}))
+        return targets
+
+    def upsert_chunks(
+        self,
+        records: list[ChunkRecord],
+        task_type: str,
+        known_embeddings: dict[str, list[float]] | None = None,
+    ) -> int:
+        """Embed and store ``records``; ids in ``known_embeddings`` reuse that vector instead of being embedded."""
         if not records:
             return 0
 
-        embeddings = embed_texts([r.text for r in records], task_type=task_type)
-        ids = [r.doc_id for r in records]
-        metadatas = [r.metadata for r in records]
-        documents = [r.text for r in records]
-
-        try:
-            self.collection.upsert(
-                ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents
-            )
-        except Exception as exc:
-            if "InvalidDimensionException" in exc.__class__.__name__:
-                _log_dimension_mismatch(exc)
-            raise
+        known_embeddings = known_embeddings or {}
+        missing = [r for r in records if r.doc_id not in known_embeddings]
+        fresh = embed_texts([r.text for r in missing], task_type=task_type) if missing else []
+        vectors = {**known_embeddings, **{r.doc_id: vector for r, vector in zip(missing, fresh)}}
+
+        batch_size = self.client.get_max_batch_size()
+        for name, group in self._by_collection(records).items():
+            ids = [r.doc_id for r in group]
+            metadatas = [r.metadata for r in group]
+            documents = [r.text for r in group]
+            try:
+                for start in range(0, len(ids), batch_size):
+                    end = start + batch_size
+                    self._collections[name].upsert(
+                        ids=ids[start:end],
+                        embeddings=[vectors[doc_id] for doc_id in ids[start:end]],
+                        metadatas=metadatas[start:end],
+                        documents=documents[start:end],
+                    )
+            except Exception as exc:
+                if "InvalidDimensionException" in exc.__class__.__name__:
+                    _log_dimension_mismatch(exc, name)
+                raise
+            if lexical_index.enabled():
+                self.backfill_lexical_index()
+                try:
+                    lexical_index.upsert(name, _lexical_rows(ids, documents, metadatas))
+                except sqlite3.Error as exc:
+                    logger.warning("Lexical index update failed: %s", exc)
         return len(records)
 
-    def query(self, query_text: str, top_k: int, where_filter: dict[str, Any] | None = None) -> dict:
-        query_embedding = embed_texts([query_text], task_type="retrieval_query")[0]
+    def get_source_chunks(self, source: str, source_id: str) -> list[StoredChunk]:
+        results = self._collection_for(source).get(
+            where={"$and": [{"source": source}, {"source_id": source_id}]},
+            include=["documents", "metadatas", "embeddings"],
+        )
+        ids = results.get("ids") or []
+        if not ids:
+            return []
+        return [
+            StoredChunk(
+                doc_id=doc_id,
+                text=document or "",
+                metadata=metadata or {},
+                embedding=[float(value) for value in embedding],
+            )
+            for doc_id, document, metadata, embedding in zip(
+                ids, results["documents"], results["metadatas"], results["embeddings"]
+            )
+        ]
+
+    def update_chunk_metadata(self, records: list[ChunkRecord]) -> None:
+        # Text is unchanged for these ids, so neither the vector nor the lexical index needs touching.
+        batch_size = self.client.get_max_batch_size()
+        for name, group in self._by_collection(records).items():
+            for start in range(0, len(group), batch_size):
+                batch = group[start : start + batch_size]
+                self._collections[name].update(ids=[r.doc_id for r in batch], metadatas=[r.metadata for r in batch])
+
+    def delete_chunks(self, source: str, doc_ids: list[str]) -> None:
+        if not doc_ids:
+            return
+        collection = self._collection_for(source)
+        collection.delete(ids=doc_ids)
+        if lexical_index.enabled():
+            self.backfill_lexical_index()
+            try:
+                lexical_index.delete_ids(collection.name, doc_ids)
+            except sqlite3.Error as exc:
+                logger.warning("Lexical index delete failed for %d chunks: %s", len(doc_ids), exc)
+
+    def embed_query(self, query_text: str) -> list[float]:
+        return embed_texts([query_text], task_type="retrieval_query")[0]
+
+    def embed_queries(self, query_texts: list[str]) -> list[list[float]]:
+        return embed_texts(query_texts, task_type="retrieval_query")
+
+    async def aembed_queries(self, query_texts: list[str]) -> list[list[float]]:
+        return await aembed_texts(query_texts, task_type="retrieval_query")
+
+    def query(
+        self,
+        query_text: str,
+        top_k: int,
+        where_filter: dict[str, Any] | None = None,
+        query_embedding: list[float] | None = None,
+    ) -> dict:
+        # Callers that fan one query out to several scopes pass the vector from embed_query().
+        if query_embedding is None:
+            query_embedding = self.embed_query(query_text)
+        return self.query_many([query_text], top_k, where_filter, query_embeddings=[query_embedding])[0]
+
+    def query_many(
+        self,
+        query_texts: list[str],
+        top_k: int,
+        where_filter: dict[str, Any] | None = None,
+        query_embeddings: list[list[float]] | None = None,
+    ) -> list[dict]:
+        """Run several queries with one batched embedding call and one query per collection involved.
+
+        Returns one response per query text, each shaped like :meth:`query`'s.
+        """
+        if not query_texts:
+            return []
+        if query_embeddings is None:
+            query_embeddings = self.embed_queries(query_texts)
         n_results = top_k
         if settings.rerank_enabled:
             n_results = max(top_k, settings.rerank_candidates)
-        query_kwargs: dict[str, Any] = {
-            "query_embeddings": [query_embedding],
-            "n_results": n_results,
-            "include": ["documents", "metadatas", "distances"],
-        }
-        if where_filter:
-            query_kwargs["where"] = where_filter
-        try:
-            response = self.collection.query(**query_kwargs)
-        except Exception as exc:
-            if "InvalidDimensionException" in exc.__class__.__name__:
-                _log_dimension_mismatch(exc)
-            raise
-        if not settings.rerank_enabled:
-            return response
-
-        documents = response["documents"][0]
-        metadatas = response["metadatas"][0]
-        distances = response["distances"][0]
-
-        lexical_weight = max(0.0, min(settings.rerank_lexical_weight, 1.0))
-        semantic_weight = 1.0 - lexical_weight
-
-        scored = []
-        for doc, meta, dist in zip(documents, metadatas, distances):
-            semantic = max(0.0, min(1.0, 1.0 - dist))
-            lexical = _lexical_overlap(query_text, doc or "")
-            combined = (semantic_weight * semantic) + (lexical_weight * lexical)
-            scored.append((combined, doc, meta, dist))
-
-        scored.sort(key=lambda item: item[0], reverse=True)
-        top_scored = scored[:top_k]
-
-        return {
-            "documents": [[item[1] for item in top_scored]],
-            "metadatas": [[item[2] for item in top_scored]],
-            "distances": [[item[3] for item in top_scored]],
-        }
 
-    def should_skip(self, source: str, source_id: str, content: str) -> bool:
-        content_hash = _content_hash(content)
-        results = self.collection.get(
-            where={"$and": [{"source": source}, {"source_id": source_id}]},
-            include=["metadatas"],
+        targets = self._query_targets(where_filter)
+        merged: list[list[_Candidate]] = [[] for _ in query_texts]
+        for collection, where in targets:
+            query_kwargs: dict[str, Any] = {
+                "query_embeddings": query_embeddings,
+                "n_results": n_results,
+                "include": ["documents", "metadatas", "distances"],
+            }
+            if where:
+                query_kwargs["where"] = where
+            try:
+                response = collection.query(**query_kwargs)
+            except Exception as exc:
+                if "InvalidDimensionException" in exc.__class__.__name__:
+                    _log_dimension_mismatch(exc, collection.name)
+                raise
+            for index in range(len(query_texts)):
+                merged[index].extend(
+                    zip(
+                        response["ids"][index],
+                        response["documents"][index],
+                        response["metadatas"][index],
+                        response["distances"][index],
+                    )
+                )
+        if len(targets) > 1:
+            merged = [sorted(candidates, key=lambda item: item[3])[:n_results] for candidates in merged]
+
+        collections = [collection for collection, _ in targets]
+        lexical_hits: list[list[str]] = [[] for _ in query_texts]
+        supported, sources = _filter_sources(where_filter)
+        if lexical_index.enabled() and supported and self._lexical_searchable():
+            lexical_hits = lexical_index.search_many(
+                [collection.name for collection in collections],
+                query_texts,
+                sources,
+                settings.lexical_candidates,
+            )
+
+        lexical_only = self._fetch_lexical_only(merged, lexical_hits, collections)
+        results = []
+        for index, query_text in enumerate(query_texts):
+            candidates = merged[index]
+            if settings.rerank_enabled:
+                candidates = _rerank(query_text, candidates)
+            if lexical_hits[index]:
+                candidates = self._fuse_lexical(query_embeddings[index], candidates, lexical_hits[index], lexical_only)
+            results.append(_response(candidates[:top_k]))
+        return results
+
+    def _fetch_lexical_only(
+        self, merged: list[list[_Candidate]], lexical_hits: list[list[str]], collections: list[Any]
+    ) -> dict[str, tuple[str, dict, list[float], str]]:
+        """Chunks the BM25 lists add to the vector results, with one ``get`` per collection for the whole batch.
+
+        Maps doc id to (document, metadata, embedding, distance space).
+        """
+        missing: set[str] = set()
+        for candidates, hits in zip(merged, lexical_hits):
+            found = {candidate[0] for candidate in candidates}
+            missing.update(doc_id for doc_id in hits if doc_id not in found)
+        fetched: dict[str, tuple[str, dict, list[float], str]] = {}
+        for collection in collections:
+            if not missing:
+                break
+            page = collection.get(ids=sorted(missing), include=["documents", "metadatas", "embeddings"])
+            space = (collection.metadata or {}).get("hnsw:space", "l2")
+            for doc_id, doc, meta, embedding in zip(
+                page["ids"], page["documents"], page["metadatas"], page["embeddings"]
+            ):
+                fetched[doc_id] = (doc, meta, embedding, space)
+            missing.difference_update(page["ids"])
+        return fetched
+
+    def _fuse_lexical(
+        self,
+        query_embedding: Sequence[float],
+        candidates: list[_Candidate],
+        lexical_ids: list[str],
+        lexical_only: dict[str, tuple[str, dict, list[float], str]],
+    ) -> list[_Candidate]:
+        # Reciprocal rank fusion of the (reranked) vector list and the BM25 list.
+        rrf_k = max(1, settings.lexical_rrf_k)
+        scores: dict[str, float] = {}
+        for rank, candidate in enumerate(candidates):
+            scores[candidate[0]] = scores.get(candidate[0], 0.0) + 1.0 / (rrf_k + rank + 1)
+        for rank, doc_id in enumerate(lexical_ids):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+
+        by_id = {candidate[0]: candidate for candidate in candidates}
+        for doc_id in lexical_ids:
+            if doc_id not in by_id and doc_id in lexical_only:
+                doc, meta, embedding, space = lexical_only[doc_id]
+                by_id[doc_id] = (doc_id, doc, meta, _distance(space, query_embedding, embedding))
+
+        # Ids the index still knows but the collections no longer have are dropped here.
+        ordered = sorted((doc_id for doc_id in scores if doc_id in by_id), key=lambda doc_id: -scores[doc_id])
+        return [by_id[doc_id] for doc_id in ordered]
+
+    def _lexical_searchable(self) -> bool:
+        # Queries never backfill (that is startup's and ingest's job); until then they use vector results only.
+        if not self._lexical_ready:
+            try:
+                self._lexical_ready = all(lexical_index.is_backfilled(name) for name in self._collections)
+            except sqlite3.Error as exc:
+                logger.warning("Lexical index unavailable: %s", exc)
+        return self._lexical_ready
+
+    def backfill_lexical_index(self) -> None:
+        """Index chunks of collections populated before the lexical index existed; a no-op once done."""
+        if self._lexical_ready or not lexical_index.enabled():
+            return
+        with self._lexical_lock:
+            if self._lexical_ready:
+                return
+            try:
+                for name, collection in self._collections.items():
+                    if lexical_index.is_backfilled(name):
+                        continue
+                    # Collections populated before the index existed are indexed once, page by page.
+                    total = 0
+                    offset = 0
+                    while True:
+                        page = collection.get(
+                            include=["documents", "metadatas"],
+                            limit=_LEXICAL_BACKFILL_PAGE,
+                            offset=offset,
+                        )
+                        ids = page.get("ids") or []
+                        if not ids:
+                            break
+                        lexical_index.upsert(name, _lexical_rows(ids, page["documents"], page["metadatas"]))
+                        total += len(ids)
+                        offset += len(ids)
+                    lexical_index.mark_backfilled(name)
+                    logger.info("Backfilled lexical index for collection '%s' with %d chunks", name, total)
+                self._lexical_ready = True
+            except sqlite3.Error as exc:
+                logger.warning("Lexical index unavailable for collection '%s': %s", self.collection.name, exc)
+
+    def _ensure_manifest(self) -> None:
+        if self._manifest_ready:
+            return
+        with self._manifest_lock:
+            if self._manifest_ready:
+                return
+            for name, collection in self._collections.items():
+                if ingest_manifest.is_backfilled(name):
+                    continue
+                # Collections ingested before the manifest existed are summarised once from chunk metadata.
+                entries: dict[tuple[str, str], ingest_manifest.ManifestEntry] = {}
+                offset = 0
+                while True:
+                    page = collection.get(include=["metadatas"], limit=_MANIFEST_BACKFILL_PAGE, offset=offset)
+                    ids = page.get("ids") or []
+                    if not ids:
+                        break
+                    for doc_id, metadata in zip(ids, page["metadatas"]):
+                        metadata = metadata or {}
+                        source = str(metadata.get("source") or "").strip()
+                        source_id = str(metadata.get("source_id") or "").strip()
+                        if not source or not source_id:
+                            continue
+                        entry = entries.setdefault(
+                            (source, source_id),
+                            ingest_manifest.ManifestEntry(
+                                source=source,
+                                source_id=source_id,
+                                content_hash=str(metadata.get("content_hash") or ""),
+                                space_key=str(metadata.get("space_key") or ""),
+                                source_updated_at=str(metadata.get("updated_at") or ""),
+                            ),
+                        )
+                        entry.chunk_ids.append(doc_id)
+                    offset += len(ids)
+                count = ingest_manifest.backfill(name, entries.values())
+                logger.info("Backfilled ingest manifest for collection '%s' with %d sources", name, count)
+            self._manifest_ready = True
+
+    def manifest_entries(self, source: str) -> dict[str, ingest_manifest.ManifestEntry]:
+        """Everything ingested for ``source``, keyed by source_id; load once per ingest run."""
+        self._ensure_manifest()
+        return ingest_manifest.load(self._collection_for(source).name, source)
+
+    def record_manifest(
+        self,
+        source: str,
+        source_id: str,
+        content_hash: str,
+        chunk_ids: list[str],
+        space_key: str = "",
+        source_updated_at: str = "",
+    ) -> None:
+        self._ensure_manifest()
+        ingest_manifest.record(
+            self._collection_for(source).name,
+            source,
+            source_id,
+            content_hash,
+            chunk_ids,
+            space_key=space_key,
+            source_updated_at=source_updated_at,
         )
-        if not results or not results.get("metadatas"):
-            return False
-        for metadata in results["metadatas"]:
-            if metadata and metadata.get("content_hash") == content_hash:
-                return True
-        return False
+
+    def should_skip(
+        self,
+        source: str,
+        source_id: str,
+        content_hash: str,
+        manifest: dict[str, ingest_manifest.ManifestEntry] | None = None,
+    ) -> bool:
+        if manifest is not None:
+            entry = manifest.get(source_id)
+        else:
+            self._ensure_manifest()
+            entry = ingest_manifest.get(self._collection_for(source).name, source, source_id)
+        return entry is not None and entry.content_hash == content_hash
 
     def delete_source(self, source: str, source_id: str) -> None:
-        self.collection.delete(where={"$and": [{"source": source}, {"source_id": source_id}]})
+        collection = self._collection_for(source)
+        collection.delete(where={"$and": [{"source": source}, {"source_id": source_id}]})
+        self._ensure_manifest()
+        ingest_manifest.delete(collection.name, source, source_id)
+        if lexical_index.enabled():
+            self.backfill_lexical_index()
+            try:
+                lexical_index.delete_source(collection.name, source, source_id)
+            except sqlite3.Error as exc:
+                logger.warning("Lexical index delete failed for %s:%s: %s", source, source_id, exc)
 
     def list_source_ids(self, source: str, space_keys: set[str] | None = None) -> set[str]:
-        results = self.collection.get(where={"source": source}, include=["metadatas"])
-        if not results or not results.get("metadatas"):
-            return set()
-
-        normalized_spaces = {space.strip() for space in (space_keys or set()) if space.strip()}
-        source_ids: set[str] = set()
-        for metadata in results["metadatas"]:
-            if not metadata:
-                continue
-            source_id = str(metadata.get("source_id") or "").strip()
-            if not source_id:
-                continue
-            if normalized_spaces:
-                space_key = str(metadata.get("space_key") or "").strip()
-                if space_key not in normalized_spaces:
-                    continue
-            source_ids.add(source_id)
-        return source_ids
+        return ingest_manifest.source_ids(self.manifest_entries(source), space_keys)
+
+    def rebalance_collections(self, page_size: int = 5000) -> dict[str, int]:
+        """Move chunks stored under the wrong collection for CHROMA_SOURCE_GROUPS, keeping their embeddings.
+
+        Returns the number of chunks moved into each collection.
+        """
+        self.backfill_lexical_index()
+        self._ensure_manifest()
+        batch_size = max(1, min(page_size, self.client.get_max_batch_size()))
+        moved: dict[str, int] = {}
+        moved_sources: set[tuple[str, str, str]] = set()
+        for name, collection in list(self._collections.items()):
+            offset = 0
+            while True:
+                page = collection.get(
+                    include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset
+                )
+                ids = page.get("ids") or []
+                if not ids:
+                    break
+                outgoing: dict[str, list[int]] = {}
+                for position, metadata in enumerate(page["metadatas"]):
+                    target = self._collection_for(str((metadata or {}).get("source") or "")).name
+                    if target != name:
+                        outgoing.setdefault(target, []).append(position)
+                for target, positions in outgoing.items():
+                    target_ids = [ids[position] for position in positions]
+                    self._collections[target].upsert(
+                        ids=target_ids,
+                        embeddings=[page["embeddings"][position] for position in positions],
+                        metadatas=[page["metadatas"][position] for position in positions],
+                        documents=[page["documents"][position] for position in positions],
+                    )
+                    collection.delete(ids=target_ids)
+                    if lexical_index.enabled():
+                        lexical_index.move(name, target, target_ids)
+                    for position in positions:
+                        moved_sources.add((name, target, str(page["metadatas"][position]["source"])))
+                    moved[target] = moved.get(target, 0) + len(target_ids)
+                # Moved rows are gone from this collection, so only the kept ones advance the offset.
+                offset += len(ids) - sum(len(positions) for positions in outgoing.values())
+        for old, new, source in moved_sources:
+            ingest_manifest.move(old, new, source)
+        return moved
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import hashlib
 from typing import Iterable
 
+# About one line in this many is an anchor: a chunk that is at least half full ends after it.
+_ANCHOR_EVERY = 4
+
 
 def chunk_text(text: str, chunk_words: int, overlap_words: int) -> list[str]:
     words = text.split()
@@ -20,6 +24,59 @@ def chunk_text(text: str, chunk_words: int, overlap_words: int) -> list[str]:
     return chunks
 
 
+def _is_anchor(words: list[str]) -> bool:
+    # Decided by the line's own text, so the same line ends a chunk wherever it moves to.
+    return hashlib.sha1(" ".join(words).encode("utf-8")).digest()[0] % _ANCHOR_EVERY == 0
+
+
+def chunk_document(text: str, chunk_words: int, overlap_words: int) -> list[str]:
+    """Split ``text`` into chunks that end on line boundaries chosen by the content.
+
+    With fixed word windows, a few words inserted near the top shift every later chunk. Here a chunk
+    ends after an anchor line once it is half full, or before a line that would take it past
+    ``chunk_words``, so an edit only changes chunks up to the next anchor and the rest keep their text.
+    Lines longer than ``chunk_words`` are windowed on their own. Each chunk repeats the whole trailing
+    lines of the previous one that fit in ``overlap_words``.
+    """
+    chunk_words = max(chunk_words, 1)
+    lines: list[list[str]] = []
+    for line in text.splitlines():
+        words = line.split()
+        if len(words) > chunk_words:
+            lines.extend(window.split() for window in chunk_text(line, chunk_words, overlap_words))
+        elif words:
+            lines.append(words)
+
+    groups: list[list[list[str]]] = []
+    current: list[list[str]] = []
+    size = 0
+    for words in lines:
+        if current and size + len(words) > chunk_words:
+            groups.append(current)
+            current, size = [], 0
+        current.append(words)
+        size += len(words)
+        if size * 2 >= chunk_words and _is_anchor(words):
+            groups.append(current)
+            current, size = [], 0
+    if current:
+        groups.append(current)
+
+    chunks = []
+    previous: list[list[str]] = []
+    for group in groups:
+        carried: list[list[str]] = []
+        budget = overlap_words
+        for words in reversed(previous):
+            if len(words) > budget:
+                break
+            carried.insert(0, words)
+            budget -= len(words)
+        chunks.append("\n".join(" ".join(words) for words in carried + group))
+        previous = group
+    return chunks
+
+
 def dedupe_chunks(chunks: Iterable[str]) -> list[str]:
     seen = set()
     ordered = []
@@ -11,16 +11,47 @@ class Settings(BaseSettings):
     gemini_api_key: Optional[str] = None
     gemini_embed_model: str = "gemini-embedding-001"
     gemini_response_model: str = "gemini-1.5-flash"
+    gemini_embed_batch_size: int = 100
+    gemini_temperature: Optional[float] = None
 
     openai_api_key: Optional[str] = None
     openai_embed_model: str = "text-embedding-3-small"
     openai_response_model: str = "gpt-4o-mini"
+    openai_temperature: float = 0.2
+    openai_embed_batch_size: int = 512
+    openai_embed_batch_tokens: int = 250000
+    openai_embed_max_concurrency: int = 4
+
+    local_embed_dim: int = 384
+    local_embed_latency_ms: float = 0.0
+    local_generate_latency_ms: float = 0.0
+
+    llm_embed_rpm: int = 0
+    llm_embed_tpm: int = 0
+    llm_embed_max_concurrency: int = 0
+    llm_generate_rpm: int = 0
+    llm_generate_tpm: int = 0
+    llm_generate_max_concurrency: int = 0
+    llm_background_max_concurrency: int = 0
+    llm_single_flight_enabled: bool = True
+    llm_http_max_connections: int = 20
+    llm_http_keepalive_seconds: float = 60.0
+    llm_http_timeout_seconds: float = 600.0
+    llm_cassette_mode: str = "off"
+    llm_cassette_path: str = ""
+    llm_cassette_replay_latency: str = "zero"
 
     confluence_base_url: str
     confluence_email: str
     confluence_api_token: str
     confluence_space_keys: str = ""
     confluence_cql_extra: str = ""
+    confluence_http_max_connections: int = 10
+    confluence_http_keepalive_seconds: float = 60.0
+    confluence_http_timeout_seconds: float = 30.0
+    confluence_http2: bool = True
+    confluence_max_retries: int = 4
+    confluence_retry_max_wait_seconds: float = 60.0
 
     sfcc_docs_repo_path: Optional[str] = None
 
@@ -29,11 +60,40 @@ class Settings(BaseSettings):
     top_k: int = 15
     chroma_persist_path: str = "./data/chroma"
     chroma_collection: str = ""
+    chroma_source_groups: str = ""
+    chroma_namespace_cache_size: int = 32
+    chroma_hnsw_space: str = "cosine"
+    chroma_hnsw_m: int = 32
+    chroma_hnsw_construction_ef: int = 200
+    chroma_hnsw_search_ef: int = 100
     baseline_dir: str = "./.state/baselines"
     thread_db_path: str = "./data/workspace.db"
+    embed_cache_enabled: bool = True
+    embed_cache_path: str = ""
+    embed_cache_max_entries: int = 200000
+    llm_cache_enabled: bool = False
+    llm_cache_path: str = ""
+    llm_cache_ttl_seconds: int = 86400
+    llm_cache_max_entries: int = 5000
+    llm_cache_memory_entries: int = 256
     rerank_enabled: bool = True
     rerank_candidates: int = 45
     rerank_lexical_weight: float = 0.25
+    ingest_manifest_path: str = ""
+    ingest_queue_size: int = 32
+    ingest_fetch_workers: int = 8
+    ingest_parse_workers: int = 2
+    ingest_embed_workers: int = 8
+    ingest_embed_batch_size: int = 0
+    ingest_embed_batch_tokens: int = 250000
+    ingest_embed_batch_wait_seconds: float = 0.05
+    lexical_index_enabled: bool = True
+    lexical_index_path: str = ""
+    lexical_candidates: int = 45
+    lexical_rrf_k: int = 60
+    retrieval_batch_size: int = 64
+    retrieval_speculative_baseline: bool = True
+    retrieval_speculative_workers: int = 8
     agentic_default: bool = False
     agentic_max_steps: int = 3
     agentic_stop_confidence: float = 0.75
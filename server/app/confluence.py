@@ -1,14 +1,26 @@
 from __future__ import annotations
 
+import logging
+import threading
+import time
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Iterable, Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Iterable, Iterator, Optional
 
 import html2text
 import httpx
 from bs4 import BeautifulSoup
 
 from .config import settings
+from .pipeline import Pipeline, Stage
+from .provider_clients import registry
+
+logger = logging.getLogger(__name__)
+
+
+class ConfluenceNotConfigured(ValueError):
+    """No Confluence spaces to ingest were configured or requested."""
 
 
 @dataclass
@@ -33,15 +45,107 @@ class ConfluenceFolderInfo:
     title: str
 
 
-def _client() -> httpx.Client:
-    return httpx.Client(
+# 429 means the request was refused, so any method can be retried. A 503 may come from a proxy after
+# Confluence already acted, so only idempotent reads retry it; a retried POST could duplicate a page.
+_RETRY_STATUSES = {429, 503}
+_IDEMPOTENT_METHODS = {"GET", "HEAD"}
+
+
+def _should_retry(request: httpx.Request, response: httpx.Response) -> bool:
+    if response.status_code == 429:
+        return True
+    return response.status_code in _RETRY_STATUSES and request.method.upper() in _IDEMPOTENT_METHODS
+
+
+def _retry_after_seconds(response: httpx.Response, attempt: int) -> float:
+    raw = (response.headers.get("Retry-After") or "").strip()
+    delay: Optional[float] = None
+    if raw:
+        try:
+            delay = float(raw)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(raw) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                delay = None
+    if delay is None:
+        delay = float(2**attempt)
+    return max(0.0, min(delay, settings.confluence_retry_max_wait_seconds))
+
+
+class _RetryTransport(httpx.BaseTransport):
+    """Retries throttled responses (429, and 503 for reads), waiting as long as Retry-After asks."""
+
+    def __init__(self, transport: httpx.BaseTransport) -> None:
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            response = self._transport.handle_request(request)
+            if not _should_retry(request, response) or attempt >= settings.confluence_max_retries:
+                return response
+            delay = _retry_after_seconds(response, attempt)
+            response.close()
+            attempt += 1
+            logger.warning(
+                "Confluence returned %s for %s; retry %d/%d in %.1fs",
+                response.status_code,
+                request.url.path,
+                attempt,
+                settings.confluence_max_retries,
+                delay,
+            )
+            time.sleep(delay)
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+def _http2_enabled() -> bool:
+    if not settings.confluence_http2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _client_fingerprint() -> tuple:
+    return (
+        settings.confluence_base_url.rstrip("/"),
+        settings.confluence_email,
+        settings.confluence_api_token,
+        settings.confluence_http_max_connections,
+        settings.confluence_http_keepalive_seconds,
+        settings.confluence_http_timeout_seconds,
+        _http2_enabled(),
+    )
+
+
+def _build_client() -> httpx.Client:
+    limits = httpx.Limits(
+        max_connections=settings.confluence_http_max_connections,
+        max_keepalive_connections=settings.confluence_http_max_connections,
+        keepalive_expiry=settings.confluence_http_keepalive_seconds,
+    )
+    transport = _RetryTransport(httpx.HTTPTransport(http2=_http2_enabled(), limits=limits))
+    return registry.http_client(
+        "confluence",
         base_url=settings.confluence_base_url.rstrip("/"),
         auth=(settings.confluence_email, settings.confluence_api_token),
         headers={"Accept": "application/json"},
-        timeout=30.0,
+        timeout=settings.confluence_http_timeout_seconds,
+        transport=transport,
     )
 
 
+def _client() -> httpx.Client:
+    # One pooled keep-alive client per process; closed with the provider clients on shutdown.
+    return registry.get("confluence", _client_fingerprint(), _build_client, close=lambda client: client.close())
+
+
 def _storage_to_text(storage_value: str) -> str:
     soup = BeautifulSoup(storage_value, "html.parser")
     text = soup.get_text(separator="\n")
@@ -52,69 +156,19 @@ def _storage_to_text(storage_value: str) -> str:
     return converter.handle(storage_value)
 
 
-def search_pages(space_keys: Iterable[str], cql_extra: str = "") -> list[str]:
-    keys = [key.strip() for key in space_keys if key.strip()]
-    if not keys:
-        return []
-
+def _search_cql(keys: list[str], cql_extra: str) -> str:
     cql_parts = [f"space in ({','.join(keys)})", "type=page"]
     if cql_extra:
         cql_parts.append(cql_extra)
-    cql = " AND ".join(cql_parts)
+    return " AND ".join(cql_parts)
 
-    ids: list[str] = []
-    seen_ids: set[str] = set()
-    start = 0
-    limit = 50
-    max_iterations = 500
-    iterations = 0
-    with _client() as client:
-        while True:
-            iterations += 1
-            if iterations > max_iterations:
-                # Defensive guard against upstream pagination loops.
-                break
-            response = client.get(
-                "/rest/api/content/search",
-                params={
-                    "cql": cql,
-                    "limit": limit,
-                    "start": start,
-                    "expand": "body.storage,space,version",
-                },
-            )
-            response.raise_for_status()
-            payload = response.json()
-            results = payload.get("results", [])
-            new_count = 0
-            for item in results:
-                page_id = str(item.get("id", "")).strip()
-                if not page_id or page_id in seen_ids:
-                    continue
-                seen_ids.add(page_id)
-                ids.append(page_id)
-                new_count += 1
-            # If API keeps returning duplicates, do not spin forever.
-            if new_count == 0:
-                break
-            if len(results) < limit:
-                break
-            start += limit
-    return ids
-
-
-def fetch_page(page_id: str) -> ConfluencePage:
-    with _client() as client:
-        response = client.get(
-            f"/rest/api/content/{page_id}",
-            params={"expand": "body.storage,space,version"},
-        )
-        response.raise_for_status()
-        payload = response.json()
 
+def _page_from_payload(payload: dict, base_url: str = "") -> ConfluencePage:
+    links = payload.get("_links", {})
     title = payload.get("title", "")
     space_key = payload.get("space", {}).get("key", "")
-    url = payload.get("_links", {}).get("base", "") + payload.get("_links", {}).get("webui", "")
+    # Search results carry _links.base on the envelope rather than on each item.
+    url = (links.get("base") or base_url) + links.get("webui", "")
     storage_value = payload.get("body", {}).get("storage", {}).get("value", "")
     version = payload.get("version", {})
     updated_at = version.get("when")
@@ -132,6 +186,164 @@ def fetch_page(page_id: str) -> ConfluencePage:
     )
 
 
+_SEARCH_LIMIT = 50
+# Defensive guard against upstream pagination loops: at most this many result pages per search.
+_MAX_SEARCH_PAGES = 500
+_PAGE_EXPAND = "body.storage,space,version"
+
+
+def _search_request(cql: str, start: int, expand: str = "") -> dict:
+    params = {"cql": cql, "limit": _SEARCH_LIMIT, "start": start}
+    if expand:
+        params["expand"] = expand
+    response = _client().get("/rest/api/content/search", params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+def _iter_search_results(
+    space_keys: Iterable[str],
+    cql_extra: str = "",
+    expand: str = "",
+    on_total: Optional[Callable[[int], None]] = None,
+    start: int = 0,
+) -> Iterator[tuple[dict, str]]:
+    keys = [key.strip() for key in space_keys if key.strip()]
+    if not keys:
+        return
+
+    cql = _search_cql(keys, cql_extra)
+    seen_ids: set[str] = set()
+    iterations = 0
+    while True:
+        iterations += 1
+        if iterations > _MAX_SEARCH_PAGES:
+            break
+        payload = _search_request(cql, start, expand)
+        if on_total and iterations == 1 and isinstance(payload.get("totalSize"), int):
+            on_total(payload["totalSize"])
+        base_url = payload.get("_links", {}).get("base", "")
+        results = payload.get("results", [])
+        new_count = 0
+        for item in results:
+            page_id = str(item.get("id", "")).strip()
+            if not page_id or page_id in seen_ids:
+                continue
+            seen_ids.add(page_id)
+            new_count += 1
+            yield item, base_url
+        # If API keeps returning duplicates, do not spin forever.
+        if new_count == 0:
+            break
+        if len(results) < _SEARCH_LIMIT:
+            break
+        start += _SEARCH_LIMIT
+
+
+@dataclass
+class SearchSlice:
+    space_key: str
+    start: int
+    # The total can grow during the run, so a full last slice keeps paginating.
+    last: bool = False
+
+
+class SpaceSearch:
+    """Confluence search as two pipeline stages, so one large space is fetched in parallel too.
+
+    ``plan`` reads the first result page of a space and, from its ``totalSize``, hands out the
+    offsets of the remaining pages; ``fetch`` requests those offsets on any number of workers.
+    When Confluence reports no total, ``plan`` paginates the space itself.
+    """
+
+    def __init__(self, cql_extra: str = "", on_total: Optional[Callable[[int], None]] = None) -> None:
+        self.cql_extra = cql_extra
+        self.on_total = on_total
+        self._seen: set[str] = set()
+        self._lock = threading.Lock()
+
+    def stages(self, space_count: int, workers: Optional[int] = None) -> list[Stage]:
+        workers = max(1, workers or settings.ingest_fetch_workers)
+        return [
+            Stage("search", self.plan, workers=min(workers, max(1, space_count)), fan_out=True),
+            Stage("fetch", self.fetch, workers=workers, fan_out=True),
+        ]
+
+    def plan(self, space_key: str) -> Iterator[ConfluencePage | SearchSlice]:
+        payload = _search_request(_search_cql([space_key], self.cql_extra), 0, _PAGE_EXPAND)
+        total = payload.get("totalSize")
+        if self.on_total and isinstance(total, int):
+            self.on_total(total)
+        base_url = payload.get("_links", {}).get("base", "")
+        results = payload.get("results", [])
+        for item in results:
+            yield _page_from_payload(item, base_url)
+        if len(results) < _SEARCH_LIMIT:
+            return
+        if not isinstance(total, int):
+            for item, base_url in _iter_search_results(
+                [space_key], self.cql_extra, expand=_PAGE_EXPAND, start=_SEARCH_LIMIT
+            ):
+                yield _page_from_payload(item, base_url)
+            return
+        end = min(max(total, 2 * _SEARCH_LIMIT), _SEARCH_LIMIT * _MAX_SEARCH_PAGES)
+        offsets = list(range(_SEARCH_LIMIT, end, _SEARCH_LIMIT))
+        for start in offsets:
+            yield SearchSlice(space_key, start, last=start == offsets[-1])
+
+    def fetch(self, item: ConfluencePage | SearchSlice) -> Iterator[ConfluencePage]:
+        if isinstance(item, SearchSlice):
+            pages = self._fetch_slice(item)
+        else:
+            pages = [item]
+        for page in pages:
+            # Offsets shift if pages are added or removed mid-run; keep each page once.
+            with self._lock:
+                if page.page_id in self._seen:
+                    continue
+                self._seen.add(page.page_id)
+            yield page
+
+    def _fetch_slice(self, item: SearchSlice) -> Iterator[ConfluencePage]:
+        if item.last:
+            for result, base_url in _iter_search_results(
+                [item.space_key], self.cql_extra, expand=_PAGE_EXPAND, start=item.start
+            ):
+                yield _page_from_payload(result, base_url)
+            return
+        payload = _search_request(_search_cql([item.space_key], self.cql_extra), item.start, _PAGE_EXPAND)
+        base_url = payload.get("_links", {}).get("base", "")
+        for result in payload.get("results", []):
+            yield _page_from_payload(result, base_url)
+
+
+def stream_pages(
+    space_keys: Iterable[str],
+    cql_extra: str = "",
+    on_total: Optional[Callable[[int], None]] = None,
+    workers: Optional[int] = None,
+    queue_size: Optional[int] = None,
+) -> Iterator[tuple[ConfluencePage, str]]:
+    """Yield ``(page, text)`` in arrival order, searching spaces and result offsets in parallel.
+
+    Bounded queues block the search when the consumer (embedding) falls behind, so memory stays
+    flat however large a space is.
+    """
+    keys = [key.strip() for key in space_keys if key.strip()]
+    if not keys:
+        return
+    search = SpaceSearch(cql_extra, on_total)
+    stream = Pipeline(
+        "confluence-stream",
+        [
+            *search.stages(len(keys), workers),
+            Stage("convert", lambda page: (page, page_to_text(page)), workers=settings.ingest_parse_workers),
+        ],
+        queue_size=queue_size,
+    )
+    yield from stream.iter(keys)
+
+
 def page_to_text(page: ConfluencePage) -> str:
     return _storage_to_text(page.storage_value)
 
@@ -140,43 +352,43 @@ def list_spaces() -> list[ConfluenceSpaceInfo]:
     spaces: list[ConfluenceSpaceInfo] = []
     start = 0
     limit = 100
-    with _client() as client:
-        while True:
-            response = client.get("/rest/api/space", params={"limit": limit, "start": start})
-            response.raise_for_status()
-            payload = response.json()
-            results = payload.get("results", [])
-            for item in results:
-                key = str(item.get("key", "")).strip()
-                if not key:
-                    continue
-                name = str(item.get("name", key)).strip() or key
-                spaces.append(ConfluenceSpaceInfo(key=key, name=name))
-            if len(results) < limit:
-                break
-            start += limit
+    client = _client()
+    while True:
+        response = client.get("/rest/api/space", params={"limit": limit, "start": start})
+        response.raise_for_status()
+        payload = response.json()
+        results = payload.get("results", [])
+        for item in results:
+            key = str(item.get("key", "")).strip()
+            if not key:
+                continue
+            name = str(item.get("name", key)).strip() or key
+            spaces.append(ConfluenceSpaceInfo(key=key, name=name))
+        if len(results) < limit:
+            break
+        start += limit
     spaces.sort(key=lambda s: s.name.lower())
     return spaces
 
 
 def list_folder_pages(space_key: str) -> list[ConfluenceFolderInfo]:
     folders: list[ConfluenceFolderInfo] = []
-    with _client() as client:
-        response = client.get(
-            "/rest/api/content/search",
-            params={
-                "cql": f'space="{space_key}" AND type=page ORDER BY title',
-                "limit": 200,
-            },
-        )
-        response.raise_for_status()
-        payload = response.json()
-        for item in payload.get("results", []):
-            page_id = str(item.get("id", "")).strip()
-            title = str(item.get("title", "")).strip()
-            if not page_id or not title:
-                continue
-            folders.append(ConfluenceFolderInfo(page_id=page_id, title=title))
+    client = _client()
+    response = client.get(
+        "/rest/api/content/search",
+        params={
+            "cql": f'space="{space_key}" AND type=page ORDER BY title',
+            "limit": 200,
+        },
+    )
+    response.raise_for_status()
+    payload = response.json()
+    for item in payload.get("results", []):
+        page_id = str(item.get("id", "")).strip()
+        title = str(item.get("title", "")).strip()
+        if not page_id or not title:
+            continue
+        folders.append(ConfluenceFolderInfo(page_id=page_id, title=title))
     return folders
 
 
@@ -184,21 +396,21 @@ def find_child_page(space_key: str, parent_id: str, title: str) -> Optional[Conf
     clean_title = title.replace('"', '\\"').strip()
     if not clean_title:
         return None
-    with _client() as client:
-        response = client.get(
-            "/rest/api/content/search",
-            params={
-                "cql": f'space="{space_key}" AND title="{clean_title}" AND ancestor={parent_id}',
-                "limit": 1,
-            },
-        )
-        response.raise_for_status()
-        payload = response.json()
-        results = payload.get("results", [])
-        if not results:
-            return None
-        item = results[0]
-        return ConfluenceFolderInfo(page_id=str(item.get("id", "")), title=str(item.get("title", "")))
+    client = _client()
+    response = client.get(
+        "/rest/api/content/search",
+        params={
+            "cql": f'space="{space_key}" AND title="{clean_title}" AND ancestor={parent_id}',
+            "limit": 1,
+        },
+    )
+    response.raise_for_status()
+    payload = response.json()
+    results = payload.get("results", [])
+    if not results:
+        return None
+    item = results[0]
+    return ConfluenceFolderInfo(page_id=str(item.get("id", "")), title=str(item.get("title", "")))
 
 
 def create_child_page(space_key: str, parent_id: str, title: str, storage_html: str) -> ConfluencePage:
@@ -210,10 +422,10 @@ def create_child_page(space_key: str, parent_id: str, title: str, storage_html:
         "body": {"storage": {"value": storage_html, "representation": "storage"}},
     }
 
-    with _client() as client:
-        response = client.post("/rest/api/content", json=payload)
-        response.raise_for_status()
-        data = response.json()
+    client = _client()
+    response = client.post("/rest/api/content", json=payload)
+    response.raise_for_status()
+    data = response.json()
 
     webui = data.get("_links", {}).get("webui", "")
     base = data.get("_links", {}).get("base", "")
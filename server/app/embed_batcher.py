@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from .config import settings
+from .llm_service import embed_texts
+from .rate_limit import estimate_tokens
+
+_registry_lock = threading.Lock()
+_batchers: dict[str, "EmbedBatcher"] = {}
+
+
+@dataclass
+class _Request:
+    vectors: list
+    remaining: int
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class _Pending:
+    request: _Request
+    index: int
+    text: str
+    tokens: int
+    enqueued: float
+
+
+@dataclass
+class _BatchStats:
+    requests: int = 0
+    texts: int = 0
+    sent: int = 0
+    batches: int = 0
+    full_batches: int = 0
+    largest_batch: int = 0
+    embed_seconds: float = 0.0
+
+
+def default_batch_size() -> int:
+    if settings.ingest_embed_batch_size > 0:
+        return settings.ingest_embed_batch_size
+    # One provider request's worth of texts.
+    if (settings.llm_provider or "").strip().lower() == "openai":
+        return settings.openai_embed_batch_size
+    return settings.gemini_embed_batch_size
+
+
+class EmbedBatcher:
+    """Pools the texts of concurrent callers into shared embedding requests.
+
+    Each caller blocks in ``embed`` until its own vectors are back. A batch is sent once it holds
+    ``max_items`` texts or ``max_tokens`` estimated tokens, once its oldest text has waited
+    ``max_wait_seconds``, or as soon as every one of the ``callers`` that has not called ``leave``
+    is waiting (nothing more can arrive). Whichever caller finds a batch ready sends it, so no
+    background thread is needed, and a single caller with more than ``max_items`` texts is spread
+    over several batches.
+    """
+
+    def __init__(
+        self,
+        task_type: str,
+        name: str = "ingest",
+        max_items: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        max_wait_seconds: Optional[float] = None,
+        callers: Optional[int] = None,
+        embed: Optional[Callable[..., list[list[float]]]] = None,
+    ) -> None:
+        self.task_type = task_type
+        self.name = name
+        self.max_items = max(1, max_items or default_batch_size())
+        self.max_tokens = max(1, max_tokens or settings.ingest_embed_batch_tokens)
+        self.max_wait_seconds = max(
+            0.0, settings.ingest_embed_batch_wait_seconds if max_wait_seconds is None else max_wait_seconds
+        )
+        self.callers = callers
+        self._embed = embed or embed_texts
+        self._cond = threading.Condition()
+        self._pending: deque[_Pending] = deque()
+        self._pending_tokens = 0
+        self._active = 0
+        self._left = 0
+        self._stats = _BatchStats()
+        with _registry_lock:
+            _batchers[name] = self
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        request = _Request(vectors=[None] * len(texts), remaining=len(texts))
+        with self._cond:
+            enqueued = time.monotonic()
+            for index, text in enumerate(texts):
+                tokens = estimate_tokens(text)
+                self._pending.append(_Pending(request, index, text, tokens, enqueued))
+                self._pending_tokens += tokens
+            if self.callers is not None and self._left >= self.callers:
+                # Every caller of the previous run has left, so this one starts a new run (the next crawl level).
+                self._left = 0
+            self._active += 1
+            self._stats.requests += 1
+            self._stats.texts += len(texts)
+            self._cond.notify_all()
+        try:
+            while True:
+                with self._cond:
+                    batch = self._take_ready()
+                    while not batch and request.remaining:
+                        self._cond.wait(self._seconds_until_due())
+                        batch = self._take_ready()
+                if not batch:
+                    break
+                self._send(batch)
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+        if request.error is not None:
+            raise request.error
+        return request.vectors
+
+    def leave(self) -> None:
+        """Record that a caller will not call ``embed`` again, so the others stop waiting for it."""
+        with self._cond:
+            self._left += 1
+            self._cond.notify_all()
+
+    def _take_ready(self) -> list[_Pending]:
+        if not self._pending:
+            return []
+        full = len(self._pending) >= self.max_items or self._pending_tokens >= self.max_tokens
+        overdue = time.monotonic() - self._pending[0].enqueued >= self.max_wait_seconds
+        everyone_waiting = self.callers is not None and self._active >= self.callers - self._left
+        if not (full or overdue or everyone_waiting):
+            return []
+        batch: list[_Pending] = []
+        tokens = 0
+        while self._pending and len(batch) < self.max_items:
+            entry = self._pending[0]
+            if batch and tokens + entry.tokens > self.max_tokens:
+                break
+            batch.append(self._pending.popleft())
+            tokens += entry.tokens
+        self._pending_tokens -= tokens
+        if full:
+            self._stats.full_batches += 1
+        return batch
+
+    def _seconds_until_due(self) -> Optional[float]:
+        if not self._pending:
+            # Our texts are in a batch another caller is sending; its completion wakes us.
+            return None
+        return max(0.0, self._pending[0].enqueued + self.max_wait_seconds - time.monotonic())
+
+    def _send(self, batch: list[_Pending]) -> None:
+        started = time.monotonic()
+        vectors: list[list[float]] = []
+        error: Optional[BaseException] = None
+        try:
+            vectors = self._embed([entry.text for entry in batch], task_type=self.task_type)
+            if len(vectors) != len(batch):
+                raise ValueError(f"Embedding returned {len(vectors)} vectors for a batch of {len(batch)} texts")
+        except Exception as exc:
+            error = exc
+        with self._cond:
+            for position, entry in enumerate(batch):
+                if error is not None:
+                    entry.request.error = entry.request.error or error
+                else:
+                    entry.request.vectors[entry.index] = vectors[position]
+                entry.request.remaining -= 1
+            self._stats.batches += 1
+            self._stats.sent += len(batch)
+            self._stats.largest_batch = max(self._stats.largest_batch, len(batch))
+            self._stats.embed_seconds += time.monotonic() - started
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            current = self._stats
+            return {
+                "requests": current.requests,
+                "texts": current.texts,
+                "batches": current.batches,
+                "full_batches": current.full_batches,
+                "avg_batch_size": round(current.sent / current.batches, 2) if current.batches else 0.0,
+                "largest_batch": current.largest_batch,
+                "embed_seconds": round(current.embed_seconds, 3),
+                "pending": len(self._pending),
+            }
+
+
+def stats() -> dict:
+    with _registry_lock:
+        batchers = list(_batchers.items())
+    return {name: batcher.stats() for name, batcher in batchers}
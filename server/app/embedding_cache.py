@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_SQL_BATCH = 500
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _db_path() -> Path:
+    raw = (settings.embed_cache_path or "").strip()
+    if raw:
+        return Path(raw)
+    # Keep the cache next to the Chroma persist dir so both move together.
+    return Path(settings.chroma_persist_path).parent / "embedding_cache.db"
+
+
+_conn_lock = threading.RLock()
+_conn: Optional[sqlite3.Connection] = None
+_conn_path: Optional[Path] = None
+# Row count maintained from inserts and evictions, so writes never have to COUNT(*) the table.
+_entries = 0
+
+
+def _open(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            provider TEXT NOT NULL,
+            model TEXT NOT NULL,
+            task_type TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            last_used REAL NOT NULL,
+            PRIMARY KEY (provider, model, task_type, text_hash)
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache (last_used)"
+    )
+    conn.commit()
+    return conn
+
+
+def _connection() -> sqlite3.Connection:
+    """The shared connection, opened on first use; callers hold ``_conn_lock``."""
+    global _conn, _conn_path, _entries
+    db_path = _db_path()
+    if _conn is None or _conn_path != db_path:
+        close()
+        _conn = _open(db_path)
+        _conn_path = db_path
+        _entries = _conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+    return _conn
+
+
+def close() -> None:
+    global _conn, _conn_path
+    with _conn_lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = None
+        _conn_path = None
+
+
+def _bump(**deltas: int) -> None:
+    with _stats_lock:
+        for key, value in deltas.items():
+            _stats[key] += value
+
+
+def _encode(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _decode(blob: bytes) -> list[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+def enabled() -> bool:
+    return bool(settings.embed_cache_enabled) and settings.embed_cache_max_entries > 0
+
+
+def get_many(provider: str, model: str, task_type: str, texts: Sequence[str]) -> list[Optional[list[float]]]:
+    results: list[Optional[list[float]]] = [None] * len(texts)
+    if not texts:
+        return results
+    hashes = [text_hash(text) for text in texts]
+    found: dict[str, list[float]] = {}
+    try:
+        with _conn_lock, _connection() as conn:
+            unique_hashes = list(dict.fromkeys(hashes))
+            for start in range(0, len(unique_hashes), _SQL_BATCH):
+                batch = unique_hashes[start : start + _SQL_BATCH]
+                placeholders = ",".join("?" for _ in batch)
+                rows = conn.execute(
+                    f"""
+                    SELECT text_hash, vector FROM embedding_cache
+                    WHERE provider = ? AND model = ? AND task_type = ? AND text_hash IN ({placeholders})
+                    """,
+                    (provider, model, task_type, *batch),
+                ).fetchall()
+                for row_hash, blob in rows:
+                    found[row_hash] = _decode(blob)
+            if found:
+                now = time.time()
+                conn.executemany(
+                    """
+                    UPDATE embedding_cache SET last_used = ?
+                    WHERE provider = ? AND model = ? AND task_type = ? AND text_hash = ?
+                    """,
+                    [(now, provider, model, task_type, value) for value in found],
+                )
+    except sqlite3.Error as exc:
+        logger.warning("Embedding cache read failed, treating as miss: %s", exc)
+        _bump(errors=1, misses=len(texts))
+        return results
+
+    hits = 0
+    for index, value in enumerate(hashes):
+        vector = found.get(value)
+        if vector is not None:
+            results[index] = vector
+            hits += 1
+    _bump(hits=hits, misses=len(texts) - hits)
+    return results
+
+
+def put_many(
+    provider: str,
+    model: str,
+    task_type: str,
+    texts: Sequence[str],
+    vectors: Sequence[Sequence[float]],
+) -> None:
+    if not texts:
+        return
+    now = time.time()
+    rows = [
+        (provider, model, task_type, text_hash(text), _encode(vector), now)
+        for text, vector in zip(texts, vectors)
+    ]
+    global _entries
+    try:
+        with _conn_lock, _connection() as conn:
+            inserted = conn.executemany(
+                """
+                INSERT OR IGNORE INTO embedding_cache (provider, model, task_type, text_hash, vector, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            ).rowcount
+            if inserted < len(rows):
+                # Another writer got there first; only the recency needs refreshing.
+                conn.executemany(
+                    """
+                    UPDATE embedding_cache SET last_used = ?
+                    WHERE provider = ? AND model = ? AND task_type = ? AND text_hash = ?
+                    """,
+                    [(now, *row[:4]) for row in rows],
+                )
+            _entries += max(inserted, 0)
+            evicted = 0
+            if _entries > max(settings.embed_cache_max_entries, 0):
+                # Other processes may share the file, so recount before pruning.
+                _entries = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+                overflow = _entries - max(settings.embed_cache_max_entries, 0)
+                if overflow > 0:
+                    cursor = conn.execute(
+                        """
+                        DELETE FROM embedding_cache WHERE rowid IN (
+                            SELECT rowid FROM embedding_cache ORDER BY last_used ASC LIMIT ?
+                        )
+                        """,
+                        (overflow,),
+                    )
+                    evicted = max(cursor.rowcount, 0)
+                    _entries -= evicted
+    except sqlite3.Error as exc:
+        logger.warning("Embedding cache write failed: %s", exc)
+        _bump(errors=1)
+        return
+    _bump(writes=len(rows), evictions=evicted)
+
+
+def stats() -> dict:
+    with _stats_lock:
+        snapshot = dict(_stats)
+    lookups = snapshot["hits"] + snapshot["misses"]
+    snapshot["hit_rate"] = round(snapshot["hits"] / lookups, 4) if lookups else 0.0
+    snapshot["enabled"] = enabled()
+    snapshot["max_entries"] = settings.embed_cache_max_entries
+    snapshot["path"] = str(_db_path())
+    entries = 0
+    # Reading stats must not create the cache file.
+    if enabled() and _db_path().exists():
+        try:
+            with _conn_lock:
+                _connection()
+                entries = _entries
+        except sqlite3.Error:
+            entries = None
+    snapshot["entries"] = entries
+    return snapshot
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
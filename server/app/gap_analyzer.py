@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextvars
 from dataclasses import dataclass
 from datetime import datetime, timezone
 import json
 import logging
 import re
+import threading
+import time
 from typing import Optional
 
+from . import retrieval_metrics
 from .capability_synonyms import expand_requirement_query
 from .chroma_service import ChromaService
-from .llm_service import generate_text
+from .config import settings
+from .llm_service import agenerate_text, generate_text
 
 
 logger = logging.getLogger(__name__)
@@ -367,12 +374,25 @@ def _retrieve_chunks(
     query_text: str,
     top_k: int,
     source_filters: Optional[list[str]] = None,
+    query_embedding: Optional[list[float]] = None,
 ) -> tuple[list[dict], float]:
     retrieval_query = expand_requirement_query(query_text)
-    where_filter = None
-    if source_filters:
-        where_filter = {"source": {"$in": source_filters}}
-    response = chroma.query(retrieval_query, top_k, where_filter=where_filter)
+    response = chroma.query(
+        retrieval_query,
+        top_k,
+        where_filter=_source_filter(source_filters),
+        query_embedding=query_embedding,
+    )
+    return _chunks_from_response(query_text, response, top_k)
+
+
+def _source_filter(source_filters: Optional[list[str]]) -> Optional[dict]:
+    if not source_filters:
+        return None
+    return {"source": {"$in": source_filters}}
+
+
+def _chunks_from_response(query_text: str, response: dict, top_k: int) -> tuple[list[dict], float]:
     documents = response["documents"][0]
     metadatas = response["metadatas"][0]
     distances = response["distances"][0]
@@ -420,28 +440,206 @@ def _retrieve_chunks(
     return chunks, top_score
 
 
-def _retrieve_two_pass(chroma: ChromaService, query_text: str, top_k: int) -> tuple[list[dict], float]:
+_PROJECT_SOURCES = ["confluence"]
+_BASELINE_SOURCES = ["baseline_web", "sfcc"]
+
+
+@dataclass
+class PrefetchedRetrieval:
+    query_embedding: list[float]
+    project: tuple[list[dict], float]
+    baseline: tuple[list[dict], float]
+
+
+_speculative_pool: Optional[ThreadPoolExecutor] = None
+_speculative_pool_lock = threading.Lock()
+
+
+def _speculative_executor() -> ThreadPoolExecutor:
+    global _speculative_pool
+    with _speculative_pool_lock:
+        if _speculative_pool is None:
+            _speculative_pool = ThreadPoolExecutor(
+                max_workers=max(1, settings.retrieval_speculative_workers),
+                thread_name_prefix="retrieval-baseline",
+            )
+        return _speculative_pool
+
+
+def shutdown_speculative_executor() -> None:
+    global _speculative_pool
+    with _speculative_pool_lock:
+        pool, _speculative_pool = _speculative_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def prefetch_two_pass(
+    chroma: ChromaService,
+    requirements: list[str],
+    top_k: int,
+    query_embeddings: Optional[list[list[float]]] = None,
+) -> list[PrefetchedRetrieval]:
+    """Retrieve both passes for many requirements with one embedding batch and one query per scope."""
+    if not requirements:
+        return []
+    started = time.perf_counter()
+    retrieval_queries = [expand_requirement_query(requirement) for requirement in requirements]
+    if query_embeddings is None:
+        query_embeddings = chroma.embed_queries(retrieval_queries)
+    # The baseline pass is fetched for every requirement up front; per requirement it is still
+    # only used when the project gate asks for it, exactly as in the one-at-a-time path. Both
+    # passes are always needed here, so with speculation on they simply run side by side.
+    baseline_args = (retrieval_queries, top_k, _source_filter(_BASELINE_SOURCES), query_embeddings)
+    baseline_future: Optional[Future] = None
+    if settings.retrieval_speculative_baseline:
+        baseline_future = _speculative_executor().submit(
+            contextvars.copy_context().run, chroma.query_many, *baseline_args
+        )
+    try:
+        project_responses = chroma.query_many(
+            retrieval_queries,
+            top_k,
+            where_filter=_source_filter(_PROJECT_SOURCES),
+            query_embeddings=query_embeddings,
+        )
+    except Exception:
+        if baseline_future is not None:
+            baseline_future.cancel()
+        raise
+    if baseline_future is not None:
+        baseline_responses = baseline_future.result()
+    else:
+        baseline_responses = chroma.query_many(*baseline_args)
+    retrieval_metrics.record("prefetch_batch", time.perf_counter() - started)
+    return [
+        PrefetchedRetrieval(
+            query_embedding=query_embedding,
+            project=_chunks_from_response(requirement, project_response, top_k),
+            baseline=_chunks_from_response(requirement, baseline_response, top_k),
+        )
+        for requirement, query_embedding, project_response, baseline_response in zip(
+            requirements, query_embeddings, project_responses, baseline_responses
+        )
+    ]
+
+
+async def aprefetch_two_pass(chroma: ChromaService, requirements: list[str], top_k: int) -> list[PrefetchedRetrieval]:
+    """``prefetch_two_pass`` with the embedding batch awaited; the collection queries run in a worker thread."""
+    if not requirements:
+        return []
+    retrieval_queries = [expand_requirement_query(requirement) for requirement in requirements]
+    query_embeddings = await chroma.aembed_queries(retrieval_queries)
+    return await asyncio.to_thread(prefetch_two_pass, chroma, requirements, top_k, query_embeddings)
+
+
+def _timed_retrieve(
+    pass_name: str,
+    chroma: ChromaService,
+    query_text: str,
+    top_k: int,
+    source_filters: Optional[list[str]],
+    query_embedding: list[float],
+) -> tuple[list[dict], float]:
+    started = time.perf_counter()
+    try:
+        return _retrieve_chunks(
+            chroma,
+            query_text,
+            top_k,
+            source_filters=source_filters,
+            query_embedding=query_embedding,
+        )
+    finally:
+        retrieval_metrics.record(pass_name, time.perf_counter() - started)
+
+
+def _discard_speculative(future: Future) -> None:
+    retrieval_metrics.bump("speculative_discarded")
+    if future.cancel():
+        return
+
+    def _log_failure(done: Future) -> None:
+        if not done.cancelled() and done.exception() is not None:
+            logger.debug("Discarded speculative baseline retrieval failed: %s", done.exception())
+
+    future.add_done_callback(_log_failure)
+
+
+def _retrieve_two_pass(
+    chroma: ChromaService,
+    query_text: str,
+    top_k: int,
+    prefetched: Optional[PrefetchedRetrieval] = None,
+) -> tuple[list[dict], float]:
+    started = time.perf_counter()
+    try:
+        return _run_two_pass(chroma, query_text, top_k, prefetched)
+    finally:
+        retrieval_metrics.record("two_pass", time.perf_counter() - started)
+
+
+def _run_two_pass(
+    chroma: ChromaService,
+    query_text: str,
+    top_k: int,
+    prefetched: Optional[PrefetchedRetrieval],
+) -> tuple[list[dict], float]:
+    # Every pass searches with the same expanded query, so embed it once and reuse the vector.
+    if prefetched is not None:
+        query_embedding = prefetched.query_embedding
+    else:
+        embed_started = time.perf_counter()
+        query_embedding = chroma.embed_query(expand_requirement_query(query_text))
+        retrieval_metrics.record("embed", time.perf_counter() - embed_started)
+
+    # Speculative mode starts the baseline pass alongside the project pass and throws the
+    # result away if the project gate decides it is not needed.
+    baseline_future: Optional[Future] = None
+    if prefetched is None and settings.retrieval_speculative_baseline:
+        retrieval_metrics.bump("speculative_started")
+        baseline_future = _speculative_executor().submit(
+            contextvars.copy_context().run,
+            _timed_retrieve,
+            "baseline",
+            chroma,
+            query_text,
+            top_k,
+            _BASELINE_SOURCES,
+            query_embedding,
+        )
+
     # Pass 1: project-first retrieval from Confluence/FSD space.
-    project_chunks, project_top = _retrieve_chunks(
-        chroma,
-        query_text,
-        top_k,
-        source_filters=["confluence"],
-    )
-    reliable_project_match, _ = _project_reliability_gate(query_text, project_chunks)
-    project_status = _detect_project_match_status(query_text, reliable_project_match, project_chunks)
+    try:
+        if prefetched is not None:
+            project_chunks, project_top = prefetched.project
+        else:
+            project_chunks, project_top = _timed_retrieve(
+                "project", chroma, query_text, top_k, _PROJECT_SOURCES, query_embedding
+            )
+        reliable_project_match, _ = _project_reliability_gate(query_text, project_chunks)
+        project_status = _detect_project_match_status(query_text, reliable_project_match, project_chunks)
+    except Exception:
+        if baseline_future is not None:
+            _discard_speculative(baseline_future)
+        raise
 
     # Pass 2: baseline retrieval for missing/uncertain scope.
     baseline_chunks: list[dict] = []
     baseline_top = 0.0
     should_run_baseline = (not reliable_project_match) or project_status != "already_implemented"
     if should_run_baseline:
-        baseline_chunks, baseline_top = _retrieve_chunks(
-            chroma,
-            query_text,
-            top_k,
-            source_filters=["baseline_web", "sfcc"],
-        )
+        if prefetched is not None:
+            baseline_chunks, baseline_top = prefetched.baseline
+        elif baseline_future is not None:
+            retrieval_metrics.bump("speculative_used")
+            baseline_chunks, baseline_top = baseline_future.result()
+        else:
+            baseline_chunks, baseline_top = _timed_retrieve(
+                "baseline", chroma, query_text, top_k, _BASELINE_SOURCES, query_embedding
+            )
+    elif baseline_future is not None:
+        _discard_speculative(baseline_future)
 
     merged = _merge_chunks(project_chunks, baseline_chunks, limit=max(top_k, 10))
     top_score = max(project_top, baseline_top)
@@ -449,7 +647,7 @@ def _retrieve_two_pass(chroma: ChromaService, query_text: str, top_k: int) -> tu
         return merged, top_score
 
     # Fallback: mixed retrieval if source-scoped filters returned nothing.
-    return _retrieve_chunks(chroma, query_text, top_k)
+    return _timed_retrieve("fallback", chroma, query_text, top_k, None, query_embedding)
 
 
 def _merge_chunks(existing: list[dict], incoming: list[dict], limit: int) -> list[dict]:
@@ -574,77 +772,87 @@ def _infer_implementation_mode(
     return "uncertain"
 
 
-def _generate_clarifying_questions(requirement: str, context: str) -> Optional[list[str]]:
-    prompt = (
+def _clarifying_questions_prompt(requirement: str, context: str) -> str:
+    return (
         "Create 3-5 concise clarifying questions needed to finalize this requirement.\n"
         "Return each question on its own line with no numbering.\n\n"
         f"Requirement: {requirement}\n\n"
         f"Context:\n{context}\n"
     )
-    response_text = generate_text(prompt).strip()
+
+
+def _questions_from_response(response_text: str) -> Optional[list[str]]:
+    response_text = response_text.strip()
     if not response_text:
         return None
     questions = _extract_questions(response_text)
     return questions or None
 
 
-def analyze_requirement(chroma: ChromaService, requirement: str, top_k: int) -> GapResult:
-    top_chunks, top_score = _retrieve_two_pass(chroma, requirement, top_k)
+def _generate_clarifying_questions(requirement: str, context: str) -> Optional[list[str]]:
+    return _questions_from_response(generate_text(_clarifying_questions_prompt(requirement, context)))
+
+
+def _classification_prompt(requirement: str, top_chunks: list[dict]) -> tuple[str, Optional[str]]:
+    """The evidence context and the classification prompt; no prompt when nothing was retrieved."""
+    if not top_chunks:
+        return "", None
+    context = "\n\n".join([chunk["text"][:800] for chunk in top_chunks[:3]])
+    prompt = (
+        "You are classifying SFRA coverage for a requirement.\n"
+        "Classes: OOTB Match, Partial Match, Custom Dev Required, Open Question.\n"
+        "Use evidence-first reasoning.\n"
+        "If context explicitly states a feature is available in SFRA out of the box, prefer OOTB Match.\n"
+        "Use Custom Dev Required only when evidence indicates the feature is unsupported or requires net-new code.\n"
+        "Return a single line with: <classification> | <confidence 0-1> | <short rationale>.\n\n"
+        f"Requirement: {requirement}\n\n"
+        f"Context:\n{context}\n"
+    )
+    logger.info(
+        "LLM classify start requirement_len=%d context_len=%d",
+        len(requirement),
+        len(context),
+    )
+    return context, prompt
+
 
+def _scored_result(
+    requirement: str,
+    top_chunks: list[dict],
+    top_score: float,
+    response_text: Optional[str],
+    llm_failed: bool,
+) -> tuple[GapResult, bool]:
+    """Classify from the similarity score and the LLM's answer; also says whether to ask clarifying questions."""
     classification = _classify_from_score(top_score)
-    similarity_confidence = top_score
     rationale = "Similarity-based classification"
     llm_confidence: Optional[float] = None
 
-    llm_response: Optional[str] = None
-    clarifying_questions: Optional[list[str]] = None
-
-    context = ""
-    if top_chunks:
-        context = "\n\n".join([chunk["text"][:800] for chunk in top_chunks[:3]])
-        prompt = (
-            "You are classifying SFRA coverage for a requirement.\n"
-            "Classes: OOTB Match, Partial Match, Custom Dev Required, Open Question.\n"
-            "Use evidence-first reasoning.\n"
-            "If context explicitly states a feature is available in SFRA out of the box, prefer OOTB Match.\n"
-            "Use Custom Dev Required only when evidence indicates the feature is unsupported or requires net-new code.\n"
-            "Return a single line with: <classification> | <confidence 0-1> | <short rationale>.\n\n"
-            f"Requirement: {requirement}\n\n"
-            f"Context:\n{context}\n"
-        )
-        try:
-            logger.info(
-                "LLM classify start requirement_len=%d context_len=%d",
-                len(requirement),
-                len(context),
-            )
-            response_text = generate_text(prompt).strip()
-            llm_response = response_text
-            logger.info("LLM classify raw_response=%r", response_text[:500])
-            parts = [part.strip() for part in response_text.split("|")]
-            if len(parts) >= 2:
-                candidate = parts[0]
-                allowed = {
-                    "OOTB Match",
-                    "Partial Match",
-                    "Custom Dev Required",
-                    "Open Question",
-                }
-                if candidate in allowed:
-                    classification = candidate
-                try:
-                    llm_confidence = max(0.0, min(float(parts[1]), 1.0))
-                except (TypeError, ValueError):
-                    llm_confidence = None
-                if len(parts) >= 3:
-                    rationale = parts[2]
-            else:
-                logger.warning("LLM classify unparseable_response=%r", response_text[:500])
-        except Exception as exc:
-            logger.warning("LLM classify failed, using similarity only: %s", exc)
-            rationale = "Similarity-based classification (LLM unavailable)"
-
-    confidence = _combine_confidence(similarity_confidence, llm_confidence)
+    if llm_failed:
+        rationale = "Similarity-based classification (LLM unavailable)"
+    elif response_text is not None:
+        logger.info("LLM classify raw_response=%r", response_text[:500])
+        parts = [part.strip() for part in response_text.split("|")]
+        if len(parts) >= 2:
+            candidate = parts[0]
+            allowed = {
+                "OOTB Match",
+                "Partial Match",
+                "Custom Dev Required",
+                "Open Question",
+            }
+            if candidate in allowed:
+                classification = candidate
+            try:
+                llm_confidence = max(0.0, min(float(parts[1]), 1.0))
+            except (TypeError, ValueError):
+                llm_confidence = None
+            if len(parts) >= 3:
+                rationale = parts[2]
+        else:
+            logger.warning("LLM classify unparseable_response=%r", response_text[:500])
+
+    confidence = _combine_confidence(top_score, llm_confidence)
     classification = _normalize_classification_with_confidence(classification, confidence)
     classification = _promote_classification_with_baseline_signal(
         requirement,
@@ -652,30 +860,26 @@ def analyze_requirement(chroma: ChromaService, requirement: str, top_k: int) ->
         confidence,
         top_chunks,
     )
-    citations = _build_citations(top_chunks)
-
-    if classification == "Open Question" or confidence < 0.5:
-        try:
-            clarifying_questions = _generate_clarifying_questions(requirement, context)
-        except Exception as exc:
-            logger.warning("LLM questions failed: %s", exc)
-
     result = GapResult(
         requirement=requirement,
         classification=classification,
         confidence=round(confidence, 3),
         top_chunks=top_chunks,
         rationale=rationale,
-        similarity_score=round(similarity_confidence, 3),
+        similarity_score=round(top_score, 3),
         llm_confidence=llm_confidence,
-        llm_response=llm_response,
-        citations=citations,
-        clarifying_questions=clarifying_questions,
+        llm_response=response_text,
+        citations=_build_citations(top_chunks),
+        clarifying_questions=None,
         implementation_mode=None,
         coverage_status=None,
         project_match_status=None,
         gaps=None,
     )
+    return result, classification == "Open Question" or confidence < 0.5
+
+
+def _finish_result(result: GapResult) -> GapResult:
     (
         result.classification,
         result.implementation_mode,
@@ -684,7 +888,7 @@ def analyze_requirement(chroma: ChromaService, requirement: str, top_k: int) ->
         result.gaps,
         result.rationale,
     ) = _apply_project_first_flow(
-        requirement=requirement,
+        requirement=result.requirement,
         classification=result.classification,
         confidence=result.confidence,
         rationale=result.rationale,
@@ -694,6 +898,63 @@ def analyze_requirement(chroma: ChromaService, requirement: str, top_k: int) ->
     return result
 
 
+def analyze_requirement(
+    chroma: ChromaService,
+    requirement: str,
+    top_k: int,
+    prefetched: Optional[PrefetchedRetrieval] = None,
+) -> GapResult:
+    top_chunks, top_score = _retrieve_two_pass(chroma, requirement, top_k, prefetched=prefetched)
+    context, prompt = _classification_prompt(requirement, top_chunks)
+
+    response_text: Optional[str] = None
+    llm_failed = False
+    if prompt is not None:
+        try:
+            response_text = generate_text(prompt).strip()
+        except Exception as exc:
+            logger.warning("LLM classify failed, using similarity only: %s", exc)
+            llm_failed = True
+
+    result, needs_questions = _scored_result(requirement, top_chunks, top_score, response_text, llm_failed)
+    if needs_questions:
+        try:
+            result.clarifying_questions = _generate_clarifying_questions(requirement, context)
+        except Exception as exc:
+            logger.warning("LLM questions failed: %s", exc)
+    return _finish_result(result)
+
+
+async def aanalyze_requirement(
+    chroma: ChromaService,
+    requirement: str,
+    top_k: int,
+    prefetched: PrefetchedRetrieval,
+) -> GapResult:
+    """``analyze_requirement`` on the event loop: the LLM calls are awaited, so many requirements overlap."""
+    top_chunks, top_score = await asyncio.to_thread(_retrieve_two_pass, chroma, requirement, top_k, prefetched)
+    context, prompt = _classification_prompt(requirement, top_chunks)
+
+    response_text: Optional[str] = None
+    llm_failed = False
+    if prompt is not None:
+        try:
+            response_text = (await agenerate_text(prompt)).strip()
+        except Exception as exc:
+            logger.warning("LLM classify failed, using similarity only: %s", exc)
+            llm_failed = True
+
+    result, needs_questions = _scored_result(requirement, top_chunks, top_score, response_text, llm_failed)
+    if needs_questions:
+        try:
+            result.clarifying_questions = _questions_from_response(
+                await agenerate_text(_clarifying_questions_prompt(requirement, context))
+            )
+        except Exception as exc:
+            logger.warning("LLM questions failed: %s", exc)
+    return _finish_result(result)
+
+
 def analyze_requirement_agentic(
     chroma: ChromaService,
     requirement: str,
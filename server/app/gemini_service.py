@@ -1,18 +1,52 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Iterable
 
 import google.generativeai as genai
+from google.ai import generativelanguage as glm
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
 from google.api_core.exceptions import ResourceExhausted
 
 from .config import settings
+from .provider_clients import registry
+from .rate_limit import EMBED, GENERATE, estimate_tokens, provider_slot, provider_slot_async
+
+# batchEmbedContents accepts at most 100 requests per call.
+_MAX_EMBED_BATCH_SIZE = 100
 
 
 def _configure() -> None:
     if not settings.gemini_api_key:
         raise ValueError("GEMINI_API_KEY is required when LLM_PROVIDER=gemini")
-    genai.configure(api_key=settings.gemini_api_key)
+    # genai.configure drops the cached gRPC clients, so only call it when the key changes.
+    registry.get(
+        "gemini",
+        settings.gemini_api_key,
+        lambda: genai.configure(api_key=settings.gemini_api_key),
+    )
+
+
+def _get_model(model_name: str) -> genai.GenerativeModel:
+    _configure()
+    return registry.get(
+        "gemini_response_model",
+        (settings.gemini_api_key, model_name),
+        lambda: genai.GenerativeModel(model_name),
+    )
+
+
+def _build_async_client() -> glm.GenerativeServiceAsyncClient:
+    return glm.GenerativeServiceAsyncClient(client_options={"api_key": settings.gemini_api_key})
+
+
+def _get_async_client() -> glm.GenerativeServiceAsyncClient:
+    # genai caches one gRPC aio client process-wide, but its channel only works on the loop that created it,
+    # so each loop builds its own and passes it to the SDK explicitly.
+    if not settings.gemini_api_key:
+        raise ValueError("GEMINI_API_KEY is required when LLM_PROVIDER=gemini")
+    return registry.get_for_loop("gemini_async", settings.gemini_api_key, _build_async_client)
+
 
 def _normalize_model_name(name: str) -> str:
     if name.startswith("models/") or name.startswith("tunedModels/"):
@@ -20,6 +54,21 @@ def _normalize_model_name(name: str) -> str:
     return f"models/{name}"
 
 
+def _generation_config() -> dict | None:
+    if settings.gemini_temperature is None:
+        return None
+    return {"temperature": settings.gemini_temperature}
+
+
+def _checked_embeddings(response, batch: list[str]) -> list[list[float]]:
+    embeddings = response["embedding"]
+    if len(embeddings) != len(batch):
+        raise RuntimeError(
+            f"Gemini returned {len(embeddings)} embeddings for a batch of {len(batch)} texts"
+        )
+    return embeddings
+
+
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=1, max=8),
@@ -27,18 +76,57 @@ def _normalize_model_name(name: str) -> str:
         lambda exc: not isinstance(exc, (ResourceExhausted, ValueError))
     ),
 )
+def _embed_batch(model_name: str, batch: list[str], task_type: str) -> list[list[float]]:
+    with provider_slot(EMBED, tokens=sum(estimate_tokens(text) for text in batch)):
+        response = genai.embed_content(
+            model=model_name,
+            content=batch,
+            task_type=task_type,
+        )
+    return _checked_embeddings(response, batch)
+
+
+def _embed_batches(items: list[str]) -> list[list[str]]:
+    batch_size = max(1, min(settings.gemini_embed_batch_size, _MAX_EMBED_BATCH_SIZE))
+    return [items[start : start + batch_size] for start in range(0, len(items), batch_size)]
+
+
 def embed_texts(texts: Iterable[str], task_type: str) -> list[list[float]]:
     _configure()
-    embeddings: list[list[float]] = []
     model_name = _normalize_model_name(settings.gemini_embed_model)
-    for text in texts:
-        response = genai.embed_content(
+    embeddings: list[list[float]] = []
+    # Retries happen per batch so earlier batches are never re-embedded.
+    for batch in _embed_batches(list(texts)):
+        embeddings.extend(_embed_batch(model_name, batch, task_type))
+    return embeddings
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, min=1, max=8),
+    retry=retry_if_exception(
+        lambda exc: not isinstance(exc, (ResourceExhausted, ValueError))
+    ),
+)
+async def _aembed_batch(model_name: str, batch: list[str], task_type: str) -> list[list[float]]:
+    async with provider_slot_async(EMBED, tokens=sum(estimate_tokens(text) for text in batch)):
+        response = await genai.embed_content_async(
             model=model_name,
-            content=text,
+            content=batch,
             task_type=task_type,
+            client=_get_async_client(),
         )
-        embeddings.append(response["embedding"])
-    return embeddings
+    return _checked_embeddings(response, batch)
+
+
+async def aembed_texts(texts: Iterable[str], task_type: str) -> list[list[float]]:
+    _configure()
+    model_name = _normalize_model_name(settings.gemini_embed_model)
+    # Batches run concurrently; the embed governor caps how many are in flight.
+    results = await asyncio.gather(
+        *(_aembed_batch(model_name, batch, task_type) for batch in _embed_batches(list(texts)))
+    )
+    return [embedding for batch_embeddings in results for embedding in batch_embeddings]
 
 
 @retry(
@@ -49,7 +137,26 @@ def embed_texts(texts: Iterable[str], task_type: str) -> list[list[float]]:
     ),
 )
 def generate_text(prompt: str) -> str:
-    _configure()
-    model = genai.GenerativeModel(_normalize_model_name(settings.gemini_response_model))
-    response = model.generate_content(prompt)
+    model = _get_model(_normalize_model_name(settings.gemini_response_model))
+    with provider_slot(GENERATE, tokens=estimate_tokens(prompt)):
+        response = model.generate_content(prompt, generation_config=_generation_config())
     return response.text or ""
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, min=1, max=8),
+    retry=retry_if_exception(
+        lambda exc: not isinstance(exc, (ResourceExhausted, ValueError))
+    ),
+)
+async def agenerate_text(prompt: str) -> str:
+    request = genai.protos.GenerateContentRequest(
+        model=_normalize_model_name(settings.gemini_response_model),
+        contents=[{"role": "user", "parts": [{"text": prompt}]}],
+        generation_config=_generation_config(),
+    )
+    client = _get_async_client()
+    async with provider_slot_async(GENERATE, tokens=estimate_tokens(prompt)):
+        response = await client.generate_content(request)
+    return genai.types.AsyncGenerateContentResponse.from_response(response).text or ""
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
 import hashlib
-from dataclasses import dataclass
+import logging
+from dataclasses import dataclass, field
 from typing import Optional
 
-from .chroma_service import ChromaService, ChunkRecord
-from .chunking import chunk_text, dedupe_chunks
+from .chroma_service import ChromaService, ChunkRecord, StoredChunk
+from .embed_batcher import EmbedBatcher
+from .ingest_manifest import ManifestEntry
+from .chunking import chunk_document, dedupe_chunks
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class IngestDocument:
@@ -32,10 +37,10 @@ def _safe_meta(value: object) -> str | int | float | bool:
     return str(value)
 
 
-def to_chunks(doc: IngestDocument) -> list[ChunkRecord]:
+def document_text(doc: IngestDocument) -> str:
     text = doc.text.strip()
     if not text:
-        return []
+        return ""
 
     prefix_parts = []
     if doc.title:
@@ -44,9 +49,29 @@ def to_chunks(doc: IngestDocument) -> list[ChunkRecord]:
         prefix_parts.append(f"Space: {doc.space_key}")
     if prefix_parts:
         text = "\n".join(prefix_parts) + "\n\n" + text
+    return text
+
+
+def document_hash(doc: IngestDocument) -> str:
+    # The hash covers the title/space prefix, which is what the chunks actually embed.
+    return hash_text(document_text(doc))
+
+
+def should_skip(
+    chroma: ChromaService,
+    doc: IngestDocument,
+    manifest: Optional[dict[str, ManifestEntry]] = None,
+) -> bool:
+    return chroma.should_skip(doc.source, doc.source_id, document_hash(doc), manifest=manifest)
+
+
+def to_chunks(doc: IngestDocument) -> list[ChunkRecord]:
+    text = document_text(doc)
+    if not text:
+        return []
 
     content_hash = hash_text(text)
-    chunks = dedupe_chunks(chunk_text(text, settings.chunk_words, settings.chunk_overlap_words))
+    chunks = dedupe_chunks(chunk_document(text, settings.chunk_words, settings.chunk_overlap_words))
     records: list[ChunkRecord] = []
 
     for index, chunk in enumerate(chunks):
@@ -60,14 +85,94 @@ def to_chunks(doc: IngestDocument) -> list[ChunkRecord]:
             "updated_at": _safe_meta(str(doc.updated_at) if doc.updated_at else ""),
             "chunk_index": index,
             "content_hash": content_hash,
+            "chunk_hash": hash_text(chunk),
         }
         records.append(ChunkRecord(doc_id=doc_id, text=chunk, metadata=metadata))
     return records
 
 
-def upsert_document_chunks(chroma: ChromaService, doc: IngestDocument, task_type: str) -> int:
+@dataclass
+class ChunkPlan:
+    upsert: list[ChunkRecord] = field(default_factory=list)
+    # doc_id -> stored vector for upserted chunks whose text already exists under another id.
+    reuse: dict[str, list[float]] = field(default_factory=dict)
+    refresh: list[ChunkRecord] = field(default_factory=list)
+    delete: list[str] = field(default_factory=list)
+
+    @property
+    def embed_count(self) -> int:
+        return len(self.upsert) - len(self.reuse)
+
+
+def _stored_hash(chunk: StoredChunk) -> str:
+    # Chunks written before chunk_hash existed are hashed from their stored text.
+    return str(chunk.metadata.get("chunk_hash") or hash_text(chunk.text))
+
+
+def plan_chunk_update(records: list[ChunkRecord], stored: list[StoredChunk]) -> ChunkPlan:
+    by_id = {chunk.doc_id: chunk for chunk in stored}
+    by_hash = {_stored_hash(chunk): chunk.embedding for chunk in stored}
+    plan = ChunkPlan()
+    for record in records:
+        chunk_hash = record.metadata["chunk_hash"]
+        current = by_id.get(record.doc_id)
+        if current is not None and _stored_hash(current) == chunk_hash:
+            if current.metadata != record.metadata:
+                plan.refresh.append(record)
+            continue
+        plan.upsert.append(record)
+        if chunk_hash in by_hash:
+            plan.reuse[record.doc_id] = by_hash[chunk_hash]
+    new_ids = {record.doc_id for record in records}
+    plan.delete = [chunk.doc_id for chunk in stored if chunk.doc_id not in new_ids]
+    return plan
+
+
+def apply_chunk_plan(
+    chroma: ChromaService,
+    source: str,
+    plan: ChunkPlan,
+    task_type: str,
+    batcher: Optional[EmbedBatcher] = None,
+) -> None:
+    known_embeddings = plan.reuse
+    if batcher is not None:
+        # Embedded together with other documents' chunks; the upsert then only stores known vectors.
+        missing = [record for record in plan.upsert if record.doc_id not in plan.reuse]
+        vectors = batcher.embed([record.text for record in missing])
+        known_embeddings = {**plan.reuse, **{record.doc_id: vector for record, vector in zip(missing, vectors)}}
+    chroma.delete_chunks(source, plan.delete)
+    chroma.upsert_chunks(plan.upsert, task_type=task_type, known_embeddings=known_embeddings)
+    chroma.update_chunk_metadata(plan.refresh)
+
+
+def upsert_document_chunks(
+    chroma: ChromaService,
+    doc: IngestDocument,
+    task_type: str,
+    batcher: Optional[EmbedBatcher] = None,
+) -> int:
     records = to_chunks(doc)
     if not records:
         return 0
-    chroma.delete_source(doc.source, doc.source_id)
-    return chroma.upsert_chunks(records, task_type=task_type)
+    plan = plan_chunk_update(records, chroma.get_source_chunks(doc.source, doc.source_id))
+    apply_chunk_plan(chroma, doc.source, plan, task_type, batcher=batcher)
+    logger.debug(
+        "Updated %s:%s: %d chunks, %d embedded, %d reused, %d refreshed, %d deleted",
+        doc.source,
+        doc.source_id,
+        len(records),
+        plan.embed_count,
+        len(plan.reuse),
+        len(plan.refresh),
+        len(plan.delete),
+    )
+    chroma.record_manifest(
+        doc.source,
+        doc.source_id,
+        records[0].metadata["content_hash"],
+        [record.doc_id for record in records],
+        space_key=str(doc.space_key or ""),
+        source_updated_at=str(doc.updated_at or ""),
+    )
+    return len(records)
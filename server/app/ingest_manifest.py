@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+from .config import settings
+
+
+@dataclass
+class ManifestEntry:
+    source: str
+    source_id: str
+    content_hash: str
+    chunk_ids: list[str] = field(default_factory=list)
+    space_key: str = ""
+    source_updated_at: str = ""
+    version: int = 1
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+
+def _db_path() -> Path:
+    raw = (settings.ingest_manifest_path or "").strip()
+    if raw:
+        return Path(raw)
+    return Path(settings.chroma_persist_path).parent / "ingest_manifest.db"
+
+
+_conn_lock = threading.RLock()
+_conn: Optional[sqlite3.Connection] = None
+_conn_path: Optional[Path] = None
+
+
+def _open(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ingest_manifest (
+            collection TEXT NOT NULL,
+            source TEXT NOT NULL,
+            source_id TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            chunk_ids TEXT NOT NULL,
+            space_key TEXT NOT NULL DEFAULT '',
+            source_updated_at TEXT NOT NULL DEFAULT '',
+            version INTEGER NOT NULL DEFAULT 1,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (collection, source, source_id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ingest_manifest_collections (
+            collection TEXT PRIMARY KEY,
+            backfilled_at REAL NOT NULL
+        )
+        """
+    )
+    conn.commit()
+    return conn
+
+
+def _connection() -> sqlite3.Connection:
+    """The shared connection, opened on first use; callers hold ``_conn_lock``."""
+    global _conn, _conn_path
+    db_path = _db_path()
+    if _conn is None or _conn_path != db_path:
+        close()
+        _conn = _open(db_path)
+        _conn_path = db_path
+    return _conn
+
+
+def close() -> None:
+    global _conn, _conn_path
+    with _conn_lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = None
+        _conn_path = None
+
+
+_COLUMNS = (
+    "source, source_id, content_hash, chunk_ids, space_key, source_updated_at, version, created_at, updated_at"
+)
+
+
+def _entry(row: tuple) -> ManifestEntry:
+    return ManifestEntry(
+        source=row[0],
+        source_id=row[1],
+        content_hash=row[2],
+        chunk_ids=json.loads(row[3]),
+        space_key=row[4],
+        source_updated_at=row[5],
+        version=row[6],
+        created_at=row[7],
+        updated_at=row[8],
+    )
+
+
+def load(collection: str, source: str) -> dict[str, ManifestEntry]:
+    with _conn_lock, _connection() as conn:
+        rows = conn.execute(
+            f"SELECT {_COLUMNS} FROM ingest_manifest WHERE collection = ? AND source = ?",
+            (collection, source),
+        ).fetchall()
+    return {row[1]: _entry(row) for row in rows}
+
+
+def get(collection: str, source: str, source_id: str) -> Optional[ManifestEntry]:
+    with _conn_lock, _connection() as conn:
+        row = conn.execute(
+            f"SELECT {_COLUMNS} FROM ingest_manifest WHERE collection = ? AND source = ? AND source_id = ?",
+            (collection, source, source_id),
+        ).fetchone()
+    return _entry(row) if row else None
+
+
+def record(
+    collection: str,
+    source: str,
+    source_id: str,
+    content_hash: str,
+    chunk_ids: list[str],
+    space_key: str = "",
+    source_updated_at: str = "",
+) -> None:
+    now = time.time()
+    with _conn_lock, _connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO ingest_manifest (
+                collection, source, source_id, content_hash, chunk_ids, space_key,
+                source_updated_at, version, created_at, updated_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+            ON CONFLICT(collection, source, source_id) DO UPDATE SET
+                content_hash = excluded.content_hash,
+                chunk_ids = excluded.chunk_ids,
+                space_key = excluded.space_key,
+                source_updated_at = excluded.source_updated_at,
+                version = ingest_manifest.version + 1,
+                updated_at = excluded.updated_at
+            """,
+            (
+                collection,
+                source,
+                source_id,
+                content_hash,
+                json.dumps(chunk_ids),
+                space_key,
+                source_updated_at,
+                now,
+                now,
+            ),
+        )
+
+
+def delete(collection: str, source: str, source_id: str) -> None:
+    with _conn_lock, _connection() as conn:
+        conn.execute(
+            "DELETE FROM ingest_manifest WHERE collection = ? AND source = ? AND source_id = ?",
+            (collection, source, source_id),
+        )
+
+
+def move(collection: str, target: str, source: str) -> None:
+    with _conn_lock, _connection() as conn:
+        conn.execute(
+            "DELETE FROM ingest_manifest WHERE collection = ? AND source = ? AND source_id IN "
+            "(SELECT source_id FROM ingest_manifest WHERE collection = ? AND source = ?)",
+            (target, source, collection, source),
+        )
+        conn.execute(
+            "UPDATE ingest_manifest SET collection = ? WHERE collection = ? AND source = ?",
+            (target, collection, source),
+        )
+
+
+def source_ids(entries: dict[str, ManifestEntry], space_keys: Optional[Iterable[str]] = None) -> set[str]:
+    normalized_spaces = {space.strip() for space in (space_keys or ()) if space.strip()}
+    if not normalized_spaces:
+        return set(entries)
+    return {source_id for source_id, entry in entries.items() if entry.space_key in normalized_spaces}
+
+
+def is_backfilled(collection: str) -> bool:
+    with _conn_lock, _connection() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM ingest_manifest_collections WHERE collection = ?", (collection,)
+        ).fetchone()
+    return row is not None
+
+
+def backfill(collection: str, entries: Iterable[ManifestEntry]) -> int:
+    """Seed the manifest from existing collection metadata; rows already recorded are kept."""
+    now = time.time()
+    count = 0
+    with _conn_lock, _connection() as conn:
+        for entry in entries:
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO ingest_manifest (
+                    collection, source, source_id, content_hash, chunk_ids, space_key,
+                    source_updated_at, version, created_at, updated_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+                """,
+                (
+                    collection,
+                    entry.source,
+                    entry.source_id,
+                    entry.content_hash,
+                    json.dumps(entry.chunk_ids),
+                    entry.space_key,
+                    entry.source_updated_at,
+                    now,
+                    now,
+                ),
+            )
+            count += 1
+        conn.execute(
+            "INSERT OR REPLACE INTO ingest_manifest_collections (collection, backfilled_at) VALUES (?, ?)",
+            (collection, now),
+        )
+    return count
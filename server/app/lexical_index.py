@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_SQL_BATCH = 500
+# Long requirements are trimmed to their first distinct terms; BM25 is dominated by the rare ones anyway.
+_MAX_QUERY_TERMS = 32
+
+_TERM_RE = re.compile(r"[A-Za-z0-9_]+")
+_STOPWORDS = {
+    "a",
+    "an",
+    "and",
+    "are",
+    "as",
+    "at",
+    "be",
+    "by",
+    "for",
+    "from",
+    "has",
+    "have",
+    "in",
+    "is",
+    "it",
+    "of",
+    "on",
+    "or",
+    "that",
+    "the",
+    "to",
+    "with",
+}
+
+
+def enabled() -> bool:
+    return bool(settings.lexical_index_enabled)
+
+
+def _db_path() -> Path:
+    raw = (settings.lexical_index_path or "").strip()
+    if raw:
+        return Path(raw)
+    return Path(settings.chroma_persist_path).parent / "lexical_index.db"
+
+
+_conn_lock = threading.RLock()
+_conn: Optional[sqlite3.Connection] = None
+_conn_path: Optional[Path] = None
+# FTS tables known to exist on the open connection, so queries skip the CREATE ... IF NOT EXISTS.
+_tables: set[str] = set()
+
+
+def _open(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS lexical_chunks (
+            id INTEGER PRIMARY KEY,
+            collection TEXT NOT NULL,
+            doc_id TEXT NOT NULL,
+            source TEXT NOT NULL,
+            source_id TEXT NOT NULL,
+            UNIQUE (collection, doc_id)
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_lexical_chunks_source "
+        "ON lexical_chunks (collection, source, source_id)"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS lexical_collections (
+            collection TEXT PRIMARY KEY,
+            backfilled_at REAL NOT NULL
+        )
+        """
+    )
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'lexical_fts'").fetchone():
+        # The former single FTS table mixed every collection's BM25 statistics; rebuild per collection.
+        with conn:
+            conn.execute("DROP TABLE lexical_fts")
+            conn.execute("DELETE FROM lexical_chunks")
+            conn.execute("DELETE FROM lexical_collections")
+        logger.info("Dropped the shared lexical index; collections are re-indexed on their next backfill")
+    conn.commit()
+    return conn
+
+
+def _connection() -> sqlite3.Connection:
+    """The shared connection, opened on first use; callers hold ``_conn_lock``."""
+    global _conn, _conn_path
+    db_path = _db_path()
+    if _conn is None or _conn_path != db_path:
+        close()
+        _conn = _open(db_path)
+        _conn_path = db_path
+    return _conn
+
+
+def close() -> None:
+    global _conn, _conn_path
+    with _conn_lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = None
+        _conn_path = None
+        _tables.clear()
+
+
+def _fts_table(conn: sqlite3.Connection, collection: str, create: bool = True) -> Optional[str]:
+    """The collection's own FTS5 table, so BM25 term statistics only count that collection's chunks.
+
+    Its rowid is lexical_chunks.id; FTS5 keeps the inverted index and the statistics. Without
+    ``create``, a collection that has no table yet gives None.
+    """
+    table = f"lexical_fts_{hashlib.sha1(collection.encode('utf-8')).hexdigest()[:16]}"
+    if table in _tables:
+        return table
+    if create:
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(text, tokenize='porter unicode61')")
+    elif not conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone():
+        # Not remembered, so a table another process creates later is still found.
+        return None
+    _tables.add(table)
+    return table
+
+
+def _batches(items: Sequence, size: int = _SQL_BATCH) -> Iterable[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _delete_rows(conn: sqlite3.Connection, collection: str, row_ids: list[int]) -> None:
+    table = _fts_table(conn, collection)
+    for batch in _batches(row_ids):
+        placeholders = ",".join("?" for _ in batch)
+        conn.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", list(batch))
+        conn.execute(f"DELETE FROM lexical_chunks WHERE id IN ({placeholders})", list(batch))
+
+
+def _row_ids(conn: sqlite3.Connection, collection: str, doc_ids: Sequence[str]) -> list[int]:
+    row_ids: list[int] = []
+    for batch in _batches(doc_ids):
+        placeholders = ",".join("?" for _ in batch)
+        row_ids.extend(
+            row_id
+            for (row_id,) in conn.execute(
+                f"SELECT id FROM lexical_chunks WHERE collection = ? AND doc_id IN ({placeholders})",
+                [collection, *batch],
+            )
+        )
+    return row_ids
+
+
+def upsert(collection: str, rows: Sequence[tuple[str, str, str, str]]) -> None:
+    """Index ``(doc_id, text, source, source_id)`` rows, replacing any earlier version of each doc_id."""
+    if not rows:
+        return
+    with _conn_lock, _connection() as conn:
+        table = _fts_table(conn, collection)
+        _delete_rows(conn, collection, _row_ids(conn, collection, [row[0] for row in rows]))
+        for doc_id, text, source, source_id in rows:
+            cursor = conn.execute(
+                "INSERT INTO lexical_chunks (collection, doc_id, source, source_id) VALUES (?, ?, ?, ?)",
+                (collection, doc_id, source, source_id),
+            )
+            conn.execute(f"INSERT INTO {table} (rowid, text) VALUES (?, ?)", (cursor.lastrowid, text or ""))
+
+
+def delete_source(collection: str, source: str, source_id: str) -> None:
+    with _conn_lock, _connection() as conn:
+        row_ids = [
+            row_id
+            for (row_id,) in conn.execute(
+                "SELECT id FROM lexical_chunks WHERE collection = ? AND source = ? AND source_id = ?",
+                (collection, source, source_id),
+            )
+        ]
+        _delete_rows(conn, collection, row_ids)
+
+
+def delete_ids(collection: str, doc_ids: Sequence[str]) -> None:
+    with _conn_lock, _connection() as conn:
+        _delete_rows(conn, collection, _row_ids(conn, collection, list(doc_ids)))
+
+
+def move(collection: str, target: str, doc_ids: Sequence[str]) -> None:
+    """Move rows to ``target``'s table after their chunks moved collections, keeping their text."""
+    with _conn_lock, _connection() as conn:
+        source_table = _fts_table(conn, collection)
+        target_table = _fts_table(conn, target)
+        _delete_rows(conn, target, _row_ids(conn, target, list(doc_ids)))
+        row_ids = _row_ids(conn, collection, list(doc_ids))
+        for batch in _batches(row_ids):
+            placeholders = ",".join("?" for _ in batch)
+            conn.execute(
+                f"INSERT INTO {target_table} (rowid, text) "
+                f"SELECT rowid, text FROM {source_table} WHERE rowid IN ({placeholders})",
+                list(batch),
+            )
+            conn.execute(f"DELETE FROM {source_table} WHERE rowid IN ({placeholders})", list(batch))
+            conn.execute(
+                f"UPDATE lexical_chunks SET collection = ? WHERE id IN ({placeholders})",
+                [target, *batch],
+            )
+
+
+def is_backfilled(collection: str) -> bool:
+    with _conn_lock, _connection() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM lexical_collections WHERE collection = ?", (collection,)
+        ).fetchone()
+    return row is not None
+
+
+def mark_backfilled(collection: str) -> None:
+    with _conn_lock, _connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO lexical_collections (collection, backfilled_at) VALUES (?, ?)",
+            (collection, time.time()),
+        )
+
+
+def _match_expression(query_text: str) -> Optional[str]:
+    terms: list[str] = []
+    for term in _TERM_RE.findall(query_text.lower()):
+        if term in _STOPWORDS or term in terms:
+            continue
+        terms.append(term)
+        if len(terms) >= _MAX_QUERY_TERMS:
+            break
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def search_many(
+    collections: Sequence[str],
+    query_texts: Sequence[str],
+    sources: Optional[Sequence[str]],
+    limit: int,
+) -> list[list[str]]:
+    """Return the BM25-ranked doc ids for each query across ``collections``, best first.
+
+    Each collection is scored against its own statistics; the per-collection lists are merged by score.
+    """
+    results: list[list[str]] = [[] for _ in query_texts]
+    if limit <= 0 or not query_texts or not collections:
+        return results
+    source_filter = ""
+    source_params: list[str] = []
+    if sources is not None:
+        if not sources:
+            return results
+        source_filter = f" AND m.source IN ({','.join('?' for _ in sources)})"
+        source_params = list(sources)
+    try:
+        with _conn_lock, _connection() as conn:
+            statements = []
+            for collection in collections:
+                table = _fts_table(conn, collection, create=False)
+                if table is None:
+                    continue
+                statements.append(
+                    f"SELECT m.doc_id, bm25({table}) FROM {table} JOIN lexical_chunks m ON m.id = {table}.rowid "
+                    f"WHERE {table} MATCH ?{source_filter} ORDER BY bm25({table}) LIMIT ?"
+                )
+            for index, query_text in enumerate(query_texts):
+                expression = _match_expression(query_text)
+                if expression is None:
+                    continue
+                scored: list[tuple[float, str]] = []
+                for sql in statements:
+                    rows = conn.execute(sql, [expression, *source_params, limit]).fetchall()
+                    scored.extend((score, doc_id) for doc_id, score in rows)
+                # bm25() is lower for better matches.
+                scored.sort()
+                results[index] = [doc_id for _, doc_id in scored[:limit]]
+    except sqlite3.Error as exc:
+        logger.warning("Lexical index query failed, using vector results only: %s", exc)
+    return results
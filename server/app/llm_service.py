@@ -1,31 +1,292 @@
 from __future__ import annotations
 
-from typing import Iterable
+import asyncio
+import hashlib
+import time
+from typing import Iterable, Optional
 
+from . import cassette, embedding_cache, local_service, rate_limit, response_cache
 from .config import settings
+from .provider_clients import registry as provider_clients
+from .gemini_service import aembed_texts as gemini_aembed_texts
+from .gemini_service import agenerate_text as gemini_agenerate_text
 from .gemini_service import embed_texts as gemini_embed_texts
 from .gemini_service import generate_text as gemini_generate_text
+from .openai_service import aembed_texts as openai_aembed_texts
+from .openai_service import agenerate_text as openai_agenerate_text
 from .openai_service import embed_texts as openai_embed_texts
 from .openai_service import generate_text as openai_generate_text
+from .single_flight import AsyncSingleFlight, SingleFlight
+
+_embed_flights: SingleFlight[list[list[float]]] = SingleFlight()
+_generate_flights: SingleFlight[str] = SingleFlight()
+_aembed_flights: AsyncSingleFlight[list[list[float]]] = AsyncSingleFlight()
+_agenerate_flights: AsyncSingleFlight[str] = AsyncSingleFlight()
 
 
 def _provider() -> str:
     return (settings.llm_provider or "gemini").strip().lower()
 
 
-def embed_texts(texts: Iterable[str], task_type: str) -> list[list[float]]:
-    provider = _provider()
+def _embed_model(provider: str) -> str:
+    if provider == "openai":
+        return settings.openai_embed_model
+    if provider == "gemini":
+        return settings.gemini_embed_model
+    if provider == "local":
+        return local_service.embed_model_name()
+    raise ValueError(f"Unsupported LLM_PROVIDER '{settings.llm_provider}'")
+
+
+def _dispatch_embed_texts(provider: str, texts: list[str], task_type: str) -> list[list[float]]:
     if provider == "openai":
         return openai_embed_texts(texts, task_type=task_type)
     if provider == "gemini":
         return gemini_embed_texts(texts, task_type=task_type)
+    if provider == "local":
+        return local_service.embed_texts(texts, task_type=task_type)
     raise ValueError(f"Unsupported LLM_PROVIDER '{settings.llm_provider}'")
 
 
-def generate_text(prompt: str) -> str:
+async def _adispatch_embed_texts(provider: str, texts: list[str], task_type: str) -> list[list[float]]:
+    if provider == "openai":
+        return await openai_aembed_texts(texts, task_type=task_type)
+    if provider == "gemini":
+        return await gemini_aembed_texts(texts, task_type=task_type)
+    if provider == "local":
+        return await local_service.aembed_texts(texts, task_type=task_type)
+    raise ValueError(f"Unsupported LLM_PROVIDER '{settings.llm_provider}'")
+
+
+def _provider_embed_texts(provider: str, texts: list[str], task_type: str) -> list[list[float]]:
+    model = _embed_model(provider)
+    if cassette.replaying():
+        vectors, delay = cassette.replay_embeddings(provider, model, task_type, texts)
+        if delay:
+            time.sleep(delay)
+        return vectors
+    started = time.monotonic()
+    vectors = _dispatch_embed_texts(provider, texts, task_type)
+    if cassette.recording():
+        cassette.record_embeddings(provider, model, task_type, texts, vectors, time.monotonic() - started)
+    return vectors
+
+
+async def _aprovider_embed_texts(provider: str, texts: list[str], task_type: str) -> list[list[float]]:
+    model = _embed_model(provider)
+    if cassette.replaying():
+        vectors, delay = cassette.replay_embeddings(provider, model, task_type, texts)
+        if delay:
+            await asyncio.sleep(delay)
+        return vectors
+    started = time.monotonic()
+    vectors = await _adispatch_embed_texts(provider, texts, task_type)
+    if cassette.recording():
+        await asyncio.to_thread(
+            cassette.record_embeddings, provider, model, task_type, texts, vectors, time.monotonic() - started
+        )
+    return vectors
+
+
+def _embed_flight_key(provider: str, model: str, task_type: str, texts: list[str]) -> str:
+    digest = hashlib.sha256()
+    for part in (provider, model, task_type, *texts):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def _embed_missing(provider: str, model: str, texts: list[str], task_type: str) -> list[list[float]]:
+    def call() -> list[list[float]]:
+        vectors = _provider_embed_texts(provider, texts, task_type)
+        if embedding_cache.enabled():
+            embedding_cache.put_many(provider, model, task_type, texts, vectors)
+        return vectors
+
+    if not settings.llm_single_flight_enabled:
+        return call()
+    # Identical concurrent requests (e.g. the same query from several users) share one provider call.
+    return _embed_flights.do(_embed_flight_key(provider, model, task_type, texts), call)
+
+
+def embed_texts(texts: Iterable[str], task_type: str) -> list[list[float]]:
+    provider = _provider()
+    model = _embed_model(provider)
+    items = list(texts)
+    if not items:
+        return []
+    if not embedding_cache.enabled():
+        return list(_embed_missing(provider, model, items, task_type))
+
+    embeddings = embedding_cache.get_many(provider, model, task_type, items)
+    missing: dict[str, list[int]] = {}
+    for index, vector in enumerate(embeddings):
+        if vector is None:
+            missing.setdefault(items[index], []).append(index)
+    if missing:
+        missing_texts = list(missing)
+        fresh = _embed_missing(provider, model, missing_texts, task_type)
+        for text, vector in zip(missing_texts, fresh):
+            for index in missing[text]:
+                embeddings[index] = vector
+    return embeddings
+
+
+async def _aembed_missing(provider: str, model: str, texts: list[str], task_type: str) -> list[list[float]]:
+    async def call() -> list[list[float]]:
+        vectors = await _aprovider_embed_texts(provider, texts, task_type)
+        if embedding_cache.enabled():
+            await asyncio.to_thread(embedding_cache.put_many, provider, model, task_type, texts, vectors)
+        return vectors
+
+    if not settings.llm_single_flight_enabled:
+        return await call()
+    return await _aembed_flights.do(_embed_flight_key(provider, model, task_type, texts), call)
+
+
+async def aembed_texts(texts: Iterable[str], task_type: str) -> list[list[float]]:
+    """Async ``embed_texts``; cache lookups run in a worker thread so the event loop never blocks on SQLite."""
     provider = _provider()
+    model = _embed_model(provider)
+    items = list(texts)
+    if not items:
+        return []
+    if not embedding_cache.enabled():
+        return list(await _aembed_missing(provider, model, items, task_type))
+
+    embeddings = await asyncio.to_thread(embedding_cache.get_many, provider, model, task_type, items)
+    missing: dict[str, list[int]] = {}
+    for index, vector in enumerate(embeddings):
+        if vector is None:
+            missing.setdefault(items[index], []).append(index)
+    if missing:
+        missing_texts = list(missing)
+        fresh = await _aembed_missing(provider, model, missing_texts, task_type)
+        for text, vector in zip(missing_texts, fresh):
+            for index in missing[text]:
+                embeddings[index] = vector
+    return embeddings
+
+
+def _generation_settings(provider: str) -> tuple[str, Optional[float]]:
+    if provider == "openai":
+        return settings.openai_response_model, settings.openai_temperature
+    if provider == "gemini":
+        return settings.gemini_response_model, settings.gemini_temperature
+    if provider == "local":
+        return local_service.LOCAL_RESPONSE_MODEL, None
+    raise ValueError(f"Unsupported LLM_PROVIDER '{settings.llm_provider}'")
+
+
+def _dispatch_generate_text(provider: str, prompt: str) -> str:
     if provider == "openai":
         return openai_generate_text(prompt)
     if provider == "gemini":
         return gemini_generate_text(prompt)
+    if provider == "local":
+        return local_service.generate_text(prompt)
+    raise ValueError(f"Unsupported LLM_PROVIDER '{settings.llm_provider}'")
+
+
+def _provider_generate_text(provider: str, prompt: str) -> str:
+    model, temperature = _generation_settings(provider)
+    if cassette.replaying():
+        response, delay = cassette.replay_response(provider, model, temperature, prompt)
+        if delay:
+            time.sleep(delay)
+        return response
+    started = time.monotonic()
+    response = _dispatch_generate_text(provider, prompt)
+    if cassette.recording():
+        cassette.record_response(provider, model, temperature, prompt, response, time.monotonic() - started)
+    return response
+
+
+def generate_text(prompt: str) -> str:
+    provider = _provider()
+    model, temperature = _generation_settings(provider)
+    use_cache = response_cache.enabled()
+    if use_cache:
+        cached = response_cache.get(provider, model, temperature, prompt)
+        if cached is not None:
+            return cached
+
+    def call() -> str:
+        response = _provider_generate_text(provider, prompt)
+        if use_cache and response.strip():
+            response_cache.put(provider, model, temperature, prompt, response)
+        return response
+
+    if not settings.llm_single_flight_enabled:
+        return call()
+    return _generate_flights.do(response_cache.cache_key(provider, model, temperature, prompt), call)
+
+
+async def _adispatch_generate_text(provider: str, prompt: str) -> str:
+    if provider == "openai":
+        return await openai_agenerate_text(prompt)
+    if provider == "gemini":
+        return await gemini_agenerate_text(prompt)
+    if provider == "local":
+        return await local_service.agenerate_text(prompt)
     raise ValueError(f"Unsupported LLM_PROVIDER '{settings.llm_provider}'")
+
+
+async def _aprovider_generate_text(provider: str, prompt: str) -> str:
+    model, temperature = _generation_settings(provider)
+    if cassette.replaying():
+        response, delay = cassette.replay_response(provider, model, temperature, prompt)
+        if delay:
+            await asyncio.sleep(delay)
+        return response
+    started = time.monotonic()
+    response = await _adispatch_generate_text(provider, prompt)
+    if cassette.recording():
+        await asyncio.to_thread(
+            cassette.record_response, provider, model, temperature, prompt, response, time.monotonic() - started
+        )
+    return response
+
+
+async def agenerate_text(prompt: str) -> str:
+    provider = _provider()
+    model, temperature = _generation_settings(provider)
+    use_cache = response_cache.enabled()
+    if use_cache:
+        cached = await asyncio.to_thread(response_cache.get, provider, model, temperature, prompt)
+        if cached is not None:
+            return cached
+
+    async def call() -> str:
+        response = await _aprovider_generate_text(provider, prompt)
+        if use_cache and response.strip():
+            await asyncio.to_thread(response_cache.put, provider, model, temperature, prompt, response)
+        return response
+
+    if not settings.llm_single_flight_enabled:
+        return await call()
+    return await _agenerate_flights.do(response_cache.cache_key(provider, model, temperature, prompt), call)
+
+
+def provider_metrics() -> dict:
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "rate_limits": rate_limit.stats(),
+        "clients": provider_clients.stats(),
+        "cassette": cassette.stats(),
+        "single_flight": {
+            "embed": _embed_flights.stats(),
+            "generate": _generate_flights.stats(),
+            "async_embed": _aembed_flights.stats(),
+            "async_generate": _agenerate_flights.stats(),
+        },
+    }
+
+
+def close_provider_clients() -> None:
+    provider_clients.close_all()
+
+
+async def aclose_provider_clients() -> None:
+    await provider_clients.aclose_all()
@@ -4,6 +4,7 @@ from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTa
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 
+import asyncio
 import io
 import html
 import re
@@ -11,6 +12,7 @@ import json
 import threading
 import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 from urllib.parse import urljoin, urlparse
 
@@ -18,26 +20,46 @@ import httpx
 from bs4 import BeautifulSoup
 
 from .confluence import (
+    ConfluenceNotConfigured,
+    SpaceSearch,
     create_child_page,
-    fetch_page,
     find_child_page,
     list_folder_pages,
     list_spaces,
     page_to_text,
-    search_pages,
 )
-from .ingest import IngestDocument, upsert_document_chunks
-
-from .chroma_service import ChromaService
+from .ingest import IngestDocument, should_skip, upsert_document_chunks
+
+from . import (
+    embed_batcher,
+    embedding_cache,
+    ingest_manifest,
+    lexical_index,
+    pipeline,
+    response_cache,
+    retrieval_metrics,
+)
+from .chroma_service import ChromaService, UnknownNamespace, normalize_namespace
 from .config import settings
-from .gap_analyzer import analyze_requirement, analyze_requirement_agentic
-from .llm_service import generate_text
+from .embed_batcher import EmbedBatcher
+from .gap_analyzer import (
+    aanalyze_requirement,
+    analyze_requirement,
+    analyze_requirement_agentic,
+    aprefetch_two_pass,
+    prefetch_two_pass,
+    shutdown_speculative_executor,
+)
+from .ingest_manifest import source_ids
+from .llm_service import aclose_provider_clients, generate_text, provider_metrics
 from .fsd_generator import (
     generate_fsd_docx,
     generate_fsd_docx_from_text,
     generate_fsd_json,
     render_fsd_text,
 )
+from .pipeline import Pipeline, Stage
+from .rate_limit import PRIORITY_BACKGROUND, call_priority
 from .requirement_parser import (
     parse_requirements_from_docx,
     parse_requirements_from_pdf,
@@ -82,6 +104,8 @@ from .thread_store import (
 
 app = FastAPI(title="SFRA AI Agent API", version="0.2.0")
 chroma = ChromaService()
+namespaced_chroma: OrderedDict[str, ChromaService] = OrderedDict()
+namespaced_chroma_lock = threading.Lock()
 ingest_jobs: dict[str, dict] = {}
 ingest_jobs_lock = threading.Lock()
 init_workspace_db()
@@ -128,16 +152,85 @@ app.add_middleware(
 )
 
 
-def _analyze_single_requirement(requirement: str, top_k: int, agent_mode: bool):
+def get_chroma(namespace: str | None = None, create: bool = False) -> ChromaService:
+    """The store for a project namespace; each namespace has its own collections.
+
+    Only ingest passes ``create``: reading a namespace that was never ingested raises ``UnknownNamespace``.
+    The ``CHROMA_NAMESPACE_CACHE_SIZE`` most recently used stores stay open.
+    """
+    name = normalize_namespace(namespace)
+    if not name:
+        return chroma
+    with namespaced_chroma_lock:
+        service = namespaced_chroma.get(name)
+        if service is None:
+            service = ChromaService(namespace=name, create=create)
+            namespaced_chroma[name] = service
+            _backfill_lexical_index_in_background(service)
+        namespaced_chroma.move_to_end(name)
+        while len(namespaced_chroma) > max(1, settings.chroma_namespace_cache_size):
+            namespaced_chroma.popitem(last=False)
+    return service
+
+
+def _backfill_lexical_index_in_background(store: ChromaService) -> None:
+    # Collections indexed before the lexical index existed answer with vector results only until this is done.
+    threading.Thread(target=store.backfill_lexical_index, name="lexical-backfill", daemon=True).start()
+
+
+def _chroma_for_request(namespace: str | None, create: bool = False) -> ChromaService:
+    try:
+        return get_chroma(namespace, create=create)
+    except UnknownNamespace as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def _analyze_single_requirement(store: ChromaService, requirement: str, top_k: int, agent_mode: bool):
     if agent_mode:
         return analyze_requirement_agentic(
-            chroma,
+            store,
             requirement,
             top_k,
             max_steps=settings.agentic_max_steps,
             stop_confidence=settings.agentic_stop_confidence,
         )
-    return analyze_requirement(chroma, requirement, top_k)
+    return analyze_requirement(store, requirement, top_k)
+
+
+def _analyze_requirements(store: ChromaService, requirements: list[str], top_k: int, agent_mode: bool) -> list:
+    if agent_mode:
+        return [_analyze_single_requirement(store, requirement, top_k, agent_mode) for requirement in requirements]
+    # Retrieval for a window of requirements is batched into one embedding call and one query per scope.
+    results = []
+    batch_size = max(1, settings.retrieval_batch_size)
+    for start in range(0, len(requirements), batch_size):
+        batch = requirements[start : start + batch_size]
+        for requirement, prefetched in zip(batch, prefetch_two_pass(store, batch, top_k)):
+            results.append(analyze_requirement(store, requirement, top_k, prefetched=prefetched))
+    return results
+
+
+async def _aanalyze_requirements(store: ChromaService, requirements: list[str], top_k: int, agent_mode: bool) -> list:
+    if agent_mode:
+        # Each agent step depends on the previous answer, so that loop stays on a worker thread.
+        return await asyncio.to_thread(_analyze_requirements, store, requirements, top_k, agent_mode)
+    # A batch's LLM calls are in flight together; the provider governor bounds how many actually run.
+    results = []
+    batch_size = max(1, settings.retrieval_batch_size)
+    for start in range(0, len(requirements), batch_size):
+        batch = requirements[start : start + batch_size]
+        prefetched = await aprefetch_two_pass(store, batch, top_k)
+        results.extend(
+            await asyncio.gather(
+                *(
+                    aanalyze_requirement(store, requirement, top_k, prefetched=item)
+                    for requirement, item in zip(batch, prefetched)
+                )
+            )
+        )
+    return results
 
 
 def fsd_text_to_confluence_html(title: str, fsd_text: str) -> str:
@@ -321,30 +414,97 @@ def _set_ingest_job(job_id: str, **updates) -> None:
         current.update(updates)
 
 
-def _run_confluence_ingest(progress_cb=None) -> dict:
-    space_keys = [key.strip() for key in settings.confluence_space_keys.split(",") if key.strip()]
+def _run_confluence_ingest(progress_cb=None, namespace: str = "", space_keys: list[str] | None = None) -> dict:
+    if space_keys is None:
+        space_keys = settings.confluence_space_keys.split(",")
+    space_keys = [key.strip() for key in space_keys if key.strip()]
     if not space_keys:
-        raise ValueError("CONFLUENCE_SPACE_KEYS is not set")
+        raise ConfluenceNotConfigured("CONFLUENCE_SPACE_KEYS is not set")
+    store = get_chroma(namespace, create=True)
 
     if progress_cb:
         progress_cb(stage="Collecting Confluence pages...", progress=5)
 
-    page_ids = search_pages(space_keys, settings.confluence_cql_extra.strip())
-    total_pages = len(page_ids)
-    existing_page_ids = chroma.list_source_ids("confluence", set(space_keys))
-    current_page_ids = set(page_ids)
-    deleted_page_ids = sorted(existing_page_ids - current_page_ids)
+    manifest = store.manifest_entries("confluence")
+    existing_page_ids = source_ids(manifest, space_keys)
+    reported_total: list[int] = []
 
+    total_chunks = 0
+    indexed_pages = 0
+    skipped_pages = 0
+    current_page_ids: set[str] = set()
+    cql_extra = settings.confluence_cql_extra.strip()
+
+    def parse_page(page):
+        doc = IngestDocument(
+            source="confluence",
+            source_id=page.page_id,
+            title=page.title,
+            url=page.url,
+            space_key=page.space_key,
+            updated_at=page.updated_at,
+            text=page_to_text(page),
+        )
+        return doc, should_skip(store, doc, manifest)
+
+    # Embed workers pool their chunks, so short pages share embedding requests.
+    batcher = EmbedBatcher("retrieval_document", name="confluence", callers=settings.ingest_embed_workers)
+
+    def index_page(parsed):
+        doc, skip = parsed
+        chunks = 0 if skip else upsert_document_chunks(store, doc, task_type="retrieval_document", batcher=batcher)
+        return doc.source_id, skip, chunks
+
+    # Spaces, and result offsets within each space, are searched in parallel, and conversion and
+    # embedding overlap with the search; progress is reported from this (consuming) thread only.
+    ingest = Pipeline(
+        "confluence",
+        [
+            *SpaceSearch(cql_extra, on_total=reported_total.append).stages(len(space_keys)),
+            Stage("parse", parse_page, workers=settings.ingest_parse_workers),
+            Stage("embed", index_page, workers=settings.ingest_embed_workers, on_exit=batcher.leave),
+        ],
+    )
+    for idx, (page_id, skipped, chunks) in enumerate(ingest.iter(space_keys), start=1):
+        current_page_ids.add(page_id)
+        if skipped:
+            skipped_pages += 1
+        else:
+            total_chunks += chunks
+            indexed_pages += 1
+
+        if progress_cb:
+            # Each space reports its own total; until all have, the sum is a lower bound.
+            expected = max(sum(reported_total), idx) if len(reported_total) == len(space_keys) else 0
+            if expected:
+                page_progress = int((idx / expected) * 85)
+                counter = f"{idx}/{expected}"
+            else:
+                page_progress = int(85 * idx / (idx + 50))
+                counter = str(idx)
+            progress_cb(
+                stage=f"Processed {counter} pages (indexed {indexed_pages}, skipped {skipped_pages})...",
+                progress=min(95, 10 + page_progress),
+                pages_total=expected or idx,
+                pages_processed=idx,
+                pages_indexed=indexed_pages,
+                pages_skipped=skipped_pages,
+                chunks=total_chunks,
+            )
+
+    total_pages = len(current_page_ids)
+    # Stale pages are only known once the whole search has been read.
+    deleted_page_ids = sorted(existing_page_ids - current_page_ids)
     if deleted_page_ids:
         if progress_cb:
             progress_cb(
                 stage=f"Removing {len(deleted_page_ids)} deleted Confluence pages...",
-                progress=7,
+                progress=97,
             )
         for stale_page_id in deleted_page_ids:
-            chroma.delete_source("confluence", stale_page_id)
+            store.delete_source("confluence", stale_page_id)
 
-    if not page_ids:
+    if not total_pages:
         if progress_cb:
             progress_cb(
                 stage=(
@@ -361,39 +521,6 @@ def _run_confluence_ingest(progress_cb=None) -> dict:
             )
         return {"pages": 0, "chunks": 0, "indexed": 0, "skipped": 0, "deleted": len(deleted_page_ids)}
 
-    total_chunks = 0
-    indexed_pages = 0
-    skipped_pages = 0
-    for idx, page_id in enumerate(page_ids, start=1):
-        page = fetch_page(page_id)
-        text = page_to_text(page)
-        if chroma.should_skip("confluence", page.page_id, text):
-            skipped_pages += 1
-        else:
-            doc = IngestDocument(
-                source="confluence",
-                source_id=page.page_id,
-                title=page.title,
-                url=page.url,
-                space_key=page.space_key,
-                updated_at=page.updated_at,
-                text=text,
-            )
-            total_chunks += upsert_document_chunks(chroma, doc, task_type="retrieval_document")
-            indexed_pages += 1
-
-        if progress_cb:
-            page_progress = int((idx / total_pages) * 88)
-            progress_cb(
-                stage=f"Processed {idx}/{total_pages} pages (indexed {indexed_pages}, skipped {skipped_pages})...",
-                progress=min(98, 10 + page_progress),
-                pages_total=total_pages,
-                pages_processed=idx,
-                pages_indexed=indexed_pages,
-                pages_skipped=skipped_pages,
-                chunks=total_chunks,
-            )
-
     if progress_cb:
         progress_cb(
             stage="Ingestion completed.",
@@ -456,8 +583,11 @@ def _extract_web_text(html_text: str) -> tuple[str, str]:
     return title, cleaned
 
 
-def _run_web_sources_ingest(links: list[dict], crawl_depth: int, max_pages: int, progress_cb=None) -> dict:
-    queue: list[tuple[str, int, str, str]] = []
+def _run_web_sources_ingest(
+    links: list[dict], crawl_depth: int, max_pages: int, progress_cb=None, namespace: str = ""
+) -> dict:
+    store = get_chroma(namespace, create=True)
+    level: list[tuple[str, int, str, str]] = []
     seen: set[str] = set()
     total_chunks = 0
     indexed_pages = 0
@@ -472,81 +602,109 @@ def _run_web_sources_ingest(links: list[dict], crawl_depth: int, max_pages: int,
         if not normalized:
             continue
         note = str(entry.get("note") or "").strip()
-        queue.append((normalized, 0, normalized, note))
+        level.append((normalized, 0, normalized, note))
 
-    if not queue:
+    if not level:
         return {"processed": 0, "indexed": 0, "skipped": 0, "chunks": 0}
 
-    existing_source_ids = chroma.list_source_ids("baseline_web")
+    manifest = store.manifest_entries("baseline_web")
+    existing_source_ids = source_ids(manifest)
     current_source_ids: set[str] = set()
 
     with httpx.Client(timeout=20.0, headers={"User-Agent": "Scout-Ingest/1.0"}) as client:
-        while queue and processed_pages < max_pages:
-            url, depth, seed_url, note = queue.pop(0)
-            if url in seen:
-                continue
-            seen.add(url)
-            current_source_ids.add(url)
 
+        def fetch_page(item):
+            url = item[1][0]
             try:
                 response = client.get(url)
                 response.raise_for_status()
             except Exception:
-                skipped_pages += 1
-                processed_pages += 1
-                continue
-
-            content_type = response.headers.get("content-type", "").lower()
-            if "text/html" not in content_type:
-                skipped_pages += 1
-                processed_pages += 1
-                continue
-
-            html_text = response.text
+                return item, None
+            if "text/html" not in response.headers.get("content-type", "").lower():
+                return item, None
+            return item, response.text
+
+        def parse_page(fetched):
+            (position, (url, depth, seed_url, note)), html_text = fetched
+            if html_text is None:
+                return position, None, []
             title, text = _extract_web_text(html_text)
             if not text.strip():
-                skipped_pages += 1
-                processed_pages += 1
-                continue
-
+                return position, None, []
             if note:
                 text = f"Source Note: {note}\n\n{text}"
-            source_id = url
-            if chroma.should_skip("baseline_web", source_id, text):
-                skipped_pages += 1
-            else:
-                doc = IngestDocument(
-                    source="baseline_web",
-                    source_id=source_id,
-                    title=title,
-                    url=url,
-                    space_key=urlparse(seed_url).netloc.lower(),
-                    updated_at=None,
-                    text=text,
-                )
-                total_chunks += upsert_document_chunks(chroma, doc, task_type="retrieval_document")
-                indexed_pages += 1
-            processed_pages += 1
-
-            if depth < crawl_depth:
-                host = urlparse(seed_url).netloc
-                discovered = _extract_web_links(html_text, url, host)
-                for link in discovered[:40]:
-                    if link not in seen:
-                        queue.append((link, depth + 1, seed_url, note))
+            doc = IngestDocument(
+                source="baseline_web",
+                source_id=url,
+                title=title,
+                url=url,
+                space_key=urlparse(seed_url).netloc.lower(),
+                updated_at=None,
+                text=text,
+            )
+            discovered = _extract_web_links(html_text, url, urlparse(seed_url).netloc) if depth < crawl_depth else []
+            return position, (doc, should_skip(store, doc, manifest)), discovered[:40]
+
+        batcher = EmbedBatcher("retrieval_document", name="baseline-web", callers=settings.ingest_embed_workers)
+
+        def index_page(parsed):
+            position, prepared, discovered = parsed
+            if prepared is None or prepared[1]:
+                return position, None, discovered
+            doc, _ = prepared
+            chunks = upsert_document_chunks(store, doc, task_type="retrieval_document", batcher=batcher)
+            return position, chunks, discovered
+
+        crawl = Pipeline(
+            "baseline-web",
+            [
+                Stage("fetch", fetch_page, workers=settings.ingest_fetch_workers),
+                Stage("parse", parse_page, workers=settings.ingest_parse_workers),
+                Stage("embed", index_page, workers=settings.ingest_embed_workers, on_exit=batcher.leave),
+            ],
+        )
+        # Breadth-first, one crawl level per pipeline run: a level's links are only known once it is parsed.
+        while level and processed_pages < max_pages:
+            batch: list[tuple[str, int, str, str]] = []
+            for url, depth, seed_url, note in level:
+                if processed_pages + len(batch) >= max_pages:
+                    break
+                if url in seen:
+                    continue
+                seen.add(url)
+                current_source_ids.add(url)
+                batch.append((url, depth, seed_url, note))
+
+            found: dict[int, list[str]] = {}
+            for position, chunks, discovered in crawl.iter(enumerate(batch)):
+                found[position] = discovered
+                if chunks is None:
+                    skipped_pages += 1
+                else:
+                    total_chunks += chunks
+                    indexed_pages += 1
+                processed_pages += 1
 
-            if progress_cb:
-                web_progress = 62 + int((processed_pages / max_pages) * 36)
-                progress_cb(
-                    progress=min(98, max(62, web_progress)),
-                    web_pages_indexed=indexed_pages,
-                    web_pages_skipped=skipped_pages,
-                    stage=f"Indexed baseline web sources: {processed_pages} pages processed...",
-                )
+                if progress_cb:
+                    web_progress = 62 + int((processed_pages / max_pages) * 36)
+                    progress_cb(
+                        progress=min(98, max(62, web_progress)),
+                        web_pages_indexed=indexed_pages,
+                        web_pages_skipped=skipped_pages,
+                        stage=f"Indexed baseline web sources: {processed_pages} pages processed...",
+                    )
+
+            # Links keep their crawl order, whichever page finished first.
+            level = [
+                (link, depth + 1, seed_url, note)
+                for position, (url, depth, seed_url, note) in enumerate(batch)
+                for link in found.get(position, [])
+                if link not in seen
+            ]
 
     stale_source_ids = sorted(existing_source_ids - current_source_ids)
     for stale_source_id in stale_source_ids:
-        chroma.delete_source("baseline_web", stale_source_id)
+        store.delete_source("baseline_web", stale_source_id)
 
     return {
         "processed": processed_pages,
@@ -561,6 +719,8 @@ def _run_ingest_pipeline(payload: dict | None, progress_cb=None) -> dict:
     baseline_links = payload.get("baseline_links", []) if payload else []
     crawl_depth = int(payload.get("crawl_depth", 1)) if payload else 1
     max_pages = int(payload.get("max_pages", 60)) if payload else 60
+    namespace = str(payload.get("namespace") or "") if payload else ""
+    space_keys = payload.get("space_keys") if payload else None
 
     total_chunks = 0
     confluence_result = {"pages": 0, "indexed": 0, "skipped": 0, "chunks": 0}
@@ -570,9 +730,11 @@ def _run_ingest_pipeline(payload: dict | None, progress_cb=None) -> dict:
         if progress_cb:
             progress_cb(stage="Starting Confluence ingestion...", progress=3)
         try:
-            confluence_result = _run_confluence_ingest(progress_cb=progress_cb)
+            confluence_result = _run_confluence_ingest(
+                progress_cb=progress_cb, namespace=namespace, space_keys=space_keys
+            )
             total_chunks += confluence_result["chunks"]
-        except ValueError:
+        except ConfluenceNotConfigured:
             # Allow baseline-web-only ingestion when Confluence config is unavailable.
             if not baseline_links:
                 raise
@@ -587,6 +749,7 @@ def _run_ingest_pipeline(payload: dict | None, progress_cb=None) -> dict:
             crawl_depth=crawl_depth,
             max_pages=max_pages,
             progress_cb=progress_cb,
+            namespace=namespace,
         )
         total_chunks += web_result["chunks"]
 
@@ -607,7 +770,11 @@ def _run_ingest_job(job_id: str) -> None:
         with ingest_jobs_lock:
             payload = dict(ingest_jobs.get(job_id, {}).get("payload") or {})
 
-        result = _run_ingest_pipeline(progress_cb=lambda **kwargs: _set_ingest_job(job_id, **kwargs), payload=payload)
+        with call_priority(PRIORITY_BACKGROUND):
+            result = _run_ingest_pipeline(
+                progress_cb=lambda **kwargs: _set_ingest_job(job_id, **kwargs),
+                payload=payload,
+            )
         _set_ingest_job(
             job_id,
             status="completed",
@@ -633,11 +800,36 @@ def _run_ingest_job(job_id: str) -> None:
         )
 
 
+@app.on_event("startup")
+def backfill_lexical_index() -> None:
+    _backfill_lexical_index_in_background(chroma)
+
+
+@app.on_event("shutdown")
+async def shutdown_clients() -> None:
+    await aclose_provider_clients()
+    shutdown_speculative_executor()
+    embedding_cache.close()
+    response_cache.close()
+    lexical_index.close()
+    ingest_manifest.close()
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics():
+    return {
+        **provider_metrics(),
+        "retrieval": retrieval_metrics.stats(),
+        "ingest_pipelines": pipeline.stats(),
+        "ingest_embed_batches": embed_batcher.stats(),
+    }
+
+
 @app.get("/workspace/state", response_model=WorkspaceStatePayload)
 def workspace_state_get(x_user_email: str | None = Header(default=None)):
     user_email = (x_user_email or "").strip().lower()
@@ -671,13 +863,15 @@ def workspace_state_save(payload: WorkspaceStatePayload, x_user_email: str | Non
 
 
 @app.post("/query", response_model=QueryResponse)
-def query_docs(payload: QueryRequest):
+async def query_docs(payload: QueryRequest):
     question = payload.question.strip()
     if not question:
         raise HTTPException(status_code=400, detail="question is required")
 
     top_k = payload.top_k or settings.top_k
-    response = chroma.query(question, top_k)
+    store = await asyncio.to_thread(_chroma_for_request, payload.namespace)
+    query_embedding = (await store.aembed_queries([question]))[0]
+    response = await asyncio.to_thread(store.query, question, top_k, query_embedding=query_embedding)
     chunks = []
     for text, meta, dist in zip(
         response["documents"][0],
@@ -691,7 +885,7 @@ def query_docs(payload: QueryRequest):
 
 
 @app.post("/analyze", response_model=AnalyzeResponse)
-def analyze(payload: AnalyzeRequest):
+async def analyze(payload: AnalyzeRequest):
     requirements = payload.requirements_list or []
     if payload.requirements_text:
         requirements.extend(parse_requirements_from_text(payload.requirements_text))
@@ -700,16 +894,17 @@ def analyze(payload: AnalyzeRequest):
 
     top_k = payload.top_k or settings.top_k
     use_agent_mode = settings.agentic_default if payload.agent_mode is None else payload.agent_mode
-    results = []
-    for requirement in requirements:
-        gap = _analyze_single_requirement(requirement, top_k, use_agent_mode)
-        results.append(GapResult(**gap.__dict__))
+    store = await asyncio.to_thread(_chroma_for_request, payload.namespace)
+    results = [
+        GapResult(**gap.__dict__)
+        for gap in await _aanalyze_requirements(store, requirements, top_k, use_agent_mode)
+    ]
 
     baseline_summary = None
     baseline_removed = None
     if payload.baseline_name:
         try:
-            baseline = load_baseline(payload.baseline_name)
+            baseline = await asyncio.to_thread(load_baseline, payload.baseline_name)
         except FileNotFoundError:
             raise HTTPException(status_code=404, detail="Baseline not found")
         result_dicts = [r.model_dump() for r in results]
@@ -735,9 +930,9 @@ def analyze(payload: AnalyzeRequest):
 
 
 @app.post("/analyze-agentic", response_model=AnalyzeResponse)
-def analyze_agentic(payload: AnalyzeRequest):
+async def analyze_agentic(payload: AnalyzeRequest):
     enforced_payload = payload.model_copy(update={"agent_mode": True})
-    return analyze(enforced_payload)
+    return await analyze(enforced_payload)
 
 
 @app.post("/analyze-file", response_model=AnalyzeResponse)
@@ -745,7 +940,9 @@ async def analyze_file(
     file: UploadFile = File(...),
     top_k: int = Form(None),
     agent_mode: bool | None = Form(None),
+    namespace: str | None = Form(None),
 ):
+    store = await asyncio.to_thread(_chroma_for_request, namespace)
     data = await file.read()
     filename = (file.filename or "").lower()
     if filename.endswith(".docx"):
@@ -761,8 +958,7 @@ async def analyze_file(
     use_top_k = top_k or settings.top_k
     results = []
     use_agent_mode = settings.agentic_default if agent_mode is None else agent_mode
-    for requirement in requirements:
-        gap = _analyze_single_requirement(requirement, use_top_k, use_agent_mode)
+    for gap in await _aanalyze_requirements(store, requirements, use_top_k, use_agent_mode):
         results.append(GapResult(**gap.__dict__))
     return AnalyzeResponse(total=len(results), results=results)
 
@@ -786,10 +982,12 @@ def save_baseline_endpoint(payload: SaveBaselineRequest):
         raise HTTPException(status_code=400, detail="requirements_text or requirements_list is required")
 
     top_k = payload.top_k or settings.top_k
-    results = []
-    for requirement in requirements:
-        gap = _analyze_single_requirement(requirement, top_k, settings.agentic_default)
-        results.append(GapResult(**gap.__dict__).model_dump())
+    results = [
+        GapResult(**gap.__dict__).model_dump()
+        for gap in _analyze_requirements(
+            _chroma_for_request(payload.namespace), requirements, top_k, settings.agentic_default
+        )
+    ]
 
     saved = save_baseline(payload.baseline_name, requirements, results)
     return SaveBaselineResponse(name=saved.name, created_at=saved.created_at, total=len(results))
@@ -836,7 +1034,8 @@ def generate_fsd_docx_text_endpoint(payload: GenerateFsdTextRequest):
 @app.post("/ingest-confluence")
 def ingest_confluence():
     try:
-        result = _run_confluence_ingest()
+        with call_priority(PRIORITY_BACKGROUND):
+            result = _run_confluence_ingest()
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as exc:
@@ -846,6 +1045,11 @@ def ingest_confluence():
 
 @app.post("/ingest-confluence/start", response_model=IngestStartResponse)
 def ingest_confluence_start(background_tasks: BackgroundTasks, payload: IngestStartRequest | None = None):
+    if payload is not None:
+        try:
+            normalize_namespace(payload.namespace)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
     job_id = str(uuid.uuid4())
     started_at = time.time()
     request_payload = payload.model_dump() if payload else {}
@@ -1,18 +1,85 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import Iterable
 
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
 
 from .config import settings
+from .provider_clients import registry
+from .rate_limit import EMBED, GENERATE, estimate_tokens, provider_slot, provider_slot_async
 
+# The embeddings endpoint accepts at most 2048 inputs per request.
+_MAX_EMBED_BATCH_SIZE = 2048
 
-def _get_client():
+
+def _build_client():
+    from openai import OpenAI
+
+    return OpenAI(
+        api_key=settings.openai_api_key,
+        http_client=registry.http_client("openai", timeout=settings.llm_http_timeout_seconds),
+    )
+
+
+def _build_async_client():
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        http_client=registry.async_http_client("openai_async", timeout=settings.llm_http_timeout_seconds),
+    )
+
+
+def _client_fingerprint() -> tuple:
     if not settings.openai_api_key:
         raise ValueError("OPENAI_API_KEY is required when LLM_PROVIDER=openai")
-    from openai import OpenAI
+    return (
+        settings.openai_api_key,
+        settings.llm_http_max_connections,
+        settings.llm_http_keepalive_seconds,
+        settings.llm_http_timeout_seconds,
+    )
+
+
+def _get_client():
+    return registry.get("openai", _client_fingerprint(), _build_client, close=lambda client: client.close())
+
+
+def _get_async_client():
+    return registry.get_for_loop(
+        "openai_async",
+        _client_fingerprint(),
+        _build_async_client,
+        close=lambda client: client.close(),
+    )
+
+
+def _embed_batches(items: list[str]) -> list[list[str]]:
+    return _pack_batches(
+        items,
+        max_items=max(1, min(settings.openai_embed_batch_size, _MAX_EMBED_BATCH_SIZE)),
+        max_tokens=max(1, settings.openai_embed_batch_tokens),
+    )
+
 
-    return OpenAI(api_key=settings.openai_api_key)
+def _pack_batches(texts: list[str], max_items: int, max_tokens: int) -> list[list[str]]:
+    batches: list[list[str]] = []
+    current: list[str] = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
 
 
 @retry(
@@ -20,13 +87,64 @@ def _get_client():
     wait=wait_exponential(multiplier=1, min=1, max=8),
     retry=retry_if_exception(lambda exc: not isinstance(exc, ValueError)),
 )
+def _embed_batch(client, batch: list[str]) -> list[list[float]]:
+    with provider_slot(EMBED, tokens=sum(estimate_tokens(text) for text in batch)):
+        response = client.embeddings.create(
+            model=settings.openai_embed_model,
+            input=batch,
+        )
+    data = sorted(response.data, key=lambda item: item.index)
+    return [item.embedding for item in data]
+
+
 def embed_texts(texts: Iterable[str], task_type: str) -> list[list[float]]:
+    items = list(texts)
+    if not items:
+        return []
     client = _get_client()
-    response = client.embeddings.create(
-        model=settings.openai_embed_model,
-        input=list(texts),
-    )
-    return [item.embedding for item in response.data]
+    batches = _embed_batches(items)
+    if len(batches) == 1:
+        return _embed_batch(client, batches[0])
+
+    workers = max(1, min(settings.openai_embed_max_concurrency, len(batches)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Copy the caller's context so worker threads keep its call priority.
+        futures = [
+            pool.submit(contextvars.copy_context().run, _embed_batch, client, batch)
+            for batch in batches
+        ]
+        results = [future.result() for future in futures]
+    return [embedding for batch_embeddings in results for embedding in batch_embeddings]
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, min=1, max=8),
+    retry=retry_if_exception(lambda exc: not isinstance(exc, ValueError)),
+)
+async def _aembed_batch(client, batch: list[str]) -> list[list[float]]:
+    async with provider_slot_async(EMBED, tokens=sum(estimate_tokens(text) for text in batch)):
+        response = await client.embeddings.create(
+            model=settings.openai_embed_model,
+            input=batch,
+        )
+    data = sorted(response.data, key=lambda item: item.index)
+    return [item.embedding for item in data]
+
+
+async def aembed_texts(texts: Iterable[str], task_type: str) -> list[list[float]]:
+    items = list(texts)
+    if not items:
+        return []
+    client = _get_async_client()
+    limit = asyncio.Semaphore(max(1, settings.openai_embed_max_concurrency))
+
+    async def run(batch: list[str]) -> list[list[float]]:
+        async with limit:
+            return await _aembed_batch(client, batch)
+
+    results = await asyncio.gather(*(run(batch) for batch in _embed_batches(items)))
+    return [embedding for batch_embeddings in results for embedding in batch_embeddings]
 
 
 @retry(
@@ -36,9 +154,26 @@ def embed_texts(texts: Iterable[str], task_type: str) -> list[list[float]]:
 )
 def generate_text(prompt: str) -> str:
     client = _get_client()
-    response = client.chat.completions.create(
-        model=settings.openai_response_model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-    )
+    with provider_slot(GENERATE, tokens=estimate_tokens(prompt)):
+        response = client.chat.completions.create(
+            model=settings.openai_response_model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=settings.openai_temperature,
+        )
+    return response.choices[0].message.content or ""
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, min=1, max=8),
+    retry=retry_if_exception(lambda exc: not isinstance(exc, ValueError)),
+)
+async def agenerate_text(prompt: str) -> str:
+    client = _get_async_client()
+    async with provider_slot_async(GENERATE, tokens=estimate_tokens(prompt)):
+        response = await client.chat.completions.create(
+            model=settings.openai_response_model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=settings.openai_temperature,
+        )
     return response.choices[0].message.content or ""
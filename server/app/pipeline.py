@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import contextvars
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+_registry_lock = threading.Lock()
+_pipelines: dict[str, "Pipeline"] = {}
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+    # fn returns an iterable of outputs rather than one output; a plain stage drops items it maps to None.
+    fan_out: bool = False
+    # Called by each worker of the stage as it exits.
+    on_exit: Optional[Callable[[], None]] = None
+
+
+@dataclass
+class _StageStats:
+    items_in: int = 0
+    items_out: int = 0
+    busy_seconds: float = 0.0
+    max_queue_depth: int = 0
+
+
+class Pipeline:
+    """Stages run as worker pools joined by bounded queues, so fetch, parse and embed work overlap.
+
+    A full queue blocks the stage feeding it (backpressure). Outputs of the last stage are
+    consumed on the calling thread, which is where progress reporting belongs. Workers run in a
+    copy of the caller's context, so provider calls keep the caller's priority.
+    """
+
+    def __init__(self, name: str, stages: list[Stage], queue_size: Optional[int] = None) -> None:
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.name = name
+        self.stages = stages
+        self.queue_size = max(1, queue_size or settings.ingest_queue_size)
+        self._lock = threading.Lock()
+        self._stats = [_StageStats() for _ in stages]
+        self._queues: list[queue.Queue] = []
+        self._started = 0.0
+        self._finished: Optional[float] = None
+
+    def run(self, source: Iterable[Any], sink: Optional[Callable[[Any], None]] = None) -> dict:
+        for item in self.iter(source):
+            if sink is not None:
+                sink(item)
+        return self.snapshot()
+
+    def iter(self, source: Iterable[Any]) -> Iterator[Any]:
+        stages = self.stages
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(stages) + 1)]
+        live = [max(1, stage.workers) for stage in stages]
+        stop = threading.Event()
+        errors: list[BaseException] = []
+        with self._lock:
+            # Repeated runs (one per crawl level, say) accumulate into the same stats.
+            self._queues = queues
+            self._started = self._started or time.perf_counter()
+            self._finished = None
+        with _registry_lock:
+            _pipelines[self.name] = self
+
+        def fail(exc: BaseException) -> None:
+            with self._lock:
+                errors.append(exc)
+            stop.set()
+
+        def put(index: int, item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    queues[index].put(item, timeout=_POLL_SECONDS)
+                except queue.Full:
+                    continue
+                if index < len(stages):
+                    depth = queues[index].qsize()
+                    with self._lock:
+                        stats = self._stats[index]
+                        stats.max_queue_depth = max(stats.max_queue_depth, depth)
+                return True
+            return False
+
+        def get(index: int) -> Any:
+            while not stop.is_set():
+                try:
+                    return queues[index].get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def feed() -> None:
+            try:
+                for item in source:
+                    if not put(0, item):
+                        return
+            except BaseException as exc:
+                fail(exc)
+            finally:
+                for _ in range(live[0]):
+                    put(0, _DONE)
+
+        def work(index: int) -> None:
+            stage = stages[index]
+            try:
+                while True:
+                    item = get(index)
+                    if item is _DONE:
+                        break
+                    started = time.perf_counter()
+                    waited = 0.0
+                    produced = 0
+                    result = stage.fn(item)
+                    outputs = result if stage.fan_out else ([] if result is None else [result])
+                    for output in outputs:
+                        put_started = time.perf_counter()
+                        if not put(index + 1, output):
+                            return
+                        waited += time.perf_counter() - put_started
+                        produced += 1
+                    with self._lock:
+                        stats = self._stats[index]
+                        stats.items_in += 1
+                        stats.items_out += produced
+                        stats.busy_seconds += time.perf_counter() - started - waited
+            except BaseException as exc:
+                fail(exc)
+            finally:
+                if stage.on_exit is not None:
+                    stage.on_exit()
+                with self._lock:
+                    live[index] -= 1
+                    last = live[index] == 0
+                if last:
+                    downstream = live[index + 1] if index + 1 < len(stages) else 1
+                    for _ in range(downstream):
+                        put(index + 1, _DONE)
+
+        context = contextvars.copy_context()
+        threads = [threading.Thread(target=context.copy().run, args=(feed,), name=f"{self.name}-feed", daemon=True)]
+        for index, stage in enumerate(stages):
+            for worker in range(live[index]):
+                threads.append(
+                    threading.Thread(
+                        target=context.copy().run,
+                        args=(work, index),
+                        name=f"{self.name}-{stage.name}-{worker}",
+                        daemon=True,
+                    )
+                )
+        for thread in threads:
+            thread.start()
+
+        completed = False
+        try:
+            while True:
+                item = get(len(stages))
+                if item is _DONE:
+                    break
+                yield item
+            completed = not stop.is_set()
+        finally:
+            stop.set()
+            if completed:
+                for thread in threads:
+                    thread.join()
+            with self._lock:
+                self._finished = time.perf_counter()
+        if errors:
+            raise errors[0]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            end = self._finished if self._finished is not None else time.perf_counter()
+            elapsed = end - self._started if self._started else 0.0
+            stages: dict[str, dict] = {}
+            for index, stage in enumerate(self.stages):
+                stats = self._stats[index]
+                workers = max(1, stage.workers)
+                stages[stage.name] = {
+                    "workers": workers,
+                    "items_in": stats.items_in,
+                    "items_out": stats.items_out,
+                    "items_per_second": round(stats.items_in / elapsed, 2) if elapsed else 0.0,
+                    "utilization": round(stats.busy_seconds / (elapsed * workers), 3) if elapsed else 0.0,
+                    "queue_depth": self._queues[index].qsize() if self._queues else 0,
+                    "max_queue_depth": stats.max_queue_depth,
+                }
+            return {
+                "running": bool(self._started) and self._finished is None,
+                "elapsed_seconds": round(elapsed, 3),
+                "stages": stages,
+            }
+
+
+def stats() -> dict:
+    """Latest run of each named pipeline, live while it is still running."""
+    with _registry_lock:
+        pipelines = list(_pipelines.items())
+    return {name: pipeline.snapshot() for name, pipeline in pipelines}
+
+
+def reset() -> None:
+    with _registry_lock:
+        _pipelines.clear()
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Optional
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    fingerprint: Hashable
+    client: Any
+    close: Optional[Callable[[Any], None]]
+
+
+@dataclass
+class _ClientStats:
+    builds: int = 0
+    reuses: int = 0
+    http_requests: int = 0
+    connections_opened: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class ClientRegistry:
+    """Process-wide provider clients, rebuilt only when their settings fingerprint changes."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+        # Async clients hold connections bound to the loop that opened them, so each loop gets its own.
+        self._loop_entries: dict[asyncio.AbstractEventLoop, dict[str, _Entry]] = {}
+        self._stats_lock = threading.Lock()
+        self._stats: dict[str, _ClientStats] = {}
+
+    def _stats_for(self, name: str) -> _ClientStats:
+        with self._stats_lock:
+            return self._stats.setdefault(name, _ClientStats())
+
+    def get(
+        self,
+        name: str,
+        fingerprint: Hashable,
+        factory: Callable[[], Any],
+        close: Optional[Callable[[Any], None]] = None,
+    ) -> Any:
+        stats = self._stats_for(name)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.fingerprint == fingerprint:
+                with stats.lock:
+                    stats.reuses += 1
+                return entry.client
+            if entry is not None:
+                # The replaced client may still be serving in-flight requests on other threads,
+                # so it is left to the garbage collector instead of being closed here.
+                logger.info("Rebuilding provider client '%s' after settings change", name)
+            client = factory()
+            self._entries[name] = _Entry(fingerprint=fingerprint, client=client, close=close)
+            with stats.lock:
+                stats.builds += 1
+            return client
+
+    def get_for_loop(
+        self,
+        name: str,
+        fingerprint: Hashable,
+        factory: Callable[[], Any],
+        close: Optional[Callable[[Any], Any]] = None,
+    ) -> Any:
+        """Like :meth:`get`, but one client per running event loop; dropped once its loop is closed."""
+        loop = asyncio.get_running_loop()
+        stats = self._stats_for(name)
+        with self._lock:
+            for closed in [other for other in self._loop_entries if other.is_closed()]:
+                del self._loop_entries[closed]
+            entries = self._loop_entries.setdefault(loop, {})
+            entry = entries.get(name)
+            if entry is not None and entry.fingerprint == fingerprint:
+                with stats.lock:
+                    stats.reuses += 1
+                return entry.client
+            client = factory()
+            entries[name] = _Entry(fingerprint=fingerprint, client=client, close=close)
+            with stats.lock:
+                stats.builds += 1
+            return client
+
+    def http_client(self, name: str, **kwargs: Any) -> httpx.Client:
+        """Build a keep-alive httpx client whose requests and new TCP connections are counted under ``name``."""
+        stats = self._stats_for(name)
+
+        def trace(event_name: str, _info: dict) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                with stats.lock:
+                    stats.connections_opened += 1
+
+        def on_request(request: httpx.Request) -> None:
+            request.extensions["trace"] = trace
+            with stats.lock:
+                stats.http_requests += 1
+
+        return httpx.Client(
+            limits=httpx.Limits(
+                max_connections=settings.llm_http_max_connections,
+                max_keepalive_connections=settings.llm_http_max_connections,
+                keepalive_expiry=settings.llm_http_keepalive_seconds,
+            ),
+            event_hooks={"request": [on_request]},
+            **kwargs,
+        )
+
+    def async_http_client(self, name: str, **kwargs: Any) -> httpx.AsyncClient:
+        """Async counterpart of :meth:`http_client`."""
+        stats = self._stats_for(name)
+
+        async def trace(event_name: str, _info: dict) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                with stats.lock:
+                    stats.connections_opened += 1
+
+        async def on_request(request: httpx.Request) -> None:
+            request.extensions["trace"] = trace
+            with stats.lock:
+                stats.http_requests += 1
+
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.llm_http_max_connections,
+                max_keepalive_connections=settings.llm_http_max_connections,
+                keepalive_expiry=settings.llm_http_keepalive_seconds,
+            ),
+            event_hooks={"request": [on_request]},
+            **kwargs,
+        )
+
+    async def aclose_all(self) -> None:
+        """Close every client, including the running loop's async ones; other loops' clients are dropped."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entries = list(self._entries.items()) + list(self._loop_entries.get(loop, {}).items())
+            self._entries.clear()
+            self._loop_entries.clear()
+        for name, entry in entries:
+            if entry.close is None:
+                continue
+            try:
+                result = entry.close(entry.client)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as exc:
+                logger.warning("Failed to close provider client '%s': %s", name, exc)
+
+    def close_all(self) -> None:
+        with self._lock:
+            entries = list(self._entries.items())
+            self._entries.clear()
+            # Async clients need their running loop to close; aclose_all() handles them.
+            self._loop_entries.clear()
+        for name, entry in entries:
+            if entry.close is None:
+                continue
+            try:
+                entry.close(entry.client)
+            except Exception as exc:
+                logger.warning("Failed to close provider client '%s': %s", name, exc)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            items = list(self._stats.items())
+        snapshot: dict[str, dict] = {}
+        for name, stats in items:
+            with stats.lock:
+                reused = max(stats.http_requests - stats.connections_opened, 0)
+                snapshot[name] = {
+                    "builds": stats.builds,
+                    "reuses": stats.reuses,
+                    "http_requests": stats.http_requests,
+                    "connections_opened": stats.connections_opened,
+                    "connection_reuse_rate": (
+                        round(reused / stats.http_requests, 4) if stats.http_requests else 0.0
+                    ),
+                }
+        return snapshot
+
+
+registry = ClientRegistry()
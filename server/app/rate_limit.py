@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Iterator
+
+from .config import settings
+
+EMBED = "embed"
+GENERATE = "generate"
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+
+# Upper bound on how long a background caller sleeps before re-checking the interactive queue.
+_BACKGROUND_POLL_SECONDS = 0.25
+
+_call_priority: ContextVar[str] = ContextVar("llm_call_priority", default=PRIORITY_INTERACTIVE)
+
+
+def current_priority() -> str:
+    return _call_priority.get()
+
+
+@contextmanager
+def call_priority(priority: str) -> Iterator[None]:
+    if priority not in {PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND}:
+        raise ValueError(f"Unknown call priority '{priority}'")
+    token = _call_priority.set(priority)
+    try:
+        yield
+    finally:
+        _call_priority.reset(token)
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly 4 characters per token for English text; avoids a tokenizer dependency.
+    return max(1, (len(text) + 3) // 4)
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Debit ``amount`` and return how many seconds the caller must wait before spending it."""
+        amount = min(float(amount), self.capacity)
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def wait_for(self, amount: float) -> float:
+        """Return how long until ``amount`` is available, without debiting anything."""
+        amount = min(float(amount), self.capacity)
+        with self.lock:
+            self._refill()
+            if self.tokens >= amount:
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+
+class _AsyncWaiters:
+    """Futures of coroutines waiting for a governor slot, resolved on their own loop when one may be free.
+
+    The slots are threading primitives shared with sync callers, so coroutines cannot block on them.
+    Instead they register here, re-check, and sleep until a release (from any thread or loop) wakes them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def register(self) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._waiters.append((loop, future))
+        return future
+
+    def discard(self, future: asyncio.Future) -> None:
+        with self._lock:
+            self._waiters = [entry for entry in self._waiters if entry[1] is not future]
+
+    def notify_all(self) -> None:
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # That loop has closed; nobody is waiting on it any more.
+                pass
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class ProviderGovernor:
+    def __init__(
+        self,
+        kind: str,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_concurrency: int,
+        background_max_concurrency: int = 0,
+    ) -> None:
+        self.kind = kind
+        self.config = (requests_per_minute, tokens_per_minute, max_concurrency, background_max_concurrency)
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+        self.background_semaphore = (
+            threading.BoundedSemaphore(background_max_concurrency) if background_max_concurrency > 0 else None
+        )
+        self._queue = threading.Condition()
+        self._interactive_waiting = 0
+        self._async_waiters = _AsyncWaiters()
+        self._take_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._background_requests = 0
+        self._tokens = 0
+        self._throttled = 0
+        self._wait_seconds = 0.0
+        self._background_wait_seconds = 0.0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+
+    def _acquire_interactive(self, tokens: int) -> float:
+        with self._queue:
+            self._interactive_waiting += 1
+        try:
+            if self.semaphore is not None:
+                self.semaphore.acquire()
+            wait = 0.0
+            if self.request_bucket is not None:
+                wait = max(wait, self.request_bucket.reserve(1))
+            if self.token_bucket is not None and tokens > 0:
+                wait = max(wait, self.token_bucket.reserve(tokens))
+            if wait > 0:
+                time.sleep(wait)
+            return wait
+        finally:
+            self._interactive_done()
+
+    def _interactive_done(self) -> None:
+        with self._queue:
+            self._interactive_waiting -= 1
+            self._queue.notify_all()
+        self._async_waiters.notify_all()
+
+    def _release(self, semaphore: threading.BoundedSemaphore) -> None:
+        semaphore.release()
+        self._async_waiters.notify_all()
+
+    def _try_take(self, tokens: int) -> float:
+        buckets = []
+        if self.request_bucket is not None:
+            buckets.append((self.request_bucket, 1))
+        if self.token_bucket is not None and tokens > 0:
+            buckets.append((self.token_bucket, tokens))
+        with self._take_lock:
+            wait = max((bucket.wait_for(amount) for bucket, amount in buckets), default=0.0)
+            if wait > 0:
+                return wait
+            for bucket, amount in buckets:
+                bucket.reserve(amount)
+            return 0.0
+
+    def _acquire_background(self, tokens: int) -> float:
+        # Background work never borrows against the buckets and steps aside whenever an
+        # interactive call is queued, so interactive latency is not stuck behind ingest.
+        started = time.monotonic()
+        while True:
+            with self._queue:
+                while self._interactive_waiting:
+                    self._queue.wait()
+            if self.semaphore is not None:
+                if not self.semaphore.acquire(timeout=_BACKGROUND_POLL_SECONDS):
+                    continue
+                with self._queue:
+                    yield_slot = self._interactive_waiting > 0
+                if yield_slot:
+                    self._release(self.semaphore)
+                    continue
+            wait = self._try_take(tokens)
+            if wait <= 0:
+                elapsed = time.monotonic() - started
+                return elapsed if elapsed >= 0.001 else 0.0
+            if self.semaphore is not None:
+                self._release(self.semaphore)
+            time.sleep(min(wait, _BACKGROUND_POLL_SECONDS))
+
+    async def _wait(self, ready: Callable[[], bool]) -> None:
+        """Return once ``ready()`` is true, sleeping between releases instead of blocking the loop."""
+        while True:
+            # Registering before the check means a release in between still wakes us.
+            waiter = self._async_waiters.register()
+            try:
+                if ready():
+                    return
+                await waiter
+            finally:
+                self._async_waiters.discard(waiter)
+
+    async def _acquire_async(self, semaphore: threading.BoundedSemaphore) -> None:
+        await self._wait(lambda: semaphore.acquire(blocking=False))
+
+    async def _acquire_interactive_async(self, tokens: int) -> float:
+        with self._queue:
+            self._interactive_waiting += 1
+        try:
+            if self.semaphore is not None:
+                await self._acquire_async(self.semaphore)
+            try:
+                wait = 0.0
+                if self.request_bucket is not None:
+                    wait = max(wait, self.request_bucket.reserve(1))
+                if self.token_bucket is not None and tokens > 0:
+                    wait = max(wait, self.token_bucket.reserve(tokens))
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                return wait
+            except BaseException:
+                # Cancelled during the throttle sleep: the slot was never used, so hand it back.
+                if self.semaphore is not None:
+                    self._release(self.semaphore)
+                raise
+        finally:
+            self._interactive_done()
+
+    def _no_interactive_waiting(self) -> bool:
+        with self._queue:
+            return self._interactive_waiting == 0
+
+    async def _acquire_background_async(self, tokens: int) -> float:
+        started = time.monotonic()
+        while True:
+            await self._wait(self._no_interactive_waiting)
+            if self.semaphore is not None:
+                await self._acquire_async(self.semaphore)
+                if not self._no_interactive_waiting():
+                    self._release(self.semaphore)
+                    continue
+            wait = self._try_take(tokens)
+            if wait <= 0:
+                elapsed = time.monotonic() - started
+                return elapsed if elapsed >= 0.001 else 0.0
+            if self.semaphore is not None:
+                self._release(self.semaphore)
+            await asyncio.sleep(wait)
+
+    def _started(self, tokens: int, background: bool, wait: float) -> None:
+        with self._stats_lock:
+            self._requests += 1
+            self._tokens += tokens
+            if background:
+                self._background_requests += 1
+                self._background_wait_seconds += wait
+            if wait > 0:
+                self._throttled += 1
+                self._wait_seconds += wait
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+    def _finished(self) -> None:
+        with self._stats_lock:
+            self._in_flight -= 1
+        if self.semaphore is not None:
+            self._release(self.semaphore)
+
+    @contextmanager
+    def slot(self, tokens: int = 0) -> Iterator[None]:
+        background = current_priority() == PRIORITY_BACKGROUND
+        if background and self.background_semaphore is not None:
+            self.background_semaphore.acquire()
+        try:
+            if background:
+                wait = self._acquire_background(tokens)
+            else:
+                wait = self._acquire_interactive(tokens)
+            self._started(tokens, background, wait)
+            try:
+                yield
+            finally:
+                self._finished()
+        finally:
+            if background and self.background_semaphore is not None:
+                self._release(self.background_semaphore)
+
+    @asynccontextmanager
+    async def aslot(self, tokens: int = 0) -> AsyncIterator[None]:
+        background = current_priority() == PRIORITY_BACKGROUND
+        if background and self.background_semaphore is not None:
+            await self._acquire_async(self.background_semaphore)
+        try:
+            if background:
+                wait = await self._acquire_background_async(tokens)
+            else:
+                wait = await self._acquire_interactive_async(tokens)
+            self._started(tokens, background, wait)
+            try:
+                yield
+            finally:
+                self._finished()
+        finally:
+            if background and self.background_semaphore is not None:
+                self._release(self.background_semaphore)
+
+    def stats(self) -> dict:
+        requests_per_minute, tokens_per_minute, max_concurrency, background_max_concurrency = self.config
+        with self._queue:
+            interactive_waiting = self._interactive_waiting
+        with self._stats_lock:
+            return {
+                "requests_per_minute": requests_per_minute,
+                "tokens_per_minute": tokens_per_minute,
+                "max_concurrency": max_concurrency,
+                "background_max_concurrency": background_max_concurrency,
+                "requests": self._requests,
+                "background_requests": self._background_requests,
+                "tokens": self._tokens,
+                "throttled": self._throttled,
+                "wait_seconds": round(self._wait_seconds, 3),
+                "background_wait_seconds": round(self._background_wait_seconds, 3),
+                "interactive_waiting": interactive_waiting,
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+            }
+
+
+_governors: dict[str, ProviderGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def _configured_limits(kind: str) -> tuple[int, int, int, int]:
+    if kind == EMBED:
+        return (
+            settings.llm_embed_rpm,
+            settings.llm_embed_tpm,
+            settings.llm_embed_max_concurrency,
+            settings.llm_background_max_concurrency,
+        )
+    if kind == GENERATE:
+        return (
+            settings.llm_generate_rpm,
+            settings.llm_generate_tpm,
+            settings.llm_generate_max_concurrency,
+            settings.llm_background_max_concurrency,
+        )
+    raise ValueError(f"Unknown provider call kind '{kind}'")
+
+
+def get_governor(kind: str) -> ProviderGovernor:
+    limits = _configured_limits(kind)
+    with _governors_lock:
+        governor = _governors.get(kind)
+        if governor is None or governor.config != limits:
+            governor = ProviderGovernor(kind, *limits)
+            _governors[kind] = governor
+        return governor
+
+
+def provider_slot(kind: str, tokens: int = 0):
+    return get_governor(kind).slot(tokens)
+
+
+def provider_slot_async(kind: str, tokens: int = 0):
+    return get_governor(kind).aslot(tokens)
+
+
+def stats() -> dict:
+    return {kind: get_governor(kind).stats() for kind in (EMBED, GENERATE)}
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_memory: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "memory_hits": 0,
+    "disk_hits": 0,
+    "misses": 0,
+    "writes": 0,
+    "evictions": 0,
+    "expired": 0,
+    "errors": 0,
+}
+
+
+def cache_key(provider: str, model: str, temperature: Optional[float], prompt: str) -> str:
+    # Model and temperature are part of the key, so changing either setting bypasses old entries.
+    raw = "\x1f".join([provider, model, repr(temperature), prompt])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _db_path() -> Path:
+    raw = (settings.llm_cache_path or "").strip()
+    if raw:
+        return Path(raw)
+    return Path(settings.chroma_persist_path).parent / "llm_cache.db"
+
+
+# Expired rows are swept at most this often, not on every write.
+_EXPIRY_SWEEP_SECONDS = 300.0
+
+_conn_lock = threading.RLock()
+_conn: Optional[sqlite3.Connection] = None
+_conn_path: Optional[Path] = None
+# Row count maintained from inserts and deletes, so writes never have to COUNT(*) the table.
+_entries = 0
+_last_swept = 0.0
+
+
+def _open(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_response_cache (
+            cache_key TEXT PRIMARY KEY,
+            provider TEXT NOT NULL,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_used ON llm_response_cache (last_used)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires_at ON llm_response_cache (expires_at)"
+    )
+    conn.commit()
+    return conn
+
+
+def _connection() -> sqlite3.Connection:
+    """The shared connection, opened on first use; callers hold ``_conn_lock``."""
+    global _conn, _conn_path, _entries
+    db_path = _db_path()
+    if _conn is None or _conn_path != db_path:
+        close()
+        _conn = _open(db_path)
+        _conn_path = db_path
+        _entries = _conn.execute("SELECT COUNT(*) FROM llm_response_cache").fetchone()[0]
+    return _conn
+
+
+def close() -> None:
+    global _conn, _conn_path, _last_swept
+    with _conn_lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = None
+        _conn_path = None
+        _last_swept = 0.0
+
+
+def _bump(**deltas: int) -> None:
+    with _stats_lock:
+        for key, value in deltas.items():
+            _stats[key] += value
+
+
+def enabled() -> bool:
+    return bool(settings.llm_cache_enabled) and settings.llm_cache_ttl_seconds > 0
+
+
+def _remember(key: str, expires_at: float, response: str) -> None:
+    limit = max(settings.llm_cache_memory_entries, 0)
+    if limit == 0:
+        return
+    with _memory_lock:
+        _memory[key] = (expires_at, response)
+        _memory.move_to_end(key)
+        while len(_memory) > limit:
+            _memory.popitem(last=False)
+
+
+def get(provider: str, model: str, temperature: Optional[float], prompt: str) -> Optional[str]:
+    key = cache_key(provider, model, temperature, prompt)
+    now = time.time()
+    with _memory_lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _memory.move_to_end(key)
+                _bump(memory_hits=1)
+                return entry[1]
+            del _memory[key]
+
+    global _entries
+    try:
+        with _conn_lock, _connection() as conn:
+            row = conn.execute(
+                "SELECT response, expires_at FROM llm_response_cache WHERE cache_key = ?",
+                (key,),
+            ).fetchone()
+            if row and row[1] <= now:
+                cursor = conn.execute("DELETE FROM llm_response_cache WHERE cache_key = ?", (key,))
+                _entries -= max(cursor.rowcount, 0)
+                _bump(expired=1)
+                row = None
+            if row:
+                conn.execute(
+                    "UPDATE llm_response_cache SET last_used = ? WHERE cache_key = ?",
+                    (now, key),
+                )
+    except sqlite3.Error as exc:
+        logger.warning("LLM response cache read failed, treating as miss: %s", exc)
+        _bump(errors=1, misses=1)
+        return None
+
+    if not row:
+        _bump(misses=1)
+        return None
+    _bump(disk_hits=1)
+    _remember(key, row[1], row[0])
+    return row[0]
+
+
+def put(provider: str, model: str, temperature: Optional[float], prompt: str, response: str) -> None:
+    key = cache_key(provider, model, temperature, prompt)
+    now = time.time()
+    expires_at = now + settings.llm_cache_ttl_seconds
+    _remember(key, expires_at, response)
+    global _entries, _last_swept
+    try:
+        with _conn_lock, _connection() as conn:
+            inserted = conn.execute(
+                """
+                INSERT OR IGNORE INTO llm_response_cache (cache_key, provider, model, response, expires_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (key, provider, model, response, expires_at, now),
+            ).rowcount
+            if inserted <= 0:
+                conn.execute(
+                    "UPDATE llm_response_cache SET response = ?, expires_at = ?, last_used = ? WHERE cache_key = ?",
+                    (response, expires_at, now, key),
+                )
+            _entries += max(inserted, 0)
+            expired = 0
+            if now - _last_swept >= _EXPIRY_SWEEP_SECONDS:
+                _last_swept = now
+                expired = max(conn.execute("DELETE FROM llm_response_cache WHERE expires_at <= ?", (now,)).rowcount, 0)
+                # Other processes may share the file, so each sweep also resyncs the row count.
+                _entries = conn.execute("SELECT COUNT(*) FROM llm_response_cache").fetchone()[0]
+            evicted = 0
+            overflow = _entries - max(settings.llm_cache_max_entries, 0)
+            if overflow > 0:
+                cursor = conn.execute(
+                    """
+                    DELETE FROM llm_response_cache WHERE cache_key IN (
+                        SELECT cache_key FROM llm_response_cache ORDER BY last_used ASC LIMIT ?
+                    )
+                    """,
+                    (overflow,),
+                )
+                evicted = max(cursor.rowcount, 0)
+                _entries -= evicted
+    except sqlite3.Error as exc:
+        logger.warning("LLM response cache write failed: %s", exc)
+        _bump(errors=1)
+        return
+    _bump(writes=1, expired=expired, evictions=evicted)
+
+
+def stats() -> dict:
+    with _stats_lock:
+        snapshot = dict(_stats)
+    hits = snapshot["memory_hits"] + snapshot["disk_hits"]
+    lookups = hits + snapshot["misses"]
+    snapshot["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+    snapshot["enabled"] = enabled()
+    snapshot["ttl_seconds"] = settings.llm_cache_ttl_seconds
+    snapshot["max_entries"] = settings.llm_cache_max_entries
+    with _memory_lock:
+        snapshot["memory_entries"] = len(_memory)
+    snapshot["path"] = str(_db_path())
+    return snapshot
+
+
+def clear_memory() -> None:
+    with _memory_lock:
+        _memory.clear()
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
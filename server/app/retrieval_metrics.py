@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+
+# Recent samples per pass; enough for stable percentiles without unbounded growth.
+_WINDOW = 512
+
+_lock = threading.Lock()
+_samples: dict[str, deque] = {}
+_totals: dict[str, dict] = {}
+_counters = {"speculative_started": 0, "speculative_used": 0, "speculative_discarded": 0}
+
+
+def record(name: str, seconds: float) -> None:
+    with _lock:
+        _samples.setdefault(name, deque(maxlen=_WINDOW)).append(seconds)
+        total = _totals.setdefault(name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+        total["count"] += 1
+        total["seconds"] += seconds
+        total["max_seconds"] = max(total["max_seconds"], seconds)
+
+
+def bump(counter: str) -> None:
+    with _lock:
+        _counters[counter] += 1
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def stats() -> dict:
+    with _lock:
+        snapshot: dict = {"passes": {}, **_counters}
+        for name, total in _totals.items():
+            ordered = sorted(_samples[name])
+            snapshot["passes"][name] = {
+                "count": total["count"],
+                "avg_ms": round(1000 * total["seconds"] / total["count"], 2),
+                "max_ms": round(1000 * total["max_seconds"], 2),
+                "p50_ms": round(1000 * _percentile(ordered, 0.5), 2),
+                "p95_ms": round(1000 * _percentile(ordered, 0.95), 2),
+            }
+    return snapshot
+
+
+def reset() -> None:
+    with _lock:
+        _samples.clear()
+        _totals.clear()
+        for key in _counters:
+            _counters[key] = 0
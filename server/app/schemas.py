@@ -9,6 +9,7 @@ class AnalyzeRequest(BaseModel):
     top_k: Optional[int] = Field(default=None, ge=1, le=50)
     baseline_name: Optional[str] = None
     agent_mode: Optional[bool] = None
+    namespace: Optional[str] = None
 
 
 class GapResult(BaseModel):
@@ -92,6 +93,7 @@ class SaveBaselineRequest(BaseModel):
     requirements_text: Optional[str] = None
     requirements_list: Optional[list[str]] = None
     top_k: Optional[int] = Field(default=None, ge=1, le=50)
+    namespace: Optional[str] = None
 
 
 class SaveBaselineResponse(BaseModel):
@@ -108,6 +110,7 @@ class GenerateFsdResponse(BaseModel):
 class QueryRequest(BaseModel):
     question: str
     top_k: Optional[int] = Field(default=None, ge=1, le=100)
+    namespace: Optional[str] = None
 
 
 class ChunkResult(BaseModel):
@@ -178,6 +181,8 @@ class IngestStartRequest(BaseModel):
     include_confluence: bool = True
     crawl_depth: int = Field(default=1, ge=0, le=2)
     max_pages: int = Field(default=60, ge=1, le=300)
+    namespace: Optional[str] = None
+    space_keys: Optional[list[str]] = None
 
 
 class IngestStatusResponse(BaseModel):
@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from io import BytesIO
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 from bs4 import BeautifulSoup
 from docx import Document
@@ -33,26 +33,22 @@ def _extract_text(path: Path) -> str:
     return path.read_text(encoding="utf-8", errors="ignore")
 
 
-def load_repo_docs(repo_path: str) -> list[SfccDoc]:
+_DOC_SUFFIXES = {".md", ".txt", ".html", ".htm", ".pdf", ".docx"}
+
+
+def iter_repo_paths(repo_path: str) -> Iterator[Path]:
     root = Path(repo_path)
     if not root.exists():
-        return []
-
-    docs: list[SfccDoc] = []
+        return
     for path in root.rglob("*"):
-        if not path.is_file():
-            continue
-        if path.suffix.lower() not in {".md", ".txt", ".html", ".htm", ".pdf", ".docx"}:
-            continue
-        text = _extract_text(path)
-        title = path.stem
-        source_id = str(path.relative_to(root))
-        docs.append(
-            SfccDoc(
-                source_id=source_id,
-                title=title,
-                url=None,
-                text=text,
-            )
-        )
-    return docs
+        if path.is_file() and path.suffix.lower() in _DOC_SUFFIXES:
+            yield path
+
+
+def load_repo_doc(repo_path: str, path: Path) -> SfccDoc:
+    return SfccDoc(
+        source_id=str(path.relative_to(Path(repo_path))),
+        title=path.stem,
+        url=None,
+        text=_extract_text(path),
+    )
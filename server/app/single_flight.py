@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call(Generic[T]):
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[T] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(Generic[T]):
+    """Collapse concurrent calls with the same key into one execution shared by all callers."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call[T]] = {}
+        self._executions = 0
+        self._shared = 0
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._executions += 1
+            else:
+                self._shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result  # type: ignore[return-value]
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "executions": self._executions,
+                "shared": self._shared,
+                "in_flight": len(self._calls),
+            }
+
+
+class AsyncSingleFlight(Generic[T]):
+    """Event-loop counterpart of :class:`SingleFlight` for coroutine callers."""
+
+    def __init__(self) -> None:
+        self._calls: dict[tuple[int, str], asyncio.Future] = {}
+        self._executions = 0
+        self._shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        future = self._calls.get(flight_key)
+        if future is not None:
+            self._shared += 1
+            return await asyncio.shield(future)
+
+        future = loop.create_future()
+        self._calls[flight_key] = future
+        self._executions += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Followers re-raise it; mark it retrieved so an unshared failure is not logged twice.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._calls.pop(flight_key, None)
+
+    def stats(self) -> dict:
+        return {
+            "executions": self._executions,
+            "shared": self._shared,
+            "in_flight": len(self._calls),
+        }
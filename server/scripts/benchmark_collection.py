@@ -0,0 +1,138 @@
+"""HNSW recall@k and query latency for each combination of collection settings.
+
+Vectors come from a stored collection (``--collection``, default the configured one) or, with
+``--synthetic N``, from a standard normal distribution. Random vectors have none of the cluster
+structure of real embeddings, so synthetic results only show relative trends; choose production
+settings from a run against a real collection. Queries are perturbed copies of stored vectors
+and ground truth is an exact brute-force search.
+"""
+
+import argparse
+import itertools
+import json
+from pathlib import Path
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings as ChromaSettings
+
+from app.chroma_service import _collection_name
+from app.config import settings
+
+
+def _csv(cast):
+    return lambda raw: [cast(item) for item in raw.split(",") if item.strip()]
+
+
+def _load_vectors(args) -> np.ndarray:
+    if args.synthetic:
+        rng = np.random.default_rng(args.seed)
+        return rng.standard_normal((args.synthetic, args.dim)).astype(np.float32)
+    client = chromadb.PersistentClient(
+        path=settings.chroma_persist_path,
+        settings=ChromaSettings(anonymized_telemetry=False),
+    )
+    collection = client.get_collection(args.collection or _collection_name())
+    page = collection.get(include=["embeddings"], limit=args.limit)
+    return np.asarray(page["embeddings"], dtype=np.float32)
+
+
+def _queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    # Perturbed copies of stored vectors behave like real queries: close to, but not on, a chunk.
+    rng = np.random.default_rng(seed + 1)
+    picks = vectors[rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)]
+    noise = rng.standard_normal(picks.shape).astype(np.float32) * picks.std() * 0.5
+    return picks + noise
+
+
+def _exact_top_k(space: str, vectors: np.ndarray, queries: np.ndarray, k: int) -> list[set[int]]:
+    if space == "cosine":
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = -(queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normed.T
+    elif space == "ip":
+        scores = -(queries @ vectors.T)
+    else:
+        scores = (queries**2).sum(axis=1)[:, None] - 2 * queries @ vectors.T + (vectors**2).sum(axis=1)[None, :]
+    return [set(row) for row in np.argsort(scores, axis=1)[:, :k]]
+
+
+def _run(client, vectors, queries, truth, k, space, m, construction_ef, search_ef) -> dict:
+    name = f"bench-{space}-{m}-{construction_ef}-{search_ef}"
+    collection = client.create_collection(
+        name,
+        metadata={
+            "hnsw:space": space,
+            "hnsw:M": m,
+            "hnsw:construction_ef": construction_ef,
+            "hnsw:search_ef": search_ef,
+        },
+    )
+    ids = [str(index) for index in range(len(vectors))]
+    batch = client.get_max_batch_size()
+    started = time.perf_counter()
+    for start in range(0, len(ids), batch):
+        collection.add(ids=ids[start : start + batch], embeddings=vectors[start : start + batch].tolist())
+    build_seconds = time.perf_counter() - started
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries.tolist(), truth):
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=k, include=[])
+        latencies.append(time.perf_counter() - started)
+        hits += len(expected & {int(doc_id) for doc_id in result["ids"][0]})
+    client.delete_collection(name)
+    latencies.sort()
+    return {
+        "space": space,
+        "M": m,
+        "construction_ef": construction_ef,
+        "search_ef": search_ef,
+        f"recall@{k}": round(hits / (k * len(truth)), 4),
+        "p50_ms": round(1000 * latencies[len(latencies) // 2], 3),
+        "p95_ms": round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 3),
+        "build_s": round(build_seconds, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure HNSW recall and query latency per collection setting.")
+    parser.add_argument("--collection", default="", help="Read vectors from this collection (default: configured).")
+    parser.add_argument("--limit", type=int, default=20000, help="Vectors to read from the collection.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random vectors instead of a collection.")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=settings.top_k)
+    parser.add_argument("--spaces", type=_csv(str), default=[settings.chroma_hnsw_space])
+    parser.add_argument("--m", type=_csv(int), default=[settings.chroma_hnsw_m])
+    parser.add_argument("--construction-ef", type=_csv(int), default=[settings.chroma_hnsw_construction_ef])
+    parser.add_argument("--search-ef", type=_csv(int), default=[10, 50, settings.chroma_hnsw_search_ef])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    vectors = _load_vectors(args)
+    if not len(vectors):
+        print("No vectors to benchmark.")
+        return
+    queries = _queries(vectors, args.queries, args.seed)
+    client = chromadb.EphemeralClient(settings=ChromaSettings(anonymized_telemetry=False))
+
+    rows = []
+    for space in args.spaces:
+        truth = _exact_top_k(space, vectors, queries, args.k)
+        for m, construction_ef, search_ef in itertools.product(args.m, args.construction_ef, args.search_ef):
+            row = _run(client, vectors, queries, truth, args.k, space, m, construction_ef, search_ef)
+            rows.append(row)
+            if not args.json:
+                print("  ".join(f"{key}={value}" for key, value in row.items()))
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,9 @@ import sys
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from app.chroma_service import ChromaService
-from app.confluence import fetch_page, page_to_text, search_pages
+from app.confluence import stream_pages
 from app.config import settings
-from app.ingest import IngestDocument, upsert_document_chunks
+from app.ingest import IngestDocument, should_skip, upsert_document_chunks
 
 
 STATE_DIR = Path(__file__).resolve().parent.parent / ".state"
@@ -26,15 +26,11 @@ def main():
             else:
                 cql_extra = last_run_clause
 
-    page_ids = search_pages(space_keys, cql_extra)
-    if not page_ids:
-        print("No Confluence pages found.")
-        return
-
     chroma = ChromaService()
-    for page_id in page_ids:
-        page = fetch_page(page_id)
-        text = page_to_text(page)
+    manifest = chroma.manifest_entries("confluence")
+    found = 0
+    for page, text in stream_pages(space_keys, cql_extra):
+        found += 1
         doc = IngestDocument(
             source="confluence",
             source_id=page.page_id,
@@ -44,11 +40,15 @@ def main():
             updated_at=page.updated_at,
             text=text,
         )
-        if chroma.should_skip("confluence", page.page_id, text):
+        if should_skip(chroma, doc, manifest):
             continue
         inserted = upsert_document_chunks(chroma, doc, task_type="retrieval_document")
         print(f"Ingested {page.page_id} ({inserted} chunks)")
 
+    if not found:
+        print("No Confluence pages found.")
+        return
+
     STATE_DIR.mkdir(parents=True, exist_ok=True)
     LAST_RUN_FILE.write_text(
         datetime.now(timezone.utc).isoformat(), encoding="utf-8"
@@ -5,24 +5,28 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from app.chroma_service import ChromaService
 from app.config import settings
-from app.ingest import IngestDocument, upsert_document_chunks
-from app.sfcc import load_repo_docs
+from app.embed_batcher import EmbedBatcher
+from app.ingest import IngestDocument, should_skip, upsert_document_chunks
+from app.pipeline import Pipeline, Stage
+from app.sfcc import iter_repo_paths, load_repo_doc
 
 
 def main():
-    if not settings.sfcc_docs_repo_path:
+    repo_path = settings.sfcc_docs_repo_path
+    if not repo_path:
         print("SFCC_DOCS_REPO_PATH is not set.")
         return
 
-    docs = load_repo_docs(settings.sfcc_docs_repo_path)
-    if not docs:
+    paths = list(iter_repo_paths(repo_path))
+    if not paths:
         print("No SFCC docs found.")
         return
 
     chroma = ChromaService()
-    for doc in docs:
-        if chroma.should_skip("sfcc", doc.source_id, doc.text):
-            continue
+    manifest = chroma.manifest_entries("sfcc")
+
+    def extract(path):
+        doc = load_repo_doc(repo_path, path)
         ingest_doc = IngestDocument(
             source="sfcc",
             source_id=doc.source_id,
@@ -32,8 +36,30 @@ def main():
             updated_at=None,
             text=doc.text,
         )
-        inserted = upsert_document_chunks(chroma, ingest_doc, task_type="retrieval_document")
-        print(f"Ingested {doc.source_id} ({inserted} chunks)")
+        if should_skip(chroma, ingest_doc, manifest):
+            return None
+        return ingest_doc
+
+    batcher = EmbedBatcher("retrieval_document", name="sfcc", callers=settings.ingest_embed_workers)
+
+    def embed(ingest_doc):
+        inserted = upsert_document_chunks(chroma, ingest_doc, task_type="retrieval_document", batcher=batcher)
+        return ingest_doc.source_id, inserted
+
+    # PDF/DOCX extraction is the slow part; it runs in parallel with embedding earlier files.
+    ingest = Pipeline(
+        "sfcc",
+        [
+            Stage("extract", extract, workers=settings.ingest_parse_workers),
+            Stage("embed", embed, workers=settings.ingest_embed_workers),
+        ],
+    )
+    for source_id, inserted in ingest.iter(paths):
+        print(f"Ingested {source_id} ({inserted} chunks)")
+    stages = ingest.snapshot()["stages"]
+    print("Pipeline: " + ", ".join(f"{name} {stage['items_per_second']}/s" for name, stage in stages.items()))
+    batches = batcher.stats()
+    print(f"Embedded {batches['texts']} chunks in {batches['batches']} requests")
 
 
 if __name__ == "__main__":
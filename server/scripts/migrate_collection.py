@@ -0,0 +1,62 @@
+import argparse
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import chromadb
+from chromadb.config import Settings as ChromaSettings
+
+from app.chroma_service import ChromaService, _collection_name, collections_to_migrate, migrate_collection
+from app.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild a Chroma collection with the CHROMA_HNSW_* settings, reusing stored embeddings."
+    )
+    parser.add_argument("--collection", default="", help="Collection to rebuild (default: the configured one).")
+    parser.add_argument("--namespace", default="", help="Project namespace whose collections to migrate.")
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Rebuild every collection of this deployment (source groups and namespaces too) with outdated settings.",
+    )
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--drop-old", action="store_true", help="Delete the original instead of keeping a backup.")
+    parser.add_argument(
+        "--split-sources",
+        action="store_true",
+        help="Instead, move chunks into the collections CHROMA_SOURCE_GROUPS assigns them to.",
+    )
+    args = parser.parse_args()
+
+    if args.split_sources:
+        moved = ChromaService(namespace=args.namespace).rebalance_collections(page_size=args.page_size)
+        if not moved:
+            print("All chunks are already in their source group's collection.")
+        for name, count in sorted(moved.items()):
+            print(f"Moved {count} chunks into {name}")
+        return
+
+    client = chromadb.PersistentClient(
+        path=settings.chroma_persist_path,
+        settings=ChromaSettings(anonymized_telemetry=False),
+    )
+    if args.all:
+        names = collections_to_migrate(client)
+        if not names:
+            print("All collections already use the configured HNSW settings.")
+    else:
+        names = [args.collection or _collection_name(args.namespace)]
+    for name in names:
+        result = migrate_collection(client, name, page_size=args.page_size, keep_backup=not args.drop_old)
+        print(f"Migrated {result['collection']}: {result['copied']} chunks")
+        print(f"  before: {result['previous']}")
+        print(f"  after:  {result['current']}")
+        if result["backup"]:
+            print(f"  original kept as {result['backup']}")
+
+
+if __name__ == "__main__":
+    main()
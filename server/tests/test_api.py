@@ -1,5 +1,8 @@
+import asyncio
 import os
+import threading
 
+import pytest
 from fastapi.testclient import TestClient
 
 os.environ.setdefault("GEMINI_API_KEY", "test")
@@ -18,7 +21,7 @@ def test_health():
 
 
 def test_analyze_text(monkeypatch):
-    def fake_query(_question, _top_k, where_filter=None):
+    def fake_query(_question, _top_k, where_filter=None, query_embedding=None):
         return {
             "documents": [["doc chunk"]],
             "metadatas": [[{"source": "confluence"}]],
@@ -26,13 +29,21 @@ def test_analyze_text(monkeypatch):
             "ids": [["1"]],
         }
 
-    def fake_generate_text(_prompt):
+    def fake_query_many(questions, top_k, where_filter=None, query_embeddings=None):
+        return [fake_query(question, top_k, where_filter) for question in questions]
+
+    async def fake_agenerate_text(_prompt):
         return "OOTB Match | 0.9 | Looks good"
 
+    async def fake_aembed_queries(texts):
+        return [[0.0] for _ in texts]
+
     monkeypatch.setattr(main.chroma, "query", fake_query)
+    monkeypatch.setattr(main.chroma, "query_many", fake_query_many)
+    monkeypatch.setattr(main.chroma, "aembed_queries", fake_aembed_queries)
     from app import gap_analyzer
 
-    monkeypatch.setattr(gap_analyzer, "generate_text", fake_generate_text)
+    monkeypatch.setattr(gap_analyzer, "agenerate_text", fake_agenerate_text)
 
     client = TestClient(main.app)
     payload = {"requirements_text": "Support Apple Pay\nEnable gift messages"}
@@ -43,6 +54,149 @@ def test_analyze_text(monkeypatch):
     assert data["results"][0]["classification"] == "OOTB Match"
 
 
+def test_analyze_batches_retrieval_across_requirements(monkeypatch):
+    embed_batches = []
+    batched_queries = []
+    fallback_embeddings = []
+    empty = {"documents": [[]], "metadatas": [[]], "distances": [[]], "ids": [[]]}
+
+    async def fake_aembed_queries(texts):
+        embed_batches.append(list(texts))
+        return [[float(index)] for index in range(len(texts))]
+
+    def fake_query_many(questions, _top_k, where_filter=None, query_embeddings=None):
+        batched_queries.append((where_filter, query_embeddings))
+        return [empty for _ in questions]
+
+    def fake_query(_question, _top_k, where_filter=None, query_embedding=None):
+        fallback_embeddings.append(query_embedding)
+        return empty
+
+    def unexpected_embed(*_args):
+        raise AssertionError("requirements should not be embedded one at a time")
+
+    async def no_answer(_prompt):
+        return ""
+
+    monkeypatch.setattr(main.chroma, "aembed_queries", fake_aembed_queries)
+    monkeypatch.setattr(main.chroma, "embed_queries", unexpected_embed)
+    monkeypatch.setattr(main.chroma, "embed_query", unexpected_embed)
+    monkeypatch.setattr(main.chroma, "query_many", fake_query_many)
+    monkeypatch.setattr(main.chroma, "query", fake_query)
+    from app import gap_analyzer
+
+    monkeypatch.setattr(gap_analyzer, "agenerate_text", no_answer)
+
+    client = TestClient(main.app)
+    response = client.post("/analyze", json={"requirements_text": "Support Apple Pay\nEnable gift messages"})
+    assert response.status_code == 200
+    assert len(embed_batches) == 1 and len(embed_batches[0]) == 2
+    # One collection query per scope for the whole batch, both reusing the batched vectors.
+    wheres = [where for where, _ in batched_queries]
+    assert len(wheres) == 2
+    assert {"source": {"$in": ["confluence"]}} in wheres
+    assert {"source": {"$in": ["baseline_web", "sfcc"]}} in wheres
+    assert all(embeddings == [[0.0], [1.0]] for _, embeddings in batched_queries)
+    # Empty scoped results fall back to an unscoped query with the same vector.
+    assert sorted(fallback_embeddings) == [[0.0], [1.0]]
+
+
+def test_analyze_keeps_a_batch_of_llm_calls_in_flight(monkeypatch):
+    from app import gap_analyzer
+
+    in_flight = []
+    peak = []
+
+    def fake_query_many(questions, _top_k, where_filter=None, query_embeddings=None):
+        chunk = {"documents": [["doc chunk"]], "metadatas": [[{"source": "confluence"}]], "distances": [[0.1]]}
+        return [chunk for _ in questions]
+
+    async def fake_aembed_queries(texts):
+        return [[0.0] for _ in texts]
+
+    async def slow_agenerate_text(_prompt):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.05)
+        in_flight.pop()
+        return "OOTB Match | 0.9 | Looks good"
+
+    monkeypatch.setattr(main.chroma, "query_many", fake_query_many)
+    monkeypatch.setattr(main.chroma, "aembed_queries", fake_aembed_queries)
+    monkeypatch.setattr(gap_analyzer, "agenerate_text", slow_agenerate_text)
+
+    client = TestClient(main.app)
+    response = client.post("/analyze", json={"requirements_list": ["Apple Pay", "Gift messages", "Store locator"]})
+
+    assert response.status_code == 200
+    assert [item["classification"] for item in response.json()["results"]] == ["OOTB Match"] * 3
+    assert max(peak) == 3
+
+
+def test_speculative_baseline_pass_overlaps_project_pass(monkeypatch):
+    from app import gap_analyzer, retrieval_metrics
+    from app.config import settings
+
+    baseline_started = threading.Event()
+    overlapped = []
+
+    class FakeChroma:
+        def embed_query(self, _text):
+            return [0.0]
+
+        def query(self, _question, _top_k, where_filter=None, query_embedding=None):
+            sources = (where_filter or {}).get("source", {}).get("$in", [])
+            if "confluence" in sources:
+                overlapped.append(baseline_started.wait(timeout=0.5))
+            elif sources:
+                baseline_started.set()
+            return {
+                "documents": [["Apple Pay is available out of the box"]],
+                "metadatas": [[{"source": sources[0] if sources else "sfcc"}]],
+                "distances": [[0.2]],
+            }
+
+    retrieval_metrics.reset()
+    monkeypatch.setattr(settings, "retrieval_speculative_baseline", True)
+    chunks, _ = gap_analyzer._retrieve_two_pass(FakeChroma(), "Support Apple Pay", 5)
+
+    assert overlapped == [True]
+    assert len(chunks) == 2
+    stats = retrieval_metrics.stats()
+    assert stats["speculative_used"] == 1
+    assert {"embed", "project", "baseline", "two_pass"} <= set(stats["passes"])
+
+    baseline_started.clear()
+    monkeypatch.setattr(settings, "retrieval_speculative_baseline", False)
+    gap_analyzer._retrieve_two_pass(FakeChroma(), "Support Apple Pay", 5)
+    assert overlapped == [True, False]
+
+    client = TestClient(main.app)
+    assert client.get("/metrics").json()["retrieval"]["passes"]["project"]["count"] == 2
+
+
+def test_prefetched_passes_run_side_by_side(monkeypatch):
+    from app import gap_analyzer
+    from app.config import settings
+
+    both_querying = threading.Barrier(2, timeout=5)
+    empty = {"documents": [[]], "metadatas": [[]], "distances": [[]], "ids": [[]]}
+
+    class FakeChroma:
+        def embed_queries(self, texts):
+            return [[0.0] for _ in texts]
+
+        def query_many(self, questions, _top_k, where_filter=None, query_embeddings=None):
+            # Deadlocks (and times out) unless the project and baseline scopes are queried at once.
+            both_querying.wait()
+            return [empty for _ in questions]
+
+    monkeypatch.setattr(settings, "retrieval_speculative_baseline", True)
+    prefetched = gap_analyzer.prefetch_two_pass(FakeChroma(), ["Support Apple Pay", "Gift messages"], 5)
+
+    assert [item.baseline for item in prefetched] == [([], 0.0), ([], 0.0)]
+
+
 def test_analyze_agent_mode_uses_agentic_path(monkeypatch):
     def fake_agentic(_chroma, requirement, _top_k, max_steps, stop_confidence):
         class Result:
@@ -123,3 +277,172 @@ def test_generate_fsd_docx(monkeypatch):
         response.headers["content-type"]
         == "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
     )
+
+
+def test_query_uses_the_requested_namespace(monkeypatch):
+    calls = []
+
+    class FakeStore:
+        async def aembed_queries(self, texts):
+            return [[0.0] for _ in texts]
+
+        def query(self, question, top_k, query_embedding=None):
+            calls.append((question, top_k))
+            return {"documents": [["client doc"]], "metadatas": [[{"source": "confluence"}]], "distances": [[0.2]]}
+
+    monkeypatch.setitem(main.namespaced_chroma, "client-a", FakeStore())
+    monkeypatch.setattr(main.chroma, "query", lambda *_args, **_kwargs: pytest.fail("default namespace queried"))
+
+    client = TestClient(main.app)
+    response = client.post("/query", json={"question": "store locator", "top_k": 3, "namespace": "Client A"})
+
+    assert response.status_code == 200
+    assert calls == [("store locator", 3)]
+    assert response.json()["results"][0]["text"] == "client doc"
+    assert client.post("/query", json={"question": "x", "namespace": "!!"}).status_code == 400
+
+
+def test_unknown_namespaces_are_not_created_by_reads(monkeypatch):
+    monkeypatch.setattr(main, "namespaced_chroma", main.OrderedDict())
+    client = TestClient(main.app)
+
+    response = client.post("/query", json={"question": "x", "namespace": "never-ingested"})
+    baseline = client.post(
+        "/save-baseline",
+        json={"baseline_name": "never", "requirements_list": ["Store locator"], "namespace": "never-ingested"},
+    )
+
+    assert response.status_code == 404
+    assert baseline.status_code == 404
+    assert not main.namespaced_chroma
+    names = {collection.name for collection in main.chroma.client.list_collections()}
+    assert not any("-ns-never-ingested" in name for name in names)
+    invalid = client.post("/ingest-confluence/start", json={"include_confluence": False, "namespace": "!!"})
+    assert invalid.status_code == 400
+
+
+def test_open_namespace_stores_are_bounded(monkeypatch):
+    opened = []
+
+    class FakeService:
+        def __init__(self, namespace, create):
+            opened.append((namespace, create))
+
+        def backfill_lexical_index(self):
+            pass
+
+    monkeypatch.setattr(main, "ChromaService", FakeService)
+    monkeypatch.setattr(main, "namespaced_chroma", main.OrderedDict())
+    monkeypatch.setattr(main.settings, "chroma_namespace_cache_size", 2)
+
+    first = main.get_chroma("a", create=True)
+    main.get_chroma("b")
+    assert main.get_chroma("a") is first
+    main.get_chroma("c")
+
+    # "b" was the least recently used store.
+    assert list(main.namespaced_chroma) == ["a", "c"]
+    assert opened == [("a", True), ("b", False), ("c", False)]
+
+
+def test_confluence_ingest_streams_pages_from_search_responses(monkeypatch):
+    import httpx
+
+    from app import confluence
+    from app.ingest_manifest import ManifestEntry
+
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.path)
+        assert request.url.path == "/wiki/rest/api/content/search"
+        start = int(request.url.params["start"])
+        count = 50 if start == 0 else 10
+        results = [
+            {
+                "id": str(start + offset),
+                "title": f"Page {start + offset}",
+                "space": {"key": "ENG"},
+                "version": {"when": "2024-05-01T10:00:00.000Z"},
+                "body": {"storage": {"value": f"<p>Body {start + offset}</p>"}},
+                "_links": {"webui": f"/spaces/ENG/pages/{start + offset}"},
+            }
+            for offset in range(count)
+        ]
+        return httpx.Response(
+            200,
+            json={"results": results, "totalSize": 60, "_links": {"base": "https://example.atlassian.net/wiki"}},
+        )
+
+    def fake_client():
+        return httpx.Client(base_url="https://example.atlassian.net/wiki", transport=httpx.MockTransport(handler))
+
+    deleted = []
+    ingested = []
+
+    class FakeStore:
+        def manifest_entries(self, source):
+            return {"stale": ManifestEntry(source=source, source_id="stale", content_hash="x", space_key="ENG")}
+
+        def delete_source(self, source, source_id):
+            deleted.append((source, source_id))
+
+    monkeypatch.setattr(confluence, "_client", fake_client)
+    monkeypatch.setitem(main.namespaced_chroma, "stream", FakeStore())
+    monkeypatch.setattr(main, "should_skip", lambda _store, _doc, _manifest: False)
+    monkeypatch.setattr(main, "upsert_document_chunks", lambda _store, doc, task_type, batcher: ingested.append(doc) or 1)
+    progress = []
+
+    result = main._run_confluence_ingest(
+        progress_cb=lambda **kwargs: progress.append(kwargs), namespace="stream", space_keys=["ENG"]
+    )
+
+    assert len(requested) == 2
+    assert result == {"pages": 60, "chunks": 60, "indexed": 60, "skipped": 0, "deleted": 1}
+    assert deleted == [("confluence", "stale")]
+    # Several embed workers run at once, so pages are not indexed in search order.
+    first = next(doc for doc in ingested if doc.source_id == "0")
+    assert first.url == "https://example.atlassian.net/wiki/spaces/ENG/pages/0"
+    assert "Body 0" in first.text
+    assert next(update for update in progress if "pages_processed" in update)["pages_total"] == 60
+
+
+def test_web_ingest_crawls_level_by_level_within_page_budget(monkeypatch):
+    import httpx
+
+    pages = {
+        "/": '<title>Home</title><p>Home</p><a href="/a">A</a><a href="/b">B</a><a href="https://other.test/x">X</a>',
+        "/a": '<title>A</title><p>Page A</p><a href="/c">C</a><a href="/">Home</a>',
+        "/b": "<title>B</title><p>Page B</p>",
+        "/c": "<title>C</title><p>Page C</p>",
+    }
+    fetched = []
+
+    def handler(request):
+        fetched.append(request.url.path)
+        return httpx.Response(200, text=pages[request.url.path], headers={"content-type": "text/html"})
+
+    real_client = httpx.Client
+    monkeypatch.setattr(
+        main.httpx, "Client", lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs)
+    )
+
+    class FakeStore:
+        def manifest_entries(self, source):
+            return {}
+
+    ingested = []
+    monkeypatch.setitem(main.namespaced_chroma, "web", FakeStore())
+    monkeypatch.setattr(main, "should_skip", lambda _store, doc, _manifest: doc.source_id.endswith("/b"))
+    monkeypatch.setattr(main, "upsert_document_chunks", lambda _store, doc, task_type, batcher: ingested.append(doc) or 2)
+
+    result = main._run_web_sources_ingest(
+        [{"url": "https://docs.test/", "note": "Vendor docs"}], crawl_depth=2, max_pages=3, namespace="web"
+    )
+
+    assert result == {"processed": 3, "indexed": 2, "skipped": 1, "chunks": 4}
+    # The budget is spent on the seed and its own links before anything a level deeper.
+    assert sorted(fetched) == ["/", "/a", "/b"]
+    assert all(doc.text.startswith("Source Note: Vendor docs") for doc in ingested)
+    assert {doc.space_key for doc in ingested} == {"docs.test"}
+    assert main.pipeline.stats()["baseline-web"]["stages"]["fetch"]["items_in"] == 3
@@ -0,0 +1,446 @@
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("CONFLUENCE_BASE_URL", "https://example.atlassian.net/wiki")
+os.environ.setdefault("CONFLUENCE_EMAIL", "test@example.com")
+os.environ.setdefault("CONFLUENCE_API_TOKEN", "test")
+
+from concurrent.futures import ThreadPoolExecutor
+import re
+import sqlite3
+
+import pytest
+
+from app import chroma_service, ingest_manifest, lexical_index
+from app.chroma_service import ChromaService, ChunkRecord, collections_to_migrate, migrate_collection
+from app.config import settings
+from app.embed_batcher import EmbedBatcher
+from app.ingest import IngestDocument, document_hash, should_skip, upsert_document_chunks
+
+
+def _fake_embed(texts, task_type):
+    # Queries land next to the store locator and gift docs, far from everything else.
+    if task_type == "retrieval_query":
+        return [[1.0, 0.0] for _ in texts]
+    vectors = []
+    for text in texts:
+        if "locator" in text:
+            vectors.append([1.0, 0.0])
+        elif "Gift" in text:
+            vectors.append([0.9, 0.1])
+        else:
+            vectors.append([0.0, 1.0])
+    return vectors
+
+
+@pytest.fixture
+def chroma(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "chroma_persist_path", str(tmp_path / "chroma"))
+    monkeypatch.setattr(settings, "chroma_collection", "test-chunks")
+    monkeypatch.setattr(settings, "lexical_index_path", str(tmp_path / "lexical_index.db"))
+    monkeypatch.setattr(settings, "lexical_index_enabled", True)
+    monkeypatch.setattr(settings, "rerank_candidates", 1)
+    monkeypatch.setattr(chroma_service, "embed_texts", _fake_embed)
+    yield ChromaService()
+    lexical_index.close()
+    ingest_manifest.close()
+
+
+def _record(doc_id, text, source="sfcc"):
+    return ChunkRecord(doc_id, text, {"source": source, "source_id": doc_id})
+
+
+def _ingest(chroma, store_source="sfcc"):
+    chroma.upsert_chunks(
+        [
+            _record("store", "Store locator shows nearby stores", source=store_source),
+            _record("basket", "Call BasketMgr.getCurrentBasket() in the cart controller"),
+            _record("gift", "Gift messages on the order confirmation", source=store_source),
+        ],
+        task_type="retrieval_document",
+    )
+
+
+def test_lexical_hits_missed_by_vector_search_are_fused_in(chroma):
+    _ingest(chroma)
+
+    response = chroma.query("BasketMgr", top_k=2)
+
+    assert response["ids"] == [["store", "basket"]]
+    # Lexical-only hits get a real distance in the collection's space (cosine here).
+    assert response["distances"][0][1] == pytest.approx(1.0)
+
+
+def test_lexical_index_follows_deletes_and_source_filters(chroma):
+    _ingest(chroma, store_source="confluence")
+
+    scoped = chroma.query("BasketMgr", top_k=2, where_filter={"source": {"$in": ["confluence"]}})
+    assert scoped["ids"] == [["store", "gift"]]
+
+    chroma.delete_source("sfcc", "basket")
+    assert chroma.query("BasketMgr", top_k=2)["ids"] == [["store", "gift"]]
+
+
+def test_existing_collection_is_backfilled_into_lexical_index(monkeypatch, chroma):
+    monkeypatch.setattr(settings, "lexical_index_enabled", False)
+    _ingest(chroma)
+    assert chroma.query("BasketMgr", top_k=2)["ids"] == [["store", "gift"]]
+
+    monkeypatch.setattr(settings, "lexical_index_enabled", True)
+    reopened = ChromaService()
+    # Queries do not pay for the backfill; they stay vector-only until startup or ingest runs it.
+    assert reopened.query("BasketMgr", top_k=2)["ids"] == [["store", "gift"]]
+
+    reopened.backfill_lexical_index()
+
+    assert reopened.query("BasketMgr", top_k=2)["ids"] == [["store", "basket"]]
+
+
+def test_bm25_statistics_are_kept_per_collection(monkeypatch, chroma):
+    # Another tenant's collection full of "basket" chunks must not make the term look common here.
+    noisy = [(f"noise-{index}", "basket basket basket", "sfcc", f"noise-{index}") for index in range(50)]
+    lexical_index.upsert("other-tenant", noisy)
+    lexical_index.upsert(
+        "test-chunks",
+        [
+            ("basket", "Basket in the cart controller", "sfcc", "basket"),
+            ("locator", "Store finder", "sfcc", "locator"),
+            ("map", "Finder map", "sfcc", "map"),
+            ("hours", "Finder opening hours", "sfcc", "hours"),
+        ],
+    )
+
+    # Here "basket" is the rarer term, so its chunk ranks first; pooled statistics would rank a finder chunk first.
+    assert lexical_index.search_many(["test-chunks"], ["basket finder"], None, 1) == [["basket"]]
+    assert lexical_index.search_many(["other-tenant"], ["finder"], None, 5) == [[]]
+
+
+def test_lexical_queries_reuse_the_connection_and_skip_ddl(chroma, tmp_path):
+    lexical_index.upsert("test-chunks", [("locator", "Store finder", "sfcc", "locator")])
+    conn = lexical_index._conn
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    assert lexical_index.search_many(["test-chunks", "never-indexed"], ["finder"], None, 5) == [["locator"]]
+    assert lexical_index.search_many(["test-chunks", "never-indexed"], ["finder"], None, 5) == [["locator"]]
+
+    assert lexical_index._conn is conn
+    assert not [sql for sql in statements if "CREATE" in sql or "lexical_fts'" in sql]
+    with sqlite3.connect(tmp_path / "lexical_index.db") as other:
+        fts_tables = other.execute("SELECT name FROM sqlite_master WHERE sql LIKE 'CREATE VIRTUAL TABLE%'").fetchall()
+    # Searching a collection that was never indexed does not create a table for it.
+    assert len(fts_tables) == 1
+
+
+def test_lexical_only_hits_are_fetched_once_per_batch(monkeypatch, chroma):
+    _ingest(chroma)
+    gets = []
+    original_get = chroma.collection.get
+
+    def counting_get(*args, **kwargs):
+        gets.append(kwargs.get("ids"))
+        return original_get(*args, **kwargs)
+
+    monkeypatch.setattr(chroma.collection, "get", counting_get)
+    responses = chroma.query_many(["BasketMgr", "BasketMgr cart controller"], top_k=2)
+
+    assert [response["ids"] for response in responses] == [[["store", "basket"]], [["store", "basket"]]]
+    assert gets == [["basket"]]
+
+
+def _doc(text, source_id="page-1", space_key="ENG"):
+    return IngestDocument(
+        source="confluence",
+        source_id=source_id,
+        title="Checkout",
+        url=None,
+        space_key=space_key,
+        updated_at=None,
+        text=text,
+    )
+
+
+def test_manifest_drives_skip_decisions_and_versions(monkeypatch, chroma, tmp_path):
+    monkeypatch.setattr(settings, "ingest_manifest_path", str(tmp_path / "manifest.db"))
+    doc = _doc("Store locator shows nearby stores")
+    assert not should_skip(chroma, doc)
+
+    upsert_document_chunks(chroma, doc, task_type="retrieval_document")
+    manifest = chroma.manifest_entries("confluence")
+    assert should_skip(chroma, doc, manifest)
+    assert manifest["page-1"].version == 1
+
+    changed = _doc("Store locator shows nearby stores and opening hours")
+    assert not should_skip(chroma, changed, manifest)
+    upsert_document_chunks(chroma, changed, task_type="retrieval_document")
+    entry = chroma.manifest_entries("confluence")["page-1"]
+    assert entry.version == 2
+    assert entry.chunk_ids == chroma.collection.get(where={"source_id": "page-1"})["ids"]
+
+    upsert_document_chunks(chroma, _doc("Gift messages", source_id="page-2", space_key="OPS"), "retrieval_document")
+    assert chroma.list_source_ids("confluence") == {"page-1", "page-2"}
+    assert chroma.list_source_ids("confluence", {"OPS"}) == {"page-2"}
+
+    chroma.delete_source("confluence", "page-2")
+    assert chroma.list_source_ids("confluence") == {"page-1"}
+
+
+def test_manifest_is_backfilled_from_existing_chunk_metadata(monkeypatch, chroma, tmp_path):
+    monkeypatch.setattr(settings, "ingest_manifest_path", str(tmp_path / "before.db"))
+    doc = _doc("Store locator shows nearby stores")
+    upsert_document_chunks(chroma, doc, task_type="retrieval_document")
+
+    monkeypatch.setattr(settings, "ingest_manifest_path", str(tmp_path / "after.db"))
+    reopened = ChromaService()
+
+    assert reopened.list_source_ids("confluence", {"ENG"}) == {"page-1"}
+    assert should_skip(reopened, doc)
+
+
+def test_manifest_reuses_one_connection_and_creates_its_schema_once(monkeypatch, chroma, tmp_path):
+    monkeypatch.setattr(settings, "ingest_manifest_path", str(tmp_path / "manifest.db"))
+    ingest_manifest.record("test-chunks", "confluence", "page-1", "hash-1", ["page-1:0"])
+    conn = ingest_manifest._conn
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    for index in range(3):
+        ingest_manifest.record("test-chunks", "confluence", f"page-{index}", f"hash-{index}", [f"page-{index}:0"])
+        assert ingest_manifest.get("test-chunks", "confluence", f"page-{index}").content_hash == f"hash-{index}"
+
+    assert ingest_manifest._conn is conn
+    assert not [sql for sql in statements if "CREATE" in sql or "PRAGMA" in sql]
+
+
+def test_edited_document_only_re_embeds_changed_chunks(monkeypatch, chroma, tmp_path):
+    monkeypatch.setattr(settings, "ingest_manifest_path", str(tmp_path / "manifest.db"))
+    monkeypatch.setattr(settings, "chunk_words", 4)
+    monkeypatch.setattr(settings, "chunk_overlap_words", 0)
+    embedded: list[str] = []
+
+    def counting_embed(texts, task_type):
+        embedded.extend(texts)
+        return _fake_embed(texts, task_type)
+
+    monkeypatch.setattr(chroma_service, "embed_texts", counting_embed)
+    doc = _doc("alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu")
+    upsert_document_chunks(chroma, doc, task_type="retrieval_document")
+    # The title and space lines, then the long body line in windows of four words.
+    assert len(embedded) == 5
+    embedded.clear()
+
+    edited = _doc("alpha beta gamma delta epsilon zeta eta theta iota kappa lambda nu")
+    upsert_document_chunks(chroma, edited, task_type="retrieval_document")
+
+    assert embedded == ["iota kappa lambda nu"]
+    stored = chroma.collection.get(where={"source_id": "page-1"}, include=["documents", "metadatas"])
+    assert sorted(stored["documents"])[-1] == "iota kappa lambda nu"
+    assert {meta["content_hash"] for meta in stored["metadatas"]} == {document_hash(edited)}
+
+    embedded.clear()
+    upsert_document_chunks(chroma, _doc("alpha beta gamma delta epsilon zeta eta theta"), "retrieval_document")
+    assert embedded == []
+    assert len(chroma.collection.get(where={"source_id": "page-1"})["ids"]) == 4
+
+
+def test_words_inserted_near_the_top_only_re_embed_nearby_chunks(monkeypatch, chroma, tmp_path):
+    monkeypatch.setattr(settings, "ingest_manifest_path", str(tmp_path / "manifest.db"))
+    monkeypatch.setattr(settings, "chunk_words", 40)
+    monkeypatch.setattr(settings, "chunk_overlap_words", 8)
+    embedded: list[str] = []
+
+    def counting_embed(texts, task_type):
+        embedded.extend(texts)
+        return _fake_embed(texts, task_type)
+
+    monkeypatch.setattr(chroma_service, "embed_texts", counting_embed)
+    lines = [f"Step {index} of the checkout flow validates field {index} before submit" for index in range(60)]
+    upsert_document_chunks(chroma, _doc("\n".join(lines)), task_type="retrieval_document")
+    total = len(embedded)
+    embedded.clear()
+
+    lines[1] = "Step 1 of the new guest checkout flow validates field 1 before submit"
+    upsert_document_chunks(chroma, _doc("\n".join(lines)), task_type="retrieval_document")
+
+    # A fixed word window would have shifted, and re-embedded, every chunk after the edit.
+    assert total >= 10
+    assert 1 <= len(embedded) <= 3
+
+
+def test_batched_documents_are_embedded_together_and_stored_per_document(monkeypatch, chroma, tmp_path):
+    monkeypatch.setattr(settings, "ingest_manifest_path", str(tmp_path / "manifest.db"))
+    calls: list[list[str]] = []
+
+    def recording_embed(texts, task_type):
+        calls.append(list(texts))
+        return _fake_embed(texts, task_type)
+
+    # Chroma's own request limit is respected when storing.
+    monkeypatch.setattr(chroma.client, "get_max_batch_size", lambda: 1)
+    batcher = EmbedBatcher("retrieval_document", max_wait_seconds=5, callers=2, embed=recording_embed)
+    docs = [_doc("Store locator shows nearby stores"), _doc("Gift messages", source_id="page-2")]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        counts = list(pool.map(lambda doc: upsert_document_chunks(chroma, doc, "retrieval_document", batcher), docs))
+
+    assert counts == [1, 1]
+    assert len(calls) == 1 and len(calls[0]) == 2
+    assert chroma.list_source_ids("confluence") == {"page-1", "page-2"}
+    assert chroma.query("locator", top_k=1)["ids"] == [["confluence:page-1:0"]]
+
+
+def test_new_collections_use_configured_hnsw_settings(chroma):
+    assert chroma.collection.metadata == {
+        "hnsw:space": "cosine",
+        "hnsw:M": settings.chroma_hnsw_m,
+        "hnsw:construction_ef": settings.chroma_hnsw_construction_ef,
+        "hnsw:search_ef": settings.chroma_hnsw_search_ef,
+    }
+
+
+def test_migration_rebuilds_legacy_collection_without_embedding(monkeypatch, chroma, caplog):
+    chroma.client.delete_collection("test-chunks")
+    legacy = chroma.client.create_collection("test-chunks")
+    legacy.add(
+        ids=["a", "b"],
+        embeddings=[[2.0, 0.0], [0.0, 1.0]],
+        documents=["Store locator", "Basket"],
+        metadatas=[{"source": "sfcc", "source_id": "a"}, {"source": "sfcc", "source_id": "b"}],
+    )
+    reopened = ChromaService()
+    assert reopened.collection.metadata is None
+    assert "scripts/migrate_collection.py" in caplog.text
+
+    def fail_embed(texts, task_type):
+        raise AssertionError("migration must not call the embedding API")
+
+    monkeypatch.setattr(chroma_service, "embed_texts", fail_embed)
+    result = migrate_collection(chroma.client, "test-chunks")
+
+    assert result["copied"] == 2
+    assert result["previous"]["hnsw:space"] == "l2"
+    migrated = chroma.client.get_collection("test-chunks")
+    assert migrated.metadata["hnsw:space"] == "cosine"
+    stored = migrated.get(ids=["a"], include=["embeddings", "documents"])
+    assert [float(value) for value in stored["embeddings"][0]] == [2.0, 0.0]
+    assert stored["documents"] == ["Store locator"]
+    assert chroma.client.get_collection(result["backup"]).count() == 2
+    # Cosine ignores the stored vector's length, unlike the old L2 index.
+    distances = migrated.query(query_embeddings=[[1.0, 0.0]], n_results=2)["distances"][0]
+    assert distances[0] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_migration_keeps_long_collection_names_within_chromas_limit(chroma):
+    # Group and namespace names already use the full 63 characters _bounded_name allows.
+    name = "documents-gemini-gemini-embedding-001-baseline-ns-checkout-eu-w"
+    legacy = chroma.client.create_collection(name)
+    legacy.add(ids=["a"], embeddings=[[1.0, 0.0]], documents=["Store locator"])
+
+    result = migrate_collection(chroma.client, name)
+
+    assert result["copied"] == 1
+    assert chroma.client.get_collection(name).metadata["hnsw:space"] == "cosine"
+    assert len(result["backup"]) <= 63 and re.search(r"-backup-\d+$", result["backup"])
+    assert chroma.client.get_collection(result["backup"]).count() == 1
+    assert not [c.name for c in chroma.client.list_collections() if c.name.endswith("-migrating")]
+
+
+def test_failed_migration_removes_its_temporary_collection(monkeypatch, chroma):
+    name = "documents-gemini-gemini-embedding-001-baseline"
+    chroma.client.create_collection(name).add(ids=["a"], embeddings=[[1.0, 0.0]], documents=["Store locator"])
+    monkeypatch.setattr(chroma_service.time, "time", lambda: 1700000000)
+    original_modify = chroma.client.get_collection(name).__class__.modify
+
+    def failing_modify(self, name=None, **kwargs):
+        if name and name.endswith("-backup-1700000000"):
+            raise ValueError("rename failed")
+        return original_modify(self, name=name, **kwargs)
+
+    monkeypatch.setattr(chroma.client.get_collection(name).__class__, "modify", failing_modify)
+
+    with pytest.raises(ValueError):
+        migrate_collection(chroma.client, name)
+
+    names = {collection.name for collection in chroma.client.list_collections()}
+    assert name in names
+    assert not [other for other in names if other.endswith("-migrating")]
+
+
+def test_all_outdated_collections_of_the_deployment_are_listed_for_migration(chroma):
+    ChromaService(namespace="checkout")
+    chroma.client.create_collection("test-chunks-project")
+    chroma.client.create_collection("test-chunks-ns-payments")
+    chroma.client.create_collection("test-chunks-backup-1700000000")
+    chroma.client.create_collection("other-app-chunks")
+
+    assert collections_to_migrate(chroma.client) == ["test-chunks-ns-payments", "test-chunks-project"]
+
+    for name in collections_to_migrate(chroma.client):
+        migrate_collection(chroma.client, name, keep_backup=False)
+
+    assert collections_to_migrate(chroma.client) == []
+
+
+def test_source_groups_get_their_own_collections(monkeypatch, chroma):
+    monkeypatch.setattr(settings, "chroma_source_groups", "project=confluence;baseline=baseline_web,sfcc")
+    grouped = ChromaService()
+    _ingest(grouped, store_source="confluence")
+
+    assert grouped.client.get_collection("test-chunks-project").count() == 2
+    assert grouped.client.get_collection("test-chunks-baseline").count() == 1
+    assert grouped.collection.count() == 0
+
+    project = grouped.query("BasketMgr", top_k=2, where_filter={"source": {"$in": ["confluence"]}})
+    assert project["ids"] == [["store", "gift"]]
+    everything = grouped.query("BasketMgr", top_k=2)
+    assert everything["ids"] == [["store", "basket"]]
+    # sfcc shares its group with baseline_web, so the filter is kept inside that collection.
+    targets = grouped._query_targets({"source": {"$in": ["sfcc"]}})
+    assert [(collection.name, where) for collection, where in targets] == [
+        ("test-chunks-baseline", {"source": {"$in": ["sfcc"]}})
+    ]
+
+
+def test_rebalance_moves_existing_chunks_into_source_collections(monkeypatch, chroma, tmp_path):
+    monkeypatch.setattr(settings, "ingest_manifest_path", str(tmp_path / "manifest.db"))
+    upsert_document_chunks(chroma, _doc("Store locator shows nearby stores"), "retrieval_document")
+    _ingest(chroma)
+
+    monkeypatch.setattr(settings, "chroma_source_groups", "confluence")
+
+    def fail_embed(texts, task_type):
+        if task_type != "retrieval_query":
+            raise AssertionError("rebalancing must not re-embed documents")
+        return _fake_embed(texts, task_type)
+
+    monkeypatch.setattr(chroma_service, "embed_texts", fail_embed)
+    grouped = ChromaService()
+    assert grouped.rebalance_collections(page_size=2) == {"test-chunks-confluence": 1}
+
+    assert grouped.collection.count() == 3
+    assert grouped.list_source_ids("confluence") == {"page-1"}
+    scoped = grouped.query("locator", top_k=1, where_filter={"source": "confluence"})
+    assert scoped["ids"] == [["confluence:page-1:0"]]
+    assert grouped.query("BasketMgr", top_k=2)["ids"][0][1] == "basket"
+
+
+def test_namespaces_are_isolated_collections(chroma):
+    client_a = ChromaService(namespace="Client A")
+    client_b = ChromaService(namespace="client-b")
+    _ingest(client_a)
+
+    assert client_a.collection.name == "test-chunks-ns-client-a"
+    assert client_a.query("locator", top_k=3)["ids"] == [["store", "gift", "basket"]]
+    assert client_b.query("locator", top_k=3)["ids"] == [[]]
+    assert chroma.query("locator", top_k=3)["ids"] == [[]]
+
+
+def test_dimension_mismatch_names_the_local_embedding_setting(monkeypatch, chroma, caplog):
+    _ingest(chroma)
+    monkeypatch.setattr(settings, "llm_provider", "local")
+    monkeypatch.setattr(chroma_service, "embed_texts", lambda texts, task_type: [[1.0, 0.0, 0.0] for _ in texts])
+
+    with pytest.raises(Exception, match="dimension"):
+        chroma.upsert_chunks([_record("extra", "Wishlist sharing")], task_type="retrieval_document")
+
+    assert f"embed_model=hash-{settings.local_embed_dim}" in caplog.text
+    assert "LOCAL_EMBED_DIM" in caplog.text
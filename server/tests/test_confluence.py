@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("CONFLUENCE_BASE_URL", "https://example.atlassian.net/wiki")
+os.environ.setdefault("CONFLUENCE_EMAIL", "test@example.com")
+os.environ.setdefault("CONFLUENCE_API_TOKEN", "test")
+
+import httpx
+import pytest
+
+from app import confluence
+from app.provider_clients import registry
+
+
+def test_throttled_requests_are_retried_after_retry_after(monkeypatch):
+    statuses = [429, 503, 200]
+    sleeps = []
+
+    def handler(request):
+        status = statuses.pop(0)
+        headers = {"Retry-After": "3"} if status == 429 else {}
+        return httpx.Response(status, headers=headers, json={"results": []})
+
+    monkeypatch.setattr(confluence.time, "sleep", sleeps.append)
+    client = httpx.Client(
+        base_url="https://example.atlassian.net/wiki",
+        transport=confluence._RetryTransport(httpx.MockTransport(handler)),
+    )
+
+    response = client.get("/rest/api/space")
+
+    assert response.status_code == 200
+    # Retry-After is honoured; without one the wait backs off exponentially.
+    assert sleeps == [3.0, 2.0]
+
+
+def test_retries_stop_after_the_configured_limit(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    monkeypatch.setattr(confluence.settings, "confluence_max_retries", 2)
+    monkeypatch.setattr(confluence.time, "sleep", lambda _seconds: None)
+    client = httpx.Client(transport=confluence._RetryTransport(httpx.MockTransport(handler)))
+
+    assert client.get("https://example.atlassian.net/wiki/rest/api/space").status_code == 503
+    assert len(calls) == 3
+
+
+def test_post_is_retried_on_429_but_not_on_503(monkeypatch):
+    statuses = [429, 503]
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        return httpx.Response(statuses.pop(0))
+
+    monkeypatch.setattr(confluence.time, "sleep", lambda _seconds: None)
+    client = httpx.Client(transport=confluence._RetryTransport(httpx.MockTransport(handler)))
+
+    # The page may already exist behind a 503, so creating it again could duplicate it.
+    response = client.post("https://example.atlassian.net/wiki/rest/api/content", json={"title": "FSD"})
+
+    assert response.status_code == 503
+    assert calls == ["POST", "POST"]
+
+
+def test_confluence_client_is_shared_until_shutdown():
+    first = confluence._client()
+
+    assert confluence._client() is first
+    assert not first.is_closed
+
+    registry.close_all()
+
+    assert first.is_closed
+    assert confluence._client() is not first
+
+
+def _page(page_id, space_key):
+    return confluence.ConfluencePage(
+        page_id=page_id,
+        title=f"Page {page_id}",
+        url="",
+        space_key=space_key,
+        updated_at=None,
+        storage_value=f"<p>{page_id}</p>",
+    )
+
+
+def _search_handler(total, on_offset=None):
+    def handler(request):
+        start = int(request.url.params["start"])
+        if on_offset:
+            on_offset(start)
+        count = max(0, min(50, total - start))
+        results = [
+            {
+                "id": str(start + offset),
+                "title": f"Page {start + offset}",
+                "space": {"key": "ENG"},
+                "body": {"storage": {"value": f"<p>Body {start + offset}</p>"}},
+                "_links": {"webui": f"/pages/{start + offset}"},
+            }
+            for offset in range(count)
+        ]
+        return httpx.Response(200, json={"results": results, "totalSize": total, "_links": {"base": "https://x"}})
+
+    return handler
+
+
+def _mock_client(monkeypatch, handler):
+    client = httpx.Client(base_url="https://example.atlassian.net/wiki", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(confluence, "_client", lambda: client)
+
+
+def test_one_large_space_fetches_result_offsets_in_parallel(monkeypatch):
+    both_offsets = threading.Barrier(2, timeout=5)
+
+    def on_offset(start):
+        if start in (50, 100):
+            # Deadlocks (and times out) unless two offsets of the same space are requested at once.
+            both_offsets.wait()
+
+    _mock_client(monkeypatch, _search_handler(150, on_offset))
+    totals = []
+
+    pages = list(confluence.stream_pages(["ENG"], on_total=totals.append, workers=2))
+
+    assert sorted(int(page.page_id) for page, _ in pages) == list(range(150))
+    assert totals == [150]
+    assert next(text for page, text in pages if page.page_id == "7").strip() == "Body 7"
+
+
+def test_search_keeps_paginating_past_a_stale_total(monkeypatch):
+    # Pages added after the first response: Confluence now holds 120, but reported 60.
+    handler = _search_handler(120)
+
+    def stale_total(request):
+        response = handler(request)
+        payload = response.json()
+        payload["totalSize"] = 60
+        return httpx.Response(200, json=payload)
+
+    _mock_client(monkeypatch, stale_total)
+
+    pages = list(confluence.stream_pages(["ENG"]))
+
+    assert sorted(int(page.page_id) for page, _ in pages) == list(range(120))
+
+
+def test_stream_pages_fetches_spaces_concurrently_with_bounded_queue(monkeypatch):
+    both_started = threading.Barrier(2, timeout=5)
+    produced = []
+
+    def fake_plan(self, space_key):
+        self.on_total(20)
+        # Deadlocks (and times out) unless both spaces are being searched at once.
+        both_started.wait()
+        for index in range(20):
+            produced.append(space_key)
+            yield _page(f"{space_key}-{index}", space_key)
+
+    monkeypatch.setattr(confluence.SpaceSearch, "plan", fake_plan)
+    monkeypatch.setattr(confluence.settings, "ingest_parse_workers", 1)
+    totals = []
+    stream = confluence.stream_pages(["ENG", "OPS"], on_total=totals.append, workers=2, queue_size=1)
+
+    first_page, first_text = next(stream)
+    time.sleep(0.2)
+    # Every queue holds one page and every worker one more; the other 30 pages wait in the search.
+    assert len(produced) <= 10
+    rest = list(stream)
+
+    pages = [first_page] + [page for page, _ in rest]
+    expected = [f"{key}-{index}" for key in ("ENG", "OPS") for index in range(20)]
+    assert sorted(page.page_id for page in pages) == sorted(expected)
+    assert first_text.strip() == first_page.page_id
+    assert totals == [20, 20]
+
+
+def test_stream_pages_surfaces_worker_errors(monkeypatch):
+    def failing_plan(self, space_key):
+        raise httpx.ConnectError("boom")
+        yield
+
+    monkeypatch.setattr(confluence.SpaceSearch, "plan", failing_plan)
+
+    with pytest.raises(httpx.ConnectError):
+        list(confluence.stream_pages(["ENG"]))
@@ -0,0 +1,104 @@
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("CONFLUENCE_BASE_URL", "https://example.atlassian.net/wiki")
+os.environ.setdefault("CONFLUENCE_EMAIL", "test@example.com")
+os.environ.setdefault("CONFLUENCE_API_TOKEN", "test")
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.embed_batcher import EmbedBatcher
+from app.pipeline import Pipeline, Stage
+
+
+class RecordingEmbed:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, texts, task_type):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("provider down")
+        return [[float(len(text)), 1.0 if task_type == "retrieval_document" else 0.0] for text in texts]
+
+
+def test_concurrent_documents_share_embedding_requests():
+    embed = RecordingEmbed()
+    batcher = EmbedBatcher(
+        "retrieval_document", name="test-shared", max_items=8, max_wait_seconds=5, callers=4, embed=embed
+    )
+    documents = [[f"doc{doc} chunk {'x' * chunk}" for chunk in range(3)] for doc in range(4)]
+
+    def embed_one(texts):
+        try:
+            return batcher.embed(texts)
+        finally:
+            batcher.leave()
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(embed_one, documents))
+
+    # Twelve chunks from four documents go out as two requests, not four, and the remainder is
+    # flushed as soon as the callers still waiting are the only ones left, not after max_wait_seconds.
+    assert time.monotonic() - started < 1
+    assert sorted(len(batch) for batch in embed.batches) == [4, 8]
+    for texts, vectors in zip(documents, results):
+        assert vectors == [[float(len(text)), 1.0] for text in texts]
+    stats = batcher.stats()
+    assert stats["requests"] == 4 and stats["batches"] == 2 and stats["pending"] == 0
+
+
+def test_pipeline_workers_leaving_flush_the_tail_on_every_run():
+    embed = RecordingEmbed()
+    batcher = EmbedBatcher(
+        "retrieval_document", name="test-pipeline", max_items=100, max_wait_seconds=5, callers=3, embed=embed
+    )
+    run = Pipeline("test-batched", [Stage("embed", batcher.embed, workers=3, on_exit=batcher.leave)])
+
+    started = time.monotonic()
+    # A second run (the next crawl level) reuses the batcher and its callers count again.
+    for _ in range(2):
+        # Two documents for three workers: the third worker never embeds, it only leaves.
+        assert len(list(run.iter([["doc 0"], ["doc 1"]]))) == 2
+
+    assert time.monotonic() - started < 1
+    assert sum(len(batch) for batch in embed.batches) == 4
+
+
+def test_large_document_is_split_and_lone_caller_flushes_on_timeout():
+    embed = RecordingEmbed()
+    batcher = EmbedBatcher("retrieval_document", name="test-large", max_items=10, max_wait_seconds=0.01, embed=embed)
+    texts = [f"chunk {index}" for index in range(25)]
+
+    vectors = batcher.embed(texts)
+
+    assert [len(batch) for batch in embed.batches] == [10, 10, 5]
+    assert [vector[0] for vector in vectors] == [float(len(text)) for text in texts]
+
+
+def test_token_budget_caps_a_batch():
+    embed = RecordingEmbed()
+    batcher = EmbedBatcher(
+        "retrieval_document", name="test-tokens", max_items=100, max_tokens=50, max_wait_seconds=0, embed=embed
+    )
+
+    batcher.embed(["a" * 120, "b" * 120, "c" * 8])
+
+    assert [len(batch) for batch in embed.batches] == [1, 2]
+
+
+def test_failed_request_raises_in_every_waiting_caller():
+    batcher = EmbedBatcher(
+        "retrieval_document", name="test-fail", max_items=10, max_wait_seconds=5, callers=2, embed=RecordingEmbed(True)
+    )
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(batcher.embed, [f"doc {index}"]) for index in range(2)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="provider down"):
+                future.result(timeout=5)
@@ -0,0 +1,81 @@
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("CONFLUENCE_BASE_URL", "https://example.atlassian.net/wiki")
+os.environ.setdefault("CONFLUENCE_EMAIL", "test@example.com")
+os.environ.setdefault("CONFLUENCE_API_TOKEN", "test")
+
+import threading
+import time
+
+import pytest
+
+from app import pipeline
+from app.rate_limit import PRIORITY_BACKGROUND, call_priority, current_priority
+from app.pipeline import Pipeline, Stage
+
+
+def test_stages_overlap_and_report_throughput():
+    both_fetching = threading.Barrier(2, timeout=5)
+
+    def fetch(number):
+        if number < 2:
+            # Deadlocks (and times out) unless two fetch workers run at once.
+            both_fetching.wait()
+        return number
+
+    def split(number):
+        return [number, number + 100] if number % 2 else []
+
+    def embed(number):
+        return None if number == 103 else number * 10
+
+    stages = [
+        Stage("fetch", fetch, workers=2),
+        Stage("parse", split, fan_out=True),
+        Stage("embed", embed, workers=3),
+    ]
+    run = Pipeline("numbers", stages, queue_size=2)
+    outputs = []
+    snapshot = run.run(range(6), outputs.append)
+
+    assert sorted(outputs) == [10, 30, 50, 1010, 1050]
+    assert snapshot["running"] is False
+    assert snapshot["stages"]["fetch"]["items_out"] == 6
+    assert snapshot["stages"]["parse"] == {**snapshot["stages"]["parse"], "items_in": 6, "items_out": 6}
+    assert snapshot["stages"]["embed"]["items_out"] == 5
+    assert all(stage["max_queue_depth"] <= 2 for stage in snapshot["stages"].values())
+    assert pipeline.stats()["numbers"] == snapshot
+
+
+def test_bounded_queues_hold_back_the_source():
+    pulled = []
+
+    def source():
+        for number in range(100):
+            pulled.append(number)
+            yield number
+
+    stream = Pipeline("backpressure", [Stage("slow", lambda number: number)], queue_size=1).iter(source())
+    assert next(stream) == 0
+    time.sleep(0.2)
+    # One item per queue, one in the worker and one held by the feeder; nothing close to all 100.
+    assert len(pulled) <= 5
+    assert list(stream) == list(range(1, 100))
+
+
+def test_worker_errors_surface_and_context_is_inherited():
+    seen_priorities = []
+
+    def check(number):
+        seen_priorities.append(current_priority())
+        if number == 3:
+            raise ValueError("bad item")
+        return number
+
+    run = Pipeline("failing", [Stage("check", check, workers=2)])
+    with call_priority(PRIORITY_BACKGROUND):
+        with pytest.raises(ValueError, match="bad item"):
+            run.run(range(10))
+
+    assert set(seen_priorities) == {PRIORITY_BACKGROUND}